@@ -0,0 +1,10 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Benchmarks for MORA.
+
+Each module in this package may be run directly, e.g.::
+
+  python -m benchmarks.parsedatetime
+
+'''
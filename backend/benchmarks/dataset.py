@@ -0,0 +1,369 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Generate a synthetic organisation for benchmarking.
+
+The organisation is generated deterministically from its size and a
+seed, so that benchmarks of different revisions run against the same
+data. It consists of a tree of units, and employees each with a number
+of engagements in random units and email addresses, all valid from
+2000 onwards.
+
+'''
+
+import argparse
+import json
+import random
+import typing
+import uuid
+
+from mora import common
+from mora import lora
+from mora import mapping
+
+VALID_FROM = '2000-01-01'
+VALID_TO = 'infinity'
+
+FIRST_NAMES = (
+    'Anders', 'Anne', 'Bente', 'Christian', 'Emil', 'Emma', 'Frederik',
+    'Hanne', 'Ida', 'Jens', 'Karen', 'Lars', 'Mette', 'Niels', 'Olivia',
+    'Peter', 'Sofie', 'Søren', 'Tove', 'William',
+)
+
+LAST_NAMES = (
+    'Andersen', 'Christensen', 'Hansen', 'Jensen', 'Johansen', 'Larsen',
+    'Madsen', 'Mortensen', 'Nielsen', 'Olsen', 'Pedersen', 'Rasmussen',
+    'Sørensen', 'Thomsen',
+)
+
+
+class Dataset:
+    '''A synthetic organisation, as a list of LoRa objects.
+
+    :param units: The number of units.
+    :param depth: The depth of the tree of units.
+    :param employees: The number of employees.
+    :param engagements: The number of engagements of each employee.
+    :param addresses: The number of addresses of each employee.
+    :param classes: The number of classes of the job function and unit
+        type facets.
+    :param seed: The seed of the generator.
+    '''
+
+    def __init__(self, units=100, depth=4, employees=1000, engagements=1,
+                 addresses=1, classes=10, seed=0):
+        self.rng = random.Random(seed)
+
+        #: tuples of (path, uuid, registration) for each object
+        self.objects = []  # type: typing.List[typing.Tuple[str, str, dict]]
+
+        self.org_uuid = self._add('organisation/organisation',
+                                  self._organisation())
+        self.klassifikation_uuid = self._add(
+            'klassifikation/klassifikation', self._klassifikation(),
+        )
+
+        #: maps facet user keys to their UUIDs
+        self.facets = {}  # type: typing.Dict[str, str]
+        #: maps facet user keys to the UUIDs of their classes
+        self.classes = {}  # type: typing.Dict[str, typing.List[str]]
+
+        self._add_facet('engagement_type', [('ansat', {})])
+        self._add_facet('primary_type', [
+            ('primaer', {'omfang': '3000'}),
+            ('sekundaer', {'omfang': '0'}),
+        ])
+        self._add_facet('employee_address_type', [
+            ('BrugerEmail', {'omfang': 'EMAIL'}),
+        ])
+        self._add_facet('engagement_job_function', [
+            ('job_function_{}'.format(i), {}) for i in range(classes)
+        ])
+        self._add_facet('org_unit_type', [
+            ('org_unit_type_{}'.format(i), {}) for i in range(classes)
+        ])
+
+        #: the UUIDs of the units at each level of the tree
+        self.levels = []  # type: typing.List[typing.List[str]]
+        self._add_units(units, depth)
+
+        self.employee_uuids = []  # type: typing.List[str]
+        self.engagement_uuids = []  # type: typing.List[str]
+        self._add_employees(employees, engagements, addresses)
+
+    @property
+    def unit_uuids(self) -> typing.List[str]:
+        return [unitid for level in self.levels for unitid in level]
+
+    def _uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _add(self, path: str, obj: dict) -> str:
+        objid = self._uuid()
+        self.objects.append((path, objid, obj))
+
+        return objid
+
+    def _virkning(self) -> dict:
+        return {
+            'from': VALID_FROM,
+            'to': VALID_TO,
+        }
+
+    def _organisation(self) -> dict:
+        return common._set_virkning({
+            'note': 'Benchmark',
+            'attributter': {
+                'organisationegenskaber': [{
+                    'brugervendtnoegle': 'benchmark',
+                    'organisationsnavn': 'Benchmark Kommune',
+                }],
+            },
+            'tilstande': {
+                'organisationgyldighed': [{
+                    'gyldighed': 'Aktiv',
+                }],
+            },
+            'relationer': {
+                'myndighed': [{
+                    'urn': 'urn:dk:kommune:999',
+                }],
+            },
+        }, self._virkning())
+
+    def _klassifikation(self) -> dict:
+        return common._set_virkning({
+            'note': 'Benchmark',
+            'attributter': {
+                'klassifikationegenskaber': [{
+                    'brugervendtnoegle': 'benchmark',
+                    'kaldenavn': 'Benchmark',
+                }],
+            },
+            'tilstande': {
+                'klassifikationpubliceret': [{
+                    'publiceret': 'Publiceret',
+                }],
+            },
+            'relationer': {
+                'ansvarlig': [{
+                    'objekttype': 'organisation',
+                    'uuid': self.org_uuid,
+                }],
+                'ejer': [{
+                    'objekttype': 'organisation',
+                    'uuid': self.org_uuid,
+                }],
+            },
+        }, self._virkning())
+
+    def _add_facet(self, bvn: str, classes: typing.List[tuple]):
+        facetid = self.facets[bvn] = self._add('klassifikation/facet', (
+            common._set_virkning({
+                'attributter': {
+                    'facetegenskaber': [{
+                        'brugervendtnoegle': bvn,
+                    }],
+                },
+                'tilstande': {
+                    'facetpubliceret': [{
+                        'publiceret': 'Publiceret',
+                    }],
+                },
+                'relationer': {
+                    'ansvarlig': [{
+                        'objekttype': 'organisation',
+                        'uuid': self.org_uuid,
+                    }],
+                    'facettilhoerer': [{
+                        'objekttype': 'klassifikation',
+                        'uuid': self.klassifikation_uuid,
+                    }],
+                },
+            }, self._virkning())
+        ))
+
+        self.classes[bvn] = [
+            self._add('klassifikation/klasse', common._set_virkning({
+                'attributter': {
+                    'klasseegenskaber': [{
+                        'brugervendtnoegle': class_bvn,
+                        'titel': class_bvn.replace('_', ' ').capitalize(),
+                        **attrs,
+                    }],
+                },
+                'tilstande': {
+                    'klassepubliceret': [{
+                        'publiceret': 'Publiceret',
+                    }],
+                },
+                'relationer': {
+                    'ansvarlig': [{
+                        'objekttype': 'organisation',
+                        'uuid': self.org_uuid,
+                    }],
+                    'facet': [{
+                        'objekttype': 'facet',
+                        'uuid': facetid,
+                    }],
+                },
+            }, self._virkning()))
+            for class_bvn, attrs in classes
+        ]
+
+    def _add_units(self, units: int, depth: int):
+        for i in range(units):
+            if i == 0:
+                level = 0
+                parentid = self.org_uuid
+            else:
+                level = self.rng.randrange(1, max(depth, 2))
+                level = min(level, len(self.levels))
+                parentid = self.rng.choice(self.levels[level - 1])
+
+            unitid = self._add(
+                'organisation/organisationenhed',
+                common.create_organisationsenhed_payload(
+                    enhedsnavn='Enhed {}'.format(i),
+                    valid_from=VALID_FROM,
+                    valid_to=VALID_TO,
+                    brugervendtnoegle='unit_{}'.format(i),
+                    tilhoerer=self.org_uuid,
+                    enhedstype=self.rng.choice(self.classes['org_unit_type']),
+                    overordnet=parentid,
+                ),
+            )
+
+            if level == len(self.levels):
+                self.levels.append([])
+
+            self.levels[level].append(unitid)
+
+    def _add_employees(self, employees: int, engagements: int,
+                       addresses: int):
+        unitids = self.unit_uuids
+        primary, secondary = self.classes['primary_type']
+
+        for i in range(employees):
+            first_name = self.rng.choice(FIRST_NAMES)
+            last_name = self.rng.choice(LAST_NAMES)
+            cpr = '{:02d}{:02d}{:02d}{:04d}'.format(
+                self.rng.randrange(1, 29),
+                self.rng.randrange(1, 13),
+                self.rng.randrange(100),
+                i % 10000,
+            )
+
+            userid = self._add(
+                'organisation/bruger',
+                common.create_bruger_payload(
+                    valid_from=VALID_FROM,
+                    valid_to=VALID_TO,
+                    fornavn=first_name,
+                    efternavn=last_name,
+                    kaldenavn_fornavn=None,
+                    kaldenavn_efternavn=None,
+                    brugervendtnoegle='user_{}'.format(i),
+                    tilhoerer=self.org_uuid,
+                    cpr=cpr,
+                ),
+            )
+            self.employee_uuids.append(userid)
+
+            for j in range(engagements):
+                self.engagement_uuids.append(self._add(
+                    'organisation/organisationfunktion',
+                    common.create_organisationsfunktion_payload(
+                        funktionsnavn=mapping.ENGAGEMENT_KEY,
+                        valid_from=VALID_FROM,
+                        valid_to=VALID_TO,
+                        brugervendtnoegle='engagement_{}_{}'.format(i, j),
+                        tilknyttedebrugere=[userid],
+                        tilknyttedeorganisationer=[self.org_uuid],
+                        tilknyttedeenheder=[self.rng.choice(unitids)],
+                        funktionstype=self.classes['engagement_type'][0],
+                        primær=primary if j == 0 else secondary,
+                        opgaver=[{
+                            'uuid': self.rng.choice(
+                                self.classes['engagement_job_function'],
+                            ),
+                        }],
+                    ),
+                ))
+
+            for j in range(addresses):
+                email = 'user_{}_{}@example.com'.format(i, j)
+
+                self._add(
+                    'organisation/organisationfunktion',
+                    common.create_organisationsfunktion_payload(
+                        funktionsnavn=mapping.ADDRESS_KEY,
+                        valid_from=VALID_FROM,
+                        valid_to=VALID_TO,
+                        brugervendtnoegle=email,
+                        tilknyttedebrugere=[userid],
+                        tilknyttedeorganisationer=[self.org_uuid],
+                        funktionstype=(
+                            self.classes['employee_address_type'][0]
+                        ),
+                        adresser=[{
+                            'objekttype': 'EMAIL',
+                            'urn': 'urn:mailto:' + email,
+                        }],
+                    ),
+                )
+
+    def load(self, connector: lora.Connector = None):
+        '''Write the dataset to LoRa.'''
+        connector = connector or lora.Connector()
+
+        for path, objid, obj in self.objects:
+            lora.Scope(connector, path).create(obj, objid)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    '''Add the arguments for the size of the dataset to the parser.'''
+    group = parser.add_argument_group('dataset')
+    group.add_argument('--units', type=int, default=100)
+    group.add_argument('--depth', type=int, default=4)
+    group.add_argument('--employees', type=int, default=1000)
+    group.add_argument('--engagements', type=int, default=1,
+                       help='number of engagements per employee')
+    group.add_argument('--addresses', type=int, default=1,
+                       help='number of addresses per employee')
+    group.add_argument('--classes', type=int, default=10,
+                       help='number of job functions and unit types')
+    group.add_argument('--seed', type=int, default=0)
+
+
+def from_arguments(args: argparse.Namespace) -> Dataset:
+    return Dataset(
+        units=args.units,
+        depth=args.depth,
+        employees=args.employees,
+        engagements=args.engagements,
+        addresses=args.addresses,
+        classes=args.classes,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    add_arguments(parser)
+    parser.add_argument('--load', action='store_true',
+                        help='write the dataset to the configured LoRa, '
+                        'rather than printing it')
+    args = parser.parse_args()
+
+    dataset = from_arguments(args)
+
+    if args.load:
+        dataset.load()
+    else:
+        for path, objid, obj in dataset.objects:
+            print(json.dumps({'path': path, 'uuid': objid, 'object': obj}))
+
+
+if __name__ == '__main__':
+    main()
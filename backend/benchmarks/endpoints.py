@@ -0,0 +1,230 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Measure the key endpoints of MO against a synthetic organisation.
+
+For each endpoint, we report the wall time of the requests, and the
+number of calls to LoRa, their total duration and the size of their
+responses, as reported in the ``Server-Timing`` header. The latter
+should catch changes that multiply the I/O of an endpoint, even when
+LoRa is fast enough locally to hide them.
+
+The benchmarks run against the LoRa configured in the settings. Use
+``--load`` to write the dataset to it first; please note that the
+benchmark of bulk creation adds engagements to the dataset, so reload
+the database to obtain comparable results between runs. Alternatively,
+``--fake-lora`` runs them against an in-memory LoRa holding just the
+dataset, optionally with ``--lora-latency`` added to each call.
+
+'''
+
+import argparse
+import re
+import statistics
+import time
+import typing
+
+from mora import app
+from mora import mapping
+from mora import settings
+
+from . import dataset
+from . import fakelora
+
+SERVER_TIMING_RE = re.compile(
+    r'(?P<name>[^\s,;]+);dur=(?P<duration>[\d.]+)'
+    r'(?:;desc="(?P<count>\d+) calls, (?P<size>\d+) bytes)?'
+)
+
+
+class Result(typing.NamedTuple):
+    durations: typing.List[float]
+    lora_calls: int
+    lora_duration: float
+    lora_size: int
+
+
+def parse_server_timing(header: str) -> typing.Tuple[int, float, int]:
+    '''Sum the calls to LoRa in the given ``Server-Timing`` header.
+
+    :return: The number of calls, their duration in milliseconds and
+        the size of their responses in bytes.
+    '''
+    calls = 0
+    duration = 0.0
+    size = 0
+
+    for m in SERVER_TIMING_RE.finditer(header):
+        if m.group('name').startswith('lora.') and m.group('count'):
+            calls += int(m.group('count'))
+            duration += float(m.group('duration'))
+            size += int(m.group('size'))
+
+    return calls, duration, size
+
+
+class Benchmarks:
+    def __init__(self, data: dataset.Dataset, repeat: int, bulk: int):
+        self.data = data
+        self.repeat = repeat
+        self.bulk = bulk
+        self.client = app.create_app().test_client()
+
+    def measure(self, method: str, path: str, json=None) -> Result:
+        durations = []
+        calls, duration, size = 0, 0.0, 0
+
+        for i in range(self.repeat):
+            started = time.perf_counter()
+            r = self.client.open(path, method=method, json=json)
+            durations.append(time.perf_counter() - started)
+
+            if not 200 <= r.status_code < 300:
+                raise RuntimeError('{} {} failed with {}: {}'.format(
+                    method, path, r.status, r.get_data(as_text=True),
+                ))
+
+            # the calls should be the same for each repetition, unless
+            # caching kicks in, so report the last one
+            calls, duration, size = parse_server_timing(
+                r.headers.get('Server-Timing', ''),
+            )
+
+        return Result(durations, calls, duration, size)
+
+    def ancestor_tree(self) -> Result:
+        leaves = self.data.levels[-1]
+
+        return self.measure('GET', '/service/ou/ancestor-tree?' + '&'.join(
+            'uuid=' + unitid for unitid in leaves[:10]
+        ))
+
+    def orgunit_tree(self) -> Result:
+        return self.measure(
+            'GET', '/service/o/{}/ou/tree?query=Enhed'.format(
+                self.data.org_uuid,
+            ),
+        )
+
+    def engagement_details(self) -> Result:
+        return self.measure(
+            'GET', '/service/e/{}/details/engagement'.format(
+                self.data.employee_uuids[0],
+            ),
+        )
+
+    def list_employees_first_page(self) -> Result:
+        return self.measure(
+            'GET', '/service/o/{}/e/?start=0&limit=100'.format(
+                self.data.org_uuid,
+            ),
+        )
+
+    def list_employees_last_page(self) -> Result:
+        return self.measure(
+            'GET', '/service/o/{}/e/?start={}&limit=100'.format(
+                self.data.org_uuid,
+                max(len(self.data.employee_uuids) - 100, 0),
+            ),
+        )
+
+    def bulk_create(self) -> Result:
+        unitids = self.data.unit_uuids
+        classes = self.data.classes
+
+        return self.measure('POST', '/service/details/create', [
+            {
+                'type': mapping.ENGAGEMENT,
+                'person': {'uuid': employeeid},
+                'org_unit': {'uuid': unitids[i % len(unitids)]},
+                'job_function': {
+                    'uuid': classes['engagement_job_function'][0],
+                },
+                'engagement_type': {
+                    'uuid': classes['engagement_type'][0],
+                },
+                'primary': {
+                    'uuid': classes['primary_type'][1],
+                },
+                'validity': {
+                    'from': '2020-01-01',
+                    'to': None,
+                },
+            }
+            for i, employeeid in enumerate(
+                self.data.employee_uuids[:self.bulk],
+            )
+        ])
+
+    def run(self, names: typing.Iterable[str]):
+        print('{:<28} {:>10} {:>10} {:>8} {:>10} {:>12}'.format(
+            'benchmark', 'best', 'median', 'calls', 'lora', 'bytes',
+        ))
+
+        for name in names:
+            result = getattr(self, name)()
+
+            print(
+                '{:<28} {:>8.1f}ms {:>8.1f}ms {:>8,} {:>8.1f}ms {:>12,}'
+                .format(
+                    name,
+                    min(result.durations) * 1000,
+                    statistics.median(result.durations) * 1000,
+                    result.lora_calls,
+                    result.lora_duration,
+                    result.lora_size,
+                ),
+            )
+
+
+BENCHMARKS = (
+    'ancestor_tree',
+    'orgunit_tree',
+    'engagement_details',
+    'list_employees_first_page',
+    'list_employees_last_page',
+    'bulk_create',
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    dataset.add_arguments(parser)
+    parser.add_argument('--load', action='store_true',
+                        help='write the dataset to LoRa first')
+    parser.add_argument('--fake-lora', action='store_true',
+                        help='run against an in-memory LoRa')
+    parser.add_argument('--lora-latency', type=float, default=0.0,
+                        help='seconds added to each call to the '
+                        'in-memory LoRa')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--bulk', type=int, default=50,
+                        help='number of engagements to create at once')
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help='benchmarks to run, of: {}'.format(
+                            ', '.join(BENCHMARKS),
+                        ))
+    args = parser.parse_args()
+
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark: {}'.format(name))
+
+    data = dataset.from_arguments(args)
+
+    if args.fake_lora:
+        lora = fakelora.FakeLoRa(args.lora_latency)
+        lora.load(data.objects)
+
+        server = fakelora.BackgroundServer(lora)
+        settings.LORA_URL = settings.config['lora']['url'] = server.url
+    elif args.load:
+        data.load()
+
+    Benchmarks(data, args.repeat, args.bulk).run(
+        args.benchmarks or BENCHMARKS,
+    )
+
+
+if __name__ == '__main__':
+    main()
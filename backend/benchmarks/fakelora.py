@@ -0,0 +1,697 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''An in-memory stand-in for LoRa, for benchmarks and load tests.
+
+This implements the parts of the LoRa REST API used by MO for the
+``organisation`` and ``klassifikation`` services: searching, listing
+by one or more UUIDs or with ``list=1``, and getting, creating,
+importing, updating and deleting objects. Values are filtered by the
+requested ``virkning`` and registration time, and adjacent values are
+consolidated, as LoRa does. Updates follow the semantics of LoRa:
+
+* Attributes are merged into the existing values, field by field.
+* States and relations of cardinality 0..1 replace the existing values
+  within their ``virkning``.
+* Relations of unlimited cardinality replace all existing relations of
+  the same name.
+
+The objects live in memory, so the app must run in a single process,
+although it may use multiple threads. The optional latency is added to
+each request, to approximate running against a remote database.
+
+Run it as a local server with e.g.::
+
+  python -m benchmarks.fakelora --port 5001 --latency 0.01 --dataset
+
+and point ``lora.url`` of MO at ``http://localhost:5001/``.
+
+'''
+
+import argparse
+import datetime
+import re
+import threading
+import time
+import typing
+import uuid
+
+import flask
+import werkzeug.serving
+
+from mora import util
+
+from . import dataset
+
+#: the relations of cardinality 0..1 of each class; all others are
+#: of unlimited cardinality
+ZERO_TO_ONE_RELATIONS = {
+    'organisation/organisation': frozenset({
+        'branche', 'myndighed', 'myndighedstype', 'overordnet',
+        'produktionsenhed', 'skatteenhed', 'tilhoerer', 'virksomhed',
+        'virksomhedstype',
+    }),
+    'organisation/organisationenhed': frozenset({
+        'branche', 'enhedstype', 'niveau', 'overordnet', 'produktionsenhed',
+        'skatteenhed', 'tilhoerer',
+    }),
+    'organisation/organisationfunktion': frozenset({
+        'organisatoriskfunktionstype', 'primær',
+    }),
+    'organisation/bruger': frozenset({
+        'tilhoerer',
+    }),
+    'organisation/itsystem': frozenset({
+        'tilhoerer',
+    }),
+    'klassifikation/klassifikation': frozenset({
+        'ansvarlig', 'ejer',
+    }),
+    'klassifikation/facet': frozenset({
+        'ansvarlig', 'ejer', 'facettilhoerer',
+    }),
+    'klassifikation/klasse': frozenset({
+        'ansvarlig', 'ejer', 'facet', 'overordnetklasse',
+    }),
+}
+
+#: query parameters which aren't search criteria
+RESERVED_PARAMS = frozenset({
+    'konsolider',
+    'list',
+    'uuid',
+    'foersteresultat',
+    'maximalantalresultater',
+    'registreretfra',
+    'registrerettil',
+    'virkningfra',
+    'virkningtil',
+})
+
+SECTIONS = ('attributter', 'tilstande', 'relationer')
+
+# dummy UUID of the user making the changes
+BRUGERREF = '00000000-0000-0000-0000-000000000000'
+
+Interval = typing.Tuple[datetime.datetime, datetime.datetime]
+
+
+class LoRaError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _format_time(dt: datetime.datetime) -> str:
+    if dt == util.POSITIVE_INFINITY:
+        return 'infinity'
+    elif dt == util.NEGATIVE_INFINITY:
+        return '-infinity'
+    else:
+        # as formatted by LoRa, e.g. '2017-06-01 00:00:00+02'
+        s = dt.isoformat(' ')
+
+        return s[:-3] if s.endswith(':00') else s
+
+
+def _get_interval(value: dict) -> Interval:
+    virkning = value['virkning']
+
+    return (
+        util.parsedatetime(virkning['from']),
+        util.parsedatetime(virkning['to']),
+    )
+
+
+def _set_interval(value: dict, start: datetime.datetime,
+                  end: datetime.datetime) -> dict:
+    return {
+        **value,
+        'virkning': {
+            'from': _format_time(start),
+            'to': _format_time(end),
+            'from_included': True,
+            'to_included': False,
+        },
+    }
+
+
+def _overlaps(value: dict, start: datetime.datetime,
+              end: datetime.datetime) -> bool:
+    value_start, value_end = _get_interval(value)
+
+    return value_start < end and start < value_end
+
+
+def _get_content(value: dict) -> dict:
+    return {k: v for k, v in value.items() if k != 'virkning'}
+
+
+def _is_empty_relation(value: dict) -> bool:
+    return not value.get('uuid') and not value.get('urn')
+
+
+def _value_at(values: typing.List[dict],
+              when: datetime.datetime) -> typing.Optional[dict]:
+    for value in values:
+        start, end = _get_interval(value)
+
+        if start <= when < end:
+            return value
+
+
+def _merge(old: typing.List[dict], new: typing.List[dict],
+           overlay: bool) -> typing.List[dict]:
+    '''Merge the new values into the old, where neither overlap
+    amongst themselves.
+
+    :param overlay: Whether to overlay the fields of the new values
+        onto the old, rather than replacing them.
+    '''
+    points = sorted({
+        point
+        for value in old + new
+        for point in _get_interval(value)
+    })
+    result = []
+
+    for start, end in zip(points, points[1:]):
+        old_value = _value_at(old, start)
+        new_value = _value_at(new, start)
+
+        if new_value is None:
+            value = old_value
+        elif old_value is None or not overlay:
+            value = new_value
+        else:
+            value = {**old_value, **new_value}
+
+        if value is not None:
+            result.append(_set_interval(value, start, end))
+
+    return _consolidate(result)
+
+
+def _consolidate(values: typing.List[dict]) -> typing.List[dict]:
+    '''Merge adjacent values with the same content.'''
+    result = []
+
+    for value in sorted(values, key=_get_interval):
+        start, end = _get_interval(value)
+        content = _get_content(value)
+
+        for i, prev in enumerate(result):
+            prev_start, prev_end = _get_interval(prev)
+
+            if prev_end == start and _get_content(prev) == content:
+                result[i] = _set_interval(prev, prev_start, end)
+                break
+        else:
+            result.append(value)
+
+    return result
+
+
+def _normalise(obj: dict) -> dict:
+    '''Normalise the ``virkning`` of the values of the given object,
+    and drop any empty relations.'''
+    result = {}
+
+    for section in SECTIONS:
+        result[section] = {
+            name: [
+                _set_interval(value, *_get_interval(value))
+                for value in values
+                if section != 'relationer' or not _is_empty_relation(value)
+            ]
+            for name, values in obj.get(section, {}).items()
+        }
+
+    return result
+
+
+def _like(value, pattern: str) -> bool:
+    '''Match the value against a pattern with ``%`` wildcards, ignoring
+    case, as LoRa does for attributes.'''
+    if '%' not in pattern:
+        return str(value).casefold() == pattern.casefold()
+
+    regex = '.*'.join(map(re.escape, pattern.split('%')))
+
+    return re.fullmatch(regex, str(value), re.IGNORECASE | re.DOTALL) is not None
+
+
+class FakeLoRa:
+    '''An in-memory LoRa, and a WSGI app serving it.
+
+    :param latency: The number of seconds to wait before handling
+        each request.
+    '''
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+        # maps paths to UUIDs to the registrations of each object,
+        # oldest first
+        self.objects = {
+            path: {} for path in ZERO_TO_ONE_RELATIONS
+        }  # type: typing.Dict[str, typing.Dict[str, typing.List[dict]]]
+        self.lock = threading.Lock()
+        self.last_timestamp = util.NEGATIVE_INFINITY
+
+        self.app = self._create_app()
+
+    def __call__(self, environ, start_response):
+        return self.app(environ, start_response)
+
+    def _get_objects(self, path: str) -> typing.Dict[str, typing.List[dict]]:
+        try:
+            return self.objects[path]
+        except KeyError:
+            raise LoRaError(404, 'No such class: {}'.format(path))
+
+    def _get_timestamp(self) -> datetime.datetime:
+        # registrations must be strictly ordered in time
+        timestamp = max(util.now(), self.last_timestamp + util.MINIMAL_INTERVAL)
+        self.last_timestamp = timestamp
+
+        return timestamp
+
+    def _register(self, path: str, objid: str, obj: dict,
+                  livscykluskode: str):
+        '''Add a registration of the given object.
+
+        The caller must hold the lock.'''
+        registrations = self._get_objects(path).setdefault(objid, [])
+        timestamp = _format_time(self._get_timestamp())
+
+        if registrations:
+            registrations[-1] = {
+                **registrations[-1],
+                'tiltidspunkt': {
+                    'tidsstempeldatotid': timestamp,
+                },
+            }
+
+        registrations.append({
+            'fratidspunkt': {
+                'tidsstempeldatotid': timestamp,
+                'graenseindikator': True,
+            },
+            'tiltidspunkt': {
+                'tidsstempeldatotid': 'infinity',
+            },
+            'livscykluskode': livscykluskode,
+            'brugerref': BRUGERREF,
+            'note': obj.get('note', ''),
+            **{section: obj[section] for section in SECTIONS},
+        })
+
+    def load(self, objects: typing.Iterable[typing.Tuple[str, str, dict]]):
+        '''Import the given objects, as tuples of (path, uuid, object),
+        e.g. those of a :py:class:`dataset.Dataset`.'''
+        with self.lock:
+            for path, objid, obj in objects:
+                self._register(path, objid, {
+                    'note': obj.get('note', ''),
+                    **_normalise(obj),
+                }, 'Importeret')
+
+    def create(self, path: str, obj: dict, objid: str = None) -> str:
+        with self.lock:
+            objects = self._get_objects(path)
+
+            if objid is None:
+                objid = str(uuid.uuid4())
+                livscykluskode = 'Opstaaet'
+            elif objid in objects:
+                livscykluskode = 'Importeret'
+            else:
+                livscykluskode = 'Opstaaet'
+
+            self._register(path, objid, {
+                'note': obj.get('note', ''),
+                **_normalise(obj),
+            }, livscykluskode)
+
+        return objid
+
+    def update(self, path: str, objid: str, obj: dict) -> str:
+        zero_to_one = ZERO_TO_ONE_RELATIONS[path]
+        changes = _normalise(obj)
+
+        with self.lock:
+            try:
+                current = self._get_objects(path)[objid][-1]
+            except KeyError:
+                raise LoRaError(404, 'No such object: {}'.format(objid))
+
+            result = {
+                'note': obj.get('note', ''),
+                **{section: dict(current[section]) for section in SECTIONS},
+            }
+
+            for name, values in changes['attributter'].items():
+                result['attributter'][name] = _merge(
+                    current['attributter'].get(name, []), values, True,
+                )
+
+            for name, values in changes['tilstande'].items():
+                result['tilstande'][name] = _merge(
+                    current['tilstande'].get(name, []), values, False,
+                )
+
+            for name, values in obj.get('relationer', {}).items():
+                if name in zero_to_one:
+                    # merge the values including any empty ones, as
+                    # they clear the existing relation
+                    values = [
+                        _set_interval(value, *_get_interval(value))
+                        for value in values
+                    ]
+                    values = _merge(
+                        current['relationer'].get(name, []), values, False,
+                    )
+                    values = [
+                        value for value in values
+                        if not _is_empty_relation(value)
+                    ]
+                else:
+                    values = changes['relationer'][name]
+
+                if values:
+                    result['relationer'][name] = values
+                else:
+                    result['relationer'].pop(name, None)
+
+            self._register(path, objid, result, 'Rettet')
+
+        return objid
+
+    def delete(self, path: str, objid: str) -> str:
+        with self.lock:
+            try:
+                current = self._get_objects(path)[objid][-1]
+            except KeyError:
+                raise LoRaError(404, 'No such object: {}'.format(objid))
+
+            self._register(path, objid, current, 'Slettet')
+
+        return objid
+
+    def _match(self, path: str, registration: dict, key: str,
+               values: typing.List[str], interval: Interval) -> bool:
+        relations = registration['relationer']
+
+        def fields(section):
+            for section_values in registration[section].values():
+                for value in section_values:
+                    if _overlaps(value, *interval):
+                        yield value
+
+        def related(name=None):
+            for rel_name, rel_values in relations.items():
+                if name is None or rel_name == name:
+                    for value in rel_values:
+                        if _overlaps(value, *interval):
+                            yield value.get('uuid'), value.get('urn')
+
+        if key == 'vilkaarligrel':
+            return any(
+                v in ids for ids in related() for v in values
+            )
+
+        elif key in relations or key in ZERO_TO_ONE_RELATIONS[path]:
+            return any(
+                v in ids for ids in related(key) for v in values
+            )
+
+        if key == 'bvn':
+            key = 'brugervendtnoegle'
+
+        candidates = [
+            field_value
+            for section in ('attributter', 'tilstande')
+            for value in fields(section)
+            for field_name, field_value in value.items()
+            if field_name != 'virkning'
+            if key == 'vilkaarligattr' or field_name == key
+        ]
+
+        return all(
+            any(_like(candidate, pattern) for candidate in candidates)
+            for pattern in values
+        )
+
+    def search(self, path: str, params: typing.Dict[str, typing.List[str]],
+               interval: Interval) -> typing.List[str]:
+        criteria = {
+            key: values
+            for key, values in params.items()
+            if key not in RESERVED_PARAMS
+        }
+
+        with self.lock:
+            objects = list(self._get_objects(path).items())
+
+        result = []
+
+        for objid, registrations in objects:
+            registration = registrations[-1]
+
+            if registration['livscykluskode'] == 'Slettet':
+                continue
+
+            if not criteria and not any(
+                _overlaps(value, *interval)
+                for section in SECTIONS
+                for section_values in registration[section].values()
+                for value in section_values
+            ):
+                continue
+
+            if all(
+                self._match(path, registration, key, values, interval)
+                for key, values in criteria.items()
+            ):
+                result.append(objid)
+
+        result.sort()
+
+        start = int(params.get('foersteresultat', [0])[0])
+        limit = params.get('maximalantalresultater')
+
+        if limit:
+            return result[start:start + int(limit[0])]
+        else:
+            return result[start:]
+
+    def list(self, path: str, uuids: typing.Iterable[str],
+             interval: Interval,
+             registration_interval: typing.Optional[Interval]):
+        '''List the given objects, filtered to values within the given
+        interval, and registrations within the given registration
+        interval, if any.'''
+        with self.lock:
+            objects = self._get_objects(path)
+            found = [
+                (objid, objects[objid]) for objid in uuids
+                if objid in objects
+            ]
+
+        return [
+            {
+                'id': objid,
+                'registreringer': [
+                    self._filter_registration(registration, interval)
+                    for registration in registrations
+                    if self._is_registration_relevant(
+                        registration, registrations[-1],
+                        registration_interval,
+                    )
+                ],
+            }
+            for objid, registrations in found
+        ]
+
+    @staticmethod
+    def _is_registration_relevant(registration, current, interval):
+        if interval is None:
+            return registration is current
+
+        start = util.parsedatetime(
+            registration['fratidspunkt']['tidsstempeldatotid'],
+        )
+        end = util.parsedatetime(
+            registration['tiltidspunkt']['tidsstempeldatotid'],
+        )
+
+        return start < interval[1] and interval[0] < end
+
+    @staticmethod
+    def _filter_registration(registration: dict, interval: Interval):
+        result = dict(registration)
+
+        for section in SECTIONS:
+            result[section] = {}
+
+            for name, values in registration[section].items():
+                values = _consolidate([
+                    value for value in values if _overlaps(value, *interval)
+                ])
+
+                if values:
+                    result[section][name] = values
+
+        return result
+
+    def _handle_get(self, path: str):
+        params = flask.request.args.to_dict(flat=False)
+        now = util.now()
+
+        interval = (
+            util.parsedatetime(flask.request.args.get('virkningfra', now)),
+            util.parsedatetime(flask.request.args.get(
+                'virkningtil', now + util.MINIMAL_INTERVAL,
+            )),
+        )
+
+        if {'registreretfra', 'registrerettil'} & params.keys():
+            registration_interval = (
+                util.parsedatetime(
+                    flask.request.args.get('registreretfra', now),
+                ),
+                util.parsedatetime(flask.request.args.get(
+                    'registrerettil', now + util.MINIMAL_INTERVAL,
+                )),
+            )
+        else:
+            registration_interval = None
+
+        if 'uuid' in params:
+            results = self.list(path, params['uuid'], interval,
+                                registration_interval)
+        else:
+            uuids = self.search(path, params, interval)
+
+            if flask.request.args.get('list'):
+                results = self.list(path, uuids, interval,
+                                    registration_interval)
+            else:
+                results = uuids
+
+        return flask.jsonify({'results': [results]})
+
+    def _create_app(self) -> flask.Flask:
+        app = flask.Flask(__name__)
+
+        @app.before_request
+        def add_latency():
+            if self.latency:
+                time.sleep(self.latency)
+
+        @app.errorhandler(LoRaError)
+        def handle_error(exc):
+            return flask.jsonify({'message': exc.message}), exc.status
+
+        @app.route('/version')
+        def get_version():
+            return flask.jsonify({'lora_version': 'fake'})
+
+        @app.route('/site-map')
+        def get_site_map():
+            return flask.jsonify({'site-map': sorted(
+                '/' + path for path in self.objects
+            )})
+
+        @app.route('/<service>/<cls>', methods=['GET', 'POST'])
+        def handle_class(service, cls):
+            path = '{}/{}'.format(service, cls)
+
+            if flask.request.method == 'GET':
+                return self._handle_get(path)
+
+            objid = self.create(path, flask.request.get_json())
+
+            return flask.jsonify({'uuid': objid}), 201
+
+        @app.route('/<service>/<cls>/<uuid:objid>',
+                   methods=['GET', 'PUT', 'PATCH', 'DELETE'])
+        def handle_object(service, cls, objid):
+            path = '{}/{}'.format(service, cls)
+            objid = str(objid)
+
+            if flask.request.method == 'GET':
+                return flask.jsonify({'results': [
+                    self.list(path, [objid], (
+                        util.NEGATIVE_INFINITY, util.POSITIVE_INFINITY,
+                    ), None),
+                ]})
+            elif flask.request.method == 'PUT':
+                self.create(path, flask.request.get_json(), objid)
+                status = 200
+            elif flask.request.method == 'PATCH':
+                self.update(path, objid, flask.request.get_json())
+                status = 200
+            else:
+                self.delete(path, objid)
+                status = 202
+
+            return flask.jsonify({'uuid': objid}), status
+
+        return app
+
+
+class _QuietRequestHandler(werkzeug.serving.WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class BackgroundServer:
+    '''Serve a WSGI app from a thread of the current process.
+
+    :param app: The WSGI app.
+    :param host: The host to listen on.
+    :param port: The port to listen on, or zero for any free port.
+    '''
+
+    def __init__(self, app, host: str = '127.0.0.1', port: int = 0):
+        self.server = werkzeug.serving.make_server(
+            host, port, app, threaded=True,
+            request_handler=_QuietRequestHandler,
+        )
+        self.url = 'http://{}:{}/'.format(host, self.server.server_port)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever,
+            name='fake-lora',
+            daemon=True,
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds to wait before each request')
+    parser.add_argument('--dataset', action='store_true',
+                        help='load a synthetic dataset on startup')
+    dataset.add_arguments(parser)
+    args = parser.parse_args()
+
+    lora = FakeLoRa(args.latency)
+
+    if args.dataset:
+        lora.load(dataset.from_arguments(args).objects)
+
+    werkzeug.serving.run_simple(args.host, args.port, lora, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
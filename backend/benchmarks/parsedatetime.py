@@ -0,0 +1,113 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Measure the throughput of :py:func:`mora.util.parsedatetime` when
+reading effects.
+
+The workload mimics reading the functions of a large unit: many
+objects, each with a number of effects whose ``virkning`` uses the
+timestamp format of LoRa, and with boundaries shared between adjacent
+effects.
+
+'''
+
+import argparse
+import datetime
+import random
+import time
+
+from mora import util
+
+
+def generate_effects(objects: int, effects: int, seed=0):
+    rng = random.Random(seed)
+    start = datetime.date(2000, 1, 1)
+
+    for i in range(objects):
+        days = sorted(rng.sample(range(1, 7300), effects))
+        boundaries = [
+            # as formatted by LoRa, e.g. '2017-06-01 00:00:00+02'
+            util.parsedatetime(
+                start + datetime.timedelta(days=d),
+            ).isoformat(' ')[:-3]
+            for d in days
+        ] + ['infinity']
+
+        for effect_from, effect_to in zip(boundaries, boundaries[1:]):
+            yield {
+                'virkning': {
+                    'from': effect_from,
+                    'to': effect_to,
+                },
+            }
+
+
+def read_effects(effects):
+    '''Sort and bound the effects, as the reading handlers do.'''
+    effects = sorted(effects, key=util.get_effect_from)
+
+    return [
+        (util.get_effect_from(effect), util.get_effect_to(effect))
+        for effect in effects
+    ]
+
+
+def parse_with_dateutil(s):
+    '''Parse the timestamp as we did prior to the fast parser.'''
+    if s == 'infinity':
+        return util.POSITIVE_INFINITY
+    elif s == '-infinity':
+        return util.NEGATIVE_INFINITY
+    else:
+        return util.from_iso_time(s)
+
+
+def run(name, parse, effects, repeat):
+    best = float('inf')
+
+    for i in range(repeat):
+        util._parse_datetime_string.cache_clear()
+
+        started = time.perf_counter()
+
+        for effect in effects:
+            parse(effect['virkning']['from'])
+            parse(effect['virkning']['to'])
+
+        best = min(best, time.perf_counter() - started)
+
+    print('{:<24} {:>12,.0f} timestamps/s'.format(
+        name, 2 * len(effects) / best,
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--objects', type=int, default=2000)
+    parser.add_argument('--effects', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    effects = list(generate_effects(args.objects, args.effects))
+
+    run('dateutil.isoparse', parse_with_dateutil, effects, args.repeat)
+    run('fast parser', util._parse_datetime_string.__wrapped__,
+        effects, args.repeat)
+    run('fast parser and cache', util.parsedatetime, effects, args.repeat)
+
+    best = float('inf')
+
+    for i in range(args.repeat):
+        util._parse_datetime_string.cache_clear()
+
+        started = time.perf_counter()
+        read_effects(effects)
+        best = min(best, time.perf_counter() - started)
+
+    print('{:<24} {:>12,.3f} s for {:,} effects'.format(
+        'sorting and bounding', best, len(effects),
+    ))
+
+
+if __name__ == '__main__':
+    main()
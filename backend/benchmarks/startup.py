@@ -0,0 +1,133 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Measure the startup time of MO, as paid by each new worker.
+
+We start a fresh interpreter that imports :py:mod:`mora.app` and
+creates the app, and report the time spent in each, along with the
+modules and packages that are the most expensive to import, as given
+by ``python -X importtime``.
+
+Pass ``--budget`` to fail with a non-zero exit status if the median
+startup time exceeds the given number of seconds, e.g. in CI.
+
+'''
+
+import argparse
+import collections
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import typing
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_CODE = '''
+import json, time
+started = time.perf_counter()
+import mora.app
+imported = time.perf_counter()
+mora.app.create_app()
+created = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create': created - imported,
+}))
+'''
+
+IMPORT_TIME_RE = re.compile(
+    r'^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| '
+    r'(?P<indent> *)(?P<name>\S+)$',
+)
+
+
+class Startup(typing.NamedTuple):
+    import_duration: float
+    create_duration: float
+    #: maps each module imported to its own import time, in seconds
+    modules: typing.Dict[str, float]
+
+    @property
+    def duration(self) -> float:
+        return self.import_duration + self.create_duration
+
+
+def measure() -> Startup:
+    r = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_CODE],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    durations = json.loads(r.stdout.splitlines()[-1])
+    modules = {}
+
+    for line in r.stderr.splitlines():
+        m = IMPORT_TIME_RE.match(line)
+
+        if m:
+            modules[m.group('name')] = int(m.group('self')) / 1e6
+
+    return Startup(durations['import'], durations['create'], modules)
+
+
+def print_top(title: str, costs: typing.Dict[str, float], count: int):
+    print()
+    print(title)
+
+    for name, cost in sorted(costs.items(), key=lambda item: -item[1])[:count]:
+        print('  {:<48} {:>8.1f} ms'.format(name, cost * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15,
+                        help='number of modules and packages to list')
+    parser.add_argument('--budget', type=float,
+                        help='fail if starting takes longer than this '
+                        'many seconds')
+    args = parser.parse_args()
+
+    runs = [measure() for i in range(args.repeat)]
+    fastest = min(runs, key=lambda run: run.duration)
+    median = statistics.median(run.duration for run in runs)
+
+    print('{:<20} {:>8.1f} ms'.format(
+        'import mora.app',
+        statistics.median(run.import_duration for run in runs) * 1000,
+    ))
+    print('{:<20} {:>8.1f} ms'.format(
+        'create_app()',
+        statistics.median(run.create_duration for run in runs) * 1000,
+    ))
+    print('{:<20} {:>8.1f} ms'.format('total', median * 1000))
+
+    packages = collections.Counter()
+
+    for name, cost in fastest.modules.items():
+        packages[name.partition('.')[0]] += cost
+
+    print_top('most expensive packages, including all their modules:',
+              packages, args.top)
+    print_top('most expensive modules of MO:', {
+        name: cost
+        for name, cost in fastest.modules.items()
+        if name == 'mora' or name.startswith('mora.')
+    }, args.top)
+
+    if args.budget is not None and median > args.budget:
+        print()
+        print('startup took {:.1f} ms, exceeding the budget of {:.1f} ms'
+              .format(median * 1000, args.budget * 1000))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,10 +13,15 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 from mora import __version__, log, readonly
 from mora.triggers.internal import amqp_trigger
 from mora import health
+from mora import metrics
+from . import conditional
 from . import exceptions
 from . import lora
+from . import profiling
+from . import readmodel
 from . import service
 from . import settings
+from . import timing
 from . import util
 from .auth import base
 from .integrations import serviceplatformen
@@ -42,6 +47,7 @@ def create_app(overrides: typing.Dict[str, typing.Any] = None):
     '''
 
     log.init()
+    settings.log_config(settings.config)
 
     app = flask.Flask(__name__, root_path=distdir, template_folder=templatedir)
 
@@ -58,10 +64,12 @@ def create_app(overrides: typing.Dict[str, typing.Any] = None):
     base.blueprint.before_request(flask_saml_sso.check_saml_authentication)
     app.register_blueprint(base.blueprint)
     app.register_blueprint(health.blueprint)
+    app.register_blueprint(metrics.blueprint)
     app.register_blueprint(readonly.blueprint)
 
-    for blueprint in service.blueprints:
+    for blueprint in service.get_blueprints():
         blueprint.before_request(flask_saml_sso.check_saml_authentication)
+        blueprint.before_request(conditional.check_request)
         app.register_blueprint(blueprint)
 
     @app.errorhandler(Exception)
@@ -83,6 +91,18 @@ def create_app(overrides: typing.Dict[str, typing.Any] = None):
 
         return error.get_response(flask.request.environ)
 
+    @app.after_request
+    def report_unchanged(response):
+        """Report edits skipped for not changing anything; see
+        :py:meth:`mora.service.handlers.RequestHandler.is_unchanged`.
+        """
+        unchanged = flask.g.get('unchanged_uuids')
+
+        if unchanged:
+            response.headers['X-Unchanged'] = ', '.join(unchanged)
+
+        return response
+
     @app.route("/version/")
     def version():
         lora_version = lora.get_version()
@@ -102,6 +122,8 @@ def create_app(overrides: typing.Dict[str, typing.Any] = None):
         flaw, that we do not know how to fix yet.
         """
         amqp_trigger.register()
+        readmodel.register()
+        service.association.register()
 
     # We serve index.html and favicon.ico here. For the other static files,
     # Flask automatically adds a static view that takes a path relative to the
@@ -135,6 +157,10 @@ def create_app(overrides: typing.Dict[str, typing.Any] = None):
 
     serviceplatformen.check_config(app)
     triggers.register(app)
+    timing.register(app)
+    conditional.register(app)
+    metrics.register(app)
+    profiling.register(app)
 
     # Fix for incident: https://redmine.magenta-aps.dk/issues/35832
     # Respect the X-Forwarded-Proto scheme
@@ -10,6 +10,7 @@ progress.
 
 '''
 import os
+import typing
 
 import flask
 
@@ -19,6 +20,7 @@ from .. import util
 
 __all__ = (
     'get_user',
+    'get_username',
 )
 
 basedir = os.path.dirname(__file__)
@@ -37,6 +39,12 @@ def get_user():
     :return: The username of the user who is currently logged in.
     '''
 
+    return flask.jsonify(get_username())
+
+
+def get_username() -> typing.Optional[str]:
+    '''Get the username of the currently logged in user, if any'''
+
     if not flask.current_app.config['SAML_USERNAME_FROM_NAMEID']:
         username_attr = flask.current_app.config['SAML_USERNAME_ATTR']
         try:
@@ -49,4 +57,4 @@ def get_user():
     else:
         username = flask_saml_sso.get_session_name_id()
 
-    return flask.jsonify(username)
+    return username
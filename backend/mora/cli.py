@@ -18,7 +18,7 @@ import psycopg2
 import sqlalchemy
 import sys
 
-from . import settings, conf_db
+from . import settings, conf_db, exporting, readmodel, warming
 from . import app as mora_app
 
 
@@ -116,5 +116,98 @@ def wait_for_rabbitmq(seconds):
     return 8
 
 
+@group.command()
+def warm():
+    """Read the configured organisation, classification and the counts
+    used for paging from LoRa, reporting the time taken.
+
+    This is what gunicorn does before forking its workers.
+    """
+    started = time.perf_counter()
+    result = warming.warm(mora_app.create_app())
+
+    for name, count in result.items():
+        click.echo("{}: {}".format(name, count))
+
+    click.echo("warmed caches in {:.1f} seconds".format(
+        time.perf_counter() - started,
+    ))
+
+
+@group.command()
+@click.option("--format", "formats", multiple=True, default=["csv"],
+              type=click.Choice(exporting.FORMATS),
+              help="Format to write; may be given more than once.")
+@click.option("--interval", default=0, type=int,
+              help="Repeat the exports every n seconds, rather than "
+                   "exporting just once.")
+@click.argument("names", nargs=-1,
+                type=click.Choice(sorted(exporting.EXPORTS)))
+def export(formats, interval, names):
+    """Export the organisation to the export directory.
+
+    All exports are written, unless some are given by name.
+    """
+    app = mora_app.create_app()
+    directory = app.config["QUERY_EXPORT_DIR"]
+
+    with app.app_context():
+        while True:
+            started = time.monotonic()
+
+            try:
+                exporting.run(directory, names, formats)
+            except Exception:
+                if not interval:
+                    raise
+
+                # try again the next time around
+                logger.exception("export failed")
+
+            if not interval:
+                break
+
+            time.sleep(max(interval - (time.monotonic() - started), 0))
+
+
+@group.group("read-model")
+def read_model():
+    """Maintain the local read model of LoRa."""
+
+
+@read_model.command("load")
+def load_read_model():
+    """Copy all units, employees and functions from LoRa."""
+    with mora_app.create_app().app_context():
+        for scope, count in readmodel.load().items():
+            click.echo("{}: {}".format(scope, count))
+
+
+@read_model.command("check")
+@click.option("--sample", default=100, type=int,
+              help="Compare the contents of up to n objects of each kind.")
+def check_read_model(sample):
+    """Compare the read model to LoRa, and repair any difference.
+
+    Exits with status 1 if anything was repaired.
+    """
+    with mora_app.create_app().app_context():
+        result = readmodel.check(sample)
+
+    for scope, uuids in result.items():
+        for uuid in uuids:
+            click.echo("{} {}".format(scope, uuid))
+
+    if any(result.values()):
+        sys.exit(1)
+
+
+@read_model.command("follow")
+def follow_read_model():
+    """Refresh the read model from the AMQP messages sent by MO."""
+    with mora_app.create_app().app_context():
+        readmodel.follow()
+
+
 if __name__ == '__main__':
     group(prog_name=os.getenv('FLASK_PROG_NAME', sys.argv[0]))
@@ -25,6 +25,10 @@ import werkzeug
 from . import exceptions
 from . import lora
 from . import mapping
+from . import metrics
+from . import readmodel
+from . import settings
+from . import snapshot
 from . import util
 
 
@@ -37,7 +41,17 @@ def get_connector(**loraparams):
     if args.get('validity'):
         loraparams['validity'] = args['validity']
 
-    return lora.Connector(**loraparams)
+    c = lora.Connector(**loraparams)
+
+    if readmodel.attach(c):
+        return c
+
+    if loraparams.keys() == {'effective_date'}:
+        # browsing the organisation at another date, as the time
+        # machine does
+        return snapshot.attach(c)
+
+    return c
 
 
 class cache(collections.defaultdict):
@@ -51,9 +65,61 @@ class cache(collections.defaultdict):
         return v
 
 
+class PayloadBuilder:
+    '''Accumulate changes to a LoRa payload in place.
+
+    :py:func:`util.set_obj_value` copies the entire payload for each
+    change, which gets expensive when editing objects with a long
+    history. Instead, the builder copies the initial payload once, and
+    each value as it's added.
+
+    The helpers below accept either a builder or a plain payload. Given
+    a builder, they update and return it; given a dict, they return a
+    new dict, as before.
+
+    '''
+
+    def __init__(self, payload: dict = None):
+        self.__payload = copy.deepcopy(payload) if payload else {}
+
+    def set_obj_value(self, path: tuple, val: typing.List[dict]):
+        '''Like :py:func:`util.set_obj_value`, but in place.'''
+        current_value = self.__payload
+
+        for key in path[:-1]:
+            current_value = current_value.setdefault(key, {})
+
+        key = path[-1]
+        val = copy.deepcopy(val)
+
+        if isinstance(current_value.get(key), list):
+            current_value[key].extend(val)
+        else:
+            current_value[key] = val
+
+    def build(self) -> dict:
+        '''Obtain the resulting payload.'''
+        return self.__payload
+
+
+PayloadType = typing.Union[dict, PayloadBuilder]
+
+
+def _get_builder(payload: PayloadType) -> PayloadBuilder:
+    if isinstance(payload, PayloadBuilder):
+        return payload
+    else:
+        return PayloadBuilder(payload)
+
+
+def _get_payload_result(builder: PayloadBuilder,
+                        payload: PayloadType) -> PayloadType:
+    return builder if builder is payload else builder.build()
+
+
 def inactivate_old_interval(old_from: str, old_to: str, new_from: str,
-                            new_to: str, payload: dict,
-                            path: tuple) -> dict:
+                            new_to: str, payload: PayloadType,
+                            path: tuple) -> PayloadType:
     """
     Create 'inactivation' updates based on two sets of from/to dates
 
@@ -61,31 +127,36 @@ def inactivate_old_interval(old_from: str, old_to: str, new_from: str,
     :param old_to: The old 'to' time, in ISO-8601
     :param new_from: The new 'from' time, in ISO-8601
     :param new_to: The new 'to' time, in ISO-8601
-    :param payload: An existing payload to add the updates to
+    :param payload: An existing payload or :py:class:`PayloadBuilder` to
+        add the updates to
     :param path: The path to where the object's 'gyldighed' is located
 
     :return: The payload with the inactivation updates added, if relevant
     """
+    builder = _get_builder(payload)
+
     if old_from < new_from:
         val = {
             'gyldighed': "Inaktiv",
             'virkning': _create_virkning(old_from, new_from)
         }
-        payload = util.set_obj_value(payload, path, [val])
+        builder.set_obj_value(path, [val])
     if new_to < old_to:
         val = {
             'gyldighed': "Inaktiv",
             'virkning': _create_virkning(new_to, old_to)
         }
-        payload = util.set_obj_value(payload, path, [val])
-    return payload
+        builder.set_obj_value(path, [val])
+    return _get_payload_result(builder, payload)
 
 
 def ensure_bounds(valid_from: datetime.datetime,
                   valid_to: datetime.datetime,
                   props: typing.List[mapping.FieldTuple],
                   obj: dict,
-                  payload: dict):
+                  payload: PayloadType) -> PayloadType:
+    builder = _get_builder(payload)
+
     for field in props:
         props = util.get_obj_value(obj, field.path, field.filter_fn)
         if not props:
@@ -124,8 +195,8 @@ def ensure_bounds(valid_from: datetime.datetime,
                     updated_props.append(last)
 
         if updated_props:
-            payload = util.set_obj_value(payload, field.path, updated_props)
-    return payload
+            builder.set_obj_value(field.path, updated_props)
+    return _get_payload_result(builder, payload)
 
 
 def update_payload(
@@ -133,8 +204,9 @@ def update_payload(
     valid_to: datetime.datetime,
     relevant_fields: typing.List[typing.Tuple[mapping.FieldTuple, dict]],
     obj: dict,
-    payload: dict,
-):
+    payload: PayloadType,
+) -> PayloadType:
+    builder = _get_builder(payload)
     relevant_fields = copy.deepcopy(relevant_fields)
     combined_fields = werkzeug.datastructures.OrderedMultiDict(relevant_fields)
 
@@ -165,9 +237,215 @@ def update_payload(
                     field_tuple.path[0]):
                 p['uuid'] = ''
                 p['urn'] = ''
-        payload = util.set_obj_value(payload, field_tuple.path, updated_props)
+        builder.set_obj_value(field_tuple.path, updated_props)
 
-    return payload
+    return _get_payload_result(builder, payload)
+
+
+def is_payload_unchanged(payload: dict, original: dict) -> bool:
+    """Determine whether applying an update payload to the given
+    registration would leave its effective state unchanged.
+
+    This is the case when, for each value in the payload, the original
+    has the same value throughout its virkning, and no other values of
+    that field overlap it.
+
+    :param payload: An update payload, as created by
+        :py:func:`update_payload` and :py:func:`ensure_bounds`.
+    :param original: The full registration of the object to update.
+    """
+    if not payload or not original:
+        return False
+
+    if not payload.keys() <= {'note', 'attributter', 'relationer', 'tilstande'}:
+        return False
+
+    for section in ('attributter', 'relationer', 'tilstande'):
+        for key, vals in payload.get(section, {}).items():
+            orig_vals = (original.get(section) or {}).get(key) or []
+            comparable_vals = [
+                _get_comparable_value(section, val) for val in vals
+            ]
+
+            for val, comparable_val in zip(vals, comparable_vals):
+                if not _is_value_unchanged(section, val, comparable_val,
+                                           comparable_vals, orig_vals):
+                    return False
+
+    return True
+
+
+def _get_comparable_value(section: str, val: dict) -> dict:
+    # LoRa stores attributes as text, and doesn't distinguish
+    # between missing and empty values
+    return {
+        k: str(v) if section == 'attributter' else v
+        for k, v in val.items()
+        if k != 'virkning' and v not in (None, '')
+    }
+
+
+def _is_value_unchanged(section: str, val: dict, comparable_val: dict,
+                        comparable_vals: typing.List[dict],
+                        orig_vals: typing.List[dict]) -> bool:
+    start = util.get_effect_from(val)
+    end = util.get_effect_to(val)
+
+    covered = []
+
+    for orig in orig_vals:
+        orig_start = util.get_effect_from(orig)
+        orig_end = util.get_effect_to(orig)
+
+        if orig_end <= start or end <= orig_start:
+            continue
+
+        comparable_orig = _get_comparable_value(section, orig)
+
+        if comparable_orig not in comparable_vals:
+            return False
+        elif comparable_orig == comparable_val:
+            covered.append((orig_start, orig_end))
+
+    for orig_start, orig_end in sorted(covered):
+        if start < orig_start:
+            return False
+
+        start = max(start, orig_end)
+
+    return end <= start
+
+
+def merge_payloads(payload: dict, other: dict,
+                   valid_from: datetime.datetime,
+                   valid_to: datetime.datetime) -> typing.Optional[dict]:
+    """Fold an update payload into another, such that submitting the
+    result applies the edit of ``other`` on top of that of ``payload``.
+
+    Both payloads must have been computed against the same
+    registration, and ``other`` must be the edit starting last. Its
+    values take precedence over those of ``payload`` during their
+    virkning -- or, for relations, during its validity, as we send the
+    entire list for relations LoRa doesn't merge, with the values of the
+    original outside the validity of the edit. Values of relations with
+    an ``objekttype`` only override values of the same type.
+
+    :param payload: An update payload, as created by
+        :py:func:`update_payload` and :py:func:`ensure_bounds`.
+    :param other: A subsequent update payload of the same object.
+    :param valid_from: The start of the validity of the edit of ``other``.
+    :param valid_to: The end of the validity of the edit of ``other``.
+    :return: The combined payload, or ``None`` if the payloads cannot
+        be combined.
+    """
+    allowed_keys = {'note', 'attributter', 'relationer', 'tilstande'}
+
+    if (
+        not payload.keys() <= allowed_keys or
+        not other.keys() <= allowed_keys
+    ):
+        return None
+
+    result = copy.deepcopy(payload)
+
+    if 'note' in other:
+        result['note'] = other['note']
+
+    for section in ('attributter', 'relationer', 'tilstande'):
+        for key, vals in other.get(section, {}).items():
+            result_section = result.setdefault(section, {})
+
+            if key in result_section:
+                result_section[key] = _merge_values(
+                    section, result_section[key], vals, valid_from, valid_to,
+                )
+            else:
+                result_section[key] = copy.deepcopy(vals)
+
+    return result
+
+
+def _merge_values(section: str, current_vals: typing.List[dict],
+                  vals: typing.List[dict], valid_from: datetime.datetime,
+                  valid_to: datetime.datetime) -> typing.List[dict]:
+    current_by_type = collections.defaultdict(list)
+    new_by_type = collections.defaultdict(list)
+
+    for val in current_vals:
+        current_by_type[val.get('objekttype')].append(val)
+
+    for val in vals:
+        new_by_type[val.get('objekttype')].append(val)
+
+    result = []
+
+    for objtype in dict.fromkeys([*current_by_type, *new_by_type]):
+        current = current_by_type[objtype]
+        new = new_by_type[objtype]
+
+        if not current or not new:
+            result.extend(current or copy.deepcopy(new))
+            continue
+
+        if section == 'relationer':
+            intervals = [(valid_from, valid_to)]
+            new = [
+                _set_effect_interval(
+                    val,
+                    max(util.get_effect_from(val), valid_from),
+                    min(util.get_effect_to(val), valid_to),
+                )
+                for val in new
+                if (util.get_effect_from(val) < valid_to and
+                    valid_from < util.get_effect_to(val))
+            ]
+        else:
+            intervals = [
+                (util.get_effect_from(val), util.get_effect_to(val))
+                for val in new
+            ]
+            new = copy.deepcopy(new)
+
+        for start, end in intervals:
+            current = [
+                clipped
+                for obj in current
+                for clipped in _clip_obj_effect(obj, start, end)
+            ]
+
+        result.extend(current)
+        result.extend(new)
+
+    return sorted(result, key=util.get_effect_from)
+
+
+def _set_effect_interval(obj: dict, start: datetime.datetime,
+                         end: datetime.datetime) -> dict:
+    new_obj = copy.deepcopy(obj)
+    new_obj['virkning']['from'] = util.to_lora_time(start)
+    new_obj['virkning']['to'] = util.to_lora_time(end)
+
+    return new_obj
+
+
+def _clip_obj_effect(obj: dict, start: datetime.datetime,
+                     end: datetime.datetime) -> typing.List[dict]:
+    '''Obtain the parts of the given object outside the given interval'''
+    obj_start = util.get_effect_from(obj)
+    obj_end = util.get_effect_to(obj)
+
+    if obj_end <= start or end <= obj_start:
+        return [obj]
+
+    clipped = []
+
+    if obj_start < start:
+        clipped.append(_set_effect_interval(obj, obj_start, start))
+
+    if end < obj_end:
+        clipped.append(_set_effect_interval(obj, end, obj_end))
+
+    return clipped
 
 
 def _merge_obj_effects(
@@ -634,6 +912,114 @@ def convert_reg_to_history(reg):
     }
 
 
+# maps (path, uuid) of an object to (tiltidspunkt, entries) for its
+# closed registrations; see get_history
+_history_cache = collections.OrderedDict()
+
+
+def _get_registration_time(reg, name):
+    return util.parsedatetime(reg[name]['tidsstempeldatotid'])
+
+
+def get_history(scope: lora.Scope,
+                objid: str) -> typing.Optional[typing.List[dict]]:
+    """Get the history of an object, i.e. its registrations as
+    converted by :py:func:`convert_reg_to_history`, newest first.
+
+    Registrations are immutable once closed, so for the
+    ``lora.history_cache_size`` most recently read objects, we keep
+    those, and only fetch the registrations following them from LoRa;
+    set that to zero to disable the cache.
+
+    :return: The history, or :code:`None` if the object doesn't exist.
+    """
+    key = (scope.path, str(objid))
+    size = settings.config['lora']['history_cache_size']
+
+    try:
+        until, closed = _history_cache[key]
+    except KeyError:
+        until, closed = '-infinity', []
+        metrics.observe_cache('history', False)
+    else:
+        metrics.observe_cache('history', True)
+
+    registrations = scope.get(objid,
+                              registreretfra=until,
+                              registrerettil='infinity')
+
+    if not registrations:
+        _history_cache.pop(key, None)
+        return None
+
+    if closed:
+        # LoRa includes any registration ending where we ask to
+        # start, so skip those we already have
+        until_time = util.parsedatetime(until)
+        registrations = [
+            reg
+            for reg in registrations
+            if reg['tiltidspunkt']['tidsstempeldatotid'] == 'infinity' or
+            _get_registration_time(reg, 'tiltidspunkt') > until_time
+        ]
+
+    registrations.sort(
+        key=functools.partial(_get_registration_time, name='fratidspunkt'),
+        reverse=True,
+    )
+
+    entries = list(map(convert_reg_to_history, registrations))
+
+    if size > 0:
+        newly_closed = [
+            (reg['tiltidspunkt']['tidsstempeldatotid'], entry)
+            for reg, entry in zip(registrations, entries)
+            if reg['tiltidspunkt']['tidsstempeldatotid'] != 'infinity'
+        ]
+
+        _history_cache[key] = (
+            newly_closed[0][0] if newly_closed else until,
+            [entry for _, entry in newly_closed] + closed,
+        )
+        _history_cache.move_to_end(key)
+
+        while len(_history_cache) > size:
+            _history_cache.popitem(last=False)
+
+    return entries + closed
+
+
+def _get_paging_arg(args, name: str) -> int:
+    value = args.get(name) or '0'
+
+    if not value.isdigit():
+        exceptions.ErrorCodes.E_INVALID_INPUT(
+            'invalid {}: {!r}'.format(name, value),
+        )
+
+    return int(value)
+
+
+def jsonify_history(entries: typing.List[dict]) -> flask.Response:
+    """Create a response with the given history entries, paged
+    according to the ``start`` and ``limit`` arguments of the request.
+
+    The total number of entries is given in the ``X-Total-Count``
+    header, and the offset of the page in ``X-Offset``.
+    """
+    args = flask.request.args
+    start = _get_paging_arg(args, 'start')
+    limit = _get_paging_arg(args, 'limit')
+
+    response = flask.jsonify(
+        entries[start:start + limit] if limit > 0 else entries[start:],
+    )
+    response.headers['X-Offset'] = str(start)
+    response.headers['X-Total-Count'] = str(len(entries))
+
+    return response
+
+
 def stable_json_dumps(v):
     """like :py:func:`json.dumps()`, but stable."""
     return json.dumps(v, sort_keys=True, allow_nan=False, ensure_ascii=False)
@@ -0,0 +1,187 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Conditional requests
+--------------------
+
+Integrations and the UI poll the same units, employees and details
+over and over again, most of which don't change in between. Each
+successful ``GET`` of the service API is therefore given an ``ETag``,
+and a request with an ``If-None-Match`` header listing it is answered
+with an empty ``304 Not Modified`` response.
+
+The tag is derived from what the response was built from, rather than
+from the response itself: the UUIDs and registration times of the
+objects read, as recorded by :py:class:`mora.lora.Scope` and the
+caches in front of it, the path, arguments and current date, as keyed
+by :py:mod:`mora.responsecache`, and the unit settings read from the
+configuration database.
+
+When the response cache is enabled, the digest of the objects read is
+stored in it along with the units whose settings were read. A later
+request for the same response with a matching ``If-None-Match`` header
+is then answered before reading anything from LoRa, provided nothing
+was written through MO since; only the settings are read again. As with
+cached responses, writes made to LoRa by other means only show once the
+digest expires.
+
+Responses depend on the current date and on the configuration of
+units, neither of which is recorded in LoRa, so we send no
+``Last-Modified`` header, as ``If-Modified-Since`` could then answer
+with stale data.
+
+'''
+
+import hashlib
+import json
+import typing
+
+import flask
+
+from . import responsecache
+from . import settings
+
+_METHODS = ('GET', 'HEAD')
+
+
+def _is_applicable_request() -> bool:
+    return (
+        flask.request.method in _METHODS and
+        flask.request.path.startswith('/service/')
+    )
+
+
+def _is_applicable(response: flask.Response) -> bool:
+    return (
+        _is_applicable_request() and
+        response.status_code == 200 and
+        response.mimetype == 'application/json' and
+        not response.is_streamed and
+        not response.direct_passthrough and
+        'ETag' not in response.headers
+    )
+
+
+def add_registration(objid: str, reg: dict = None):
+    '''Note that the response of the current request is built from the
+    given object, as registered.'''
+    if flask.has_request_context():
+        registrations = flask.g.get('conditional_registrations')
+
+        if registrations is not None:
+            timestamp = reg and reg.get('fratidspunkt', {}).get(
+                'tidsstempeldatotid',
+            )
+            registrations.add((str(objid), timestamp or ''))
+
+
+def add_settings(unitid: typing.Optional[str], configuration: dict):
+    '''Note that the response of the current request is built from the
+    given settings of a unit, or the global ones.'''
+    if flask.has_request_context():
+        units = flask.g.get('conditional_units')
+
+        if units is not None:
+            units[str(unitid or '')] = configuration
+
+
+def _get_digest(key: str, registrations: typing.Iterable[tuple]) -> str:
+    return hashlib.sha256(
+        json.dumps([key, sorted(registrations)]).encode(),
+    ).hexdigest()
+
+
+def _get_validator(digest: str, units: typing.Dict[str, dict]) -> str:
+    return hashlib.sha256(
+        json.dumps([digest, sorted(units.items())],
+                   sort_keys=True).encode(),
+    ).hexdigest()
+
+
+def _get_current_validator(
+        entry: typing.Tuple[str, typing.List[str]]) -> str:
+    # imported here, as it records its reads in this module
+    from . import conf_db
+
+    digest, unitids = entry
+
+    return _get_validator(digest, {
+        unitid: conf_db.get_configuration(unitid)
+        for unitid in unitids
+    })
+
+
+def check_request() -> typing.Optional[flask.Response]:
+    '''Answer the current request with ``304 Not Modified``, if
+    possible without reading from LoRa, and otherwise start recording
+    what its response is built from.'''
+    if not _is_applicable_request():
+        return None
+
+    generation = None
+
+    if responsecache.is_enabled():
+        cache = responsecache.get_cache()
+        generation = cache.get_generation()
+        entry = (
+            cache.get_validator(responsecache.get_key())
+            if flask.request.if_none_match
+            else None
+        )
+
+        if entry is not None:
+            etag = _get_current_validator(entry)
+
+            if flask.request.if_none_match.contains(etag):
+                response = flask.current_app.response_class(status=304)
+                response.set_etag(etag)
+
+                return response
+
+    flask.g.conditional_generation = generation
+    flask.g.conditional_registrations = set()
+    flask.g.conditional_units = {}
+
+    return None
+
+
+def _finish_request(response: flask.Response) -> flask.Response:
+    generation = flask.g.pop('conditional_generation', None)
+    registrations = flask.g.pop('conditional_registrations', None)
+    units = flask.g.pop('conditional_units', None)
+
+    if registrations is None or not _is_applicable(response):
+        return response
+
+    key = responsecache.get_key()
+
+    if registrations or units:
+        digest = _get_digest(key, registrations)
+        etag = _get_validator(digest, units)
+
+        if generation is not None:
+            responsecache.get_cache().put_validator(
+                key, digest, sorted(units), generation,
+                settings.config['response_cache']['ttl'],
+            )
+    elif generation is not None:
+        # served from the response cache, so nothing was read
+        entry = responsecache.get_cache().get_validator(key)
+
+        if entry is None:
+            return response
+
+        etag = _get_current_validator(entry)
+    else:
+        return response
+
+    response.set_etag(etag)
+
+    return response.make_conditional(flask.request)
+
+
+def register(app: flask.Flask):
+    '''Support conditional requests to the service API of the given
+    app, whose blueprints must check them with
+    :py:func:`check_request`.'''
+    app.after_request(_finish_request)
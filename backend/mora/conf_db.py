@@ -3,11 +3,9 @@
 
 import logging
 
-import psycopg2
-from psycopg2.extras import execute_values
-from psycopg2.sql import SQL, Identifier
-
+from mora import conditional
 from mora import exceptions
+from mora import timing
 from mora.settings import config
 
 logger = logging.getLogger("mo_configuration")
@@ -39,6 +37,10 @@ _DBNAME_SYS_TEMPLATE = "template1"
 
 
 def _get_connection(dbname):
+    # psycopg2 is imported on first use, to keep the startup of
+    # workers fast
+    import psycopg2
+
     logger.debug('Open connection to database')
     try:
         conn = psycopg2.connect(
@@ -64,6 +66,9 @@ def _cpdb(dbname_from, dbname_to):
     Requires CREATEDB or SUPERUSER privileges.
 
     """
+    import psycopg2.extensions
+    from psycopg2.sql import SQL, Identifier
+
     logger.debug("Copying database from %s to %s", dbname_from, dbname_to)
     with _get_connection(_DBNAME_SYS_TEMPLATE) as conn:
         conn.set_isolation_level(
@@ -82,6 +87,9 @@ def _dropdb(dbname):
 
     Requires OWNER or SUPERUSER privileges.
     """
+    import psycopg2.extensions
+    from psycopg2.sql import SQL, Identifier
+
     logger.debug("Dropping database %s", dbname)
     with _get_connection(_DBNAME_SYS_TEMPLATE) as conn:
         conn.set_isolation_level(
@@ -129,6 +137,9 @@ def set_global_conf(conf):
     check for duplicates.
 
     """
+    from psycopg2.extras import execute_values
+    from psycopg2.sql import SQL
+
     DEFAULT_CONF_DATA_QUERY = SQL(
         "INSERT INTO orgunit_settings ( object, setting, value ) VALUES %s;"
     )
@@ -141,6 +152,7 @@ def set_global_conf(conf):
 
 def create_db_table():
     """Initialize the config database with a table and default values."""
+    from psycopg2.sql import SQL
 
     CREATE_CONF_QUERY = SQL(
         "CREATE TABLE IF NOT EXISTS orgunit_settings("
@@ -192,6 +204,8 @@ def health_check():
 
     This is intended to be used whenever an app object is created.
     """
+    import psycopg2
+
     try:
         missing = _find_missing_default_keys()
         if missing:
@@ -253,6 +267,7 @@ def testdb_teardown():
     _dropdb(_DBNAME_BACKUP)
 
 
+@timing.timed_function('conf_db')
 def get_configuration(unitid=None):
     if unitid:
         query_suffix = " = %s"
@@ -280,9 +295,11 @@ def get_configuration(unitid=None):
         conn.close()
     logger.debug('Read: Unit: {}, configuration: {}'.format(unitid,
                                                             configuration))
+    conditional.add_settings(unitid, configuration)
     return configuration
 
 
+@timing.timed_function('conf_db')
 def set_configuration(configuration, unitid=None):
     logger.debug('Write: Unit: {}, configuration: {}'.format(unitid,
                                                              configuration))
@@ -0,0 +1,384 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Bulk exports of the organisation
+--------------------------------
+
+Rather than having reports produced by scripts querying the service
+API unit by unit, this writes the current units, employees, their
+engagements, associations, managers and addresses, along with the
+classes they refer to, straight from LoRa into files in
+``query_export.directory``, where :py:mod:`mora.service.exports`
+serves them.
+
+Objects are read a page at a time, in the order of their UUIDs, and
+written as they arrive, so memory use doesn't grow with the size of
+the organisation. Each file is first written under a temporary name
+and then moved into place, so that readers never see a partial
+export, and an export that didn't change since the last time is left
+untouched.
+
+An export is only regenerated when anything was written through MO
+since it was last written -- as told by the generation of the
+response cache, which the workers share -- or other objects match its
+search. Both are noted in a hidden state file next to the exports.
+Without a response cache, exports are regenerated every time.
+
+Run the exports with ``python -m mora.cli export``, and pass
+``--interval`` to repeat them, in a process of their own.
+
+'''
+
+import csv
+import filecmp
+import hashlib
+import json
+import logging
+import operator
+import os
+import tempfile
+import typing
+
+from more_itertools import chunked
+
+from . import exceptions
+from . import lora
+from . import mapping
+from . import responsecache
+from . import settings
+from . import util
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+
+# the name of the file noting the state of each export at the time it
+# was written; the leading dot hides it from the list of exports
+STATE_FILE_NAME = '.exports.json'
+
+
+class Export(typing.NamedTuple):
+    scope: str
+    #: search parameters selecting the objects to export
+    params: typing.Dict[str, str]
+    columns: typing.Tuple[str, ...]
+    #: function from (uuid, registration) to a row with the columns
+    get_row: typing.Callable[[str, dict], typing.Dict[str, typing.Any]]
+
+
+def _get_validity(field: mapping.FieldTuple, obj: dict) -> dict:
+    for effect in field(obj):
+        return util.get_effect_validity(effect)
+
+    return {mapping.FROM: None, mapping.TO: None}
+
+
+def _get_first(field: mapping.FieldTuple, obj: dict) -> dict:
+    # objects may lack e.g. their attributes, in which case we leave
+    # the columns blank, rather than aborting the export
+    for value in field(obj):
+        return value
+
+    return {}
+
+
+def _get_unit_row(unitid, unit):
+    attrs = _get_first(mapping.ORG_UNIT_EGENSKABER_FIELD, unit)
+
+    return {
+        mapping.UUID: unitid,
+        mapping.USER_KEY: attrs.get('brugervendtnoegle'),
+        mapping.NAME: attrs.get('enhedsnavn'),
+        mapping.PARENT: mapping.PARENT_FIELD.get_uuid(unit),
+        mapping.ORG_UNIT_TYPE: mapping.ORG_UNIT_TYPE_FIELD.get_uuid(unit),
+        mapping.ORG_UNIT_LEVEL: mapping.ORG_UNIT_LEVEL_FIELD.get_uuid(unit),
+        mapping.TIME_PLANNING:
+            mapping.ORG_UNIT_TIME_PLANNING_FIELD.get_uuid(unit),
+        **_get_validity(mapping.ORG_UNIT_GYLDIGHED_FIELD, unit),
+    }
+
+
+def _get_employee_row(userid, user):
+    attrs = _get_first(mapping.EMPLOYEE_EGENSKABER_FIELD, user)
+    extensions = _get_first(mapping.EMPLOYEE_UDVIDELSER_FIELD, user)
+
+    # CPR numbers are deliberately left out, as anyone with access to
+    # MO may read the exports
+    return {
+        mapping.UUID: userid,
+        mapping.USER_KEY: attrs.get('brugervendtnoegle'),
+        mapping.GIVENNAME: extensions.get('fornavn', ''),
+        mapping.SURNAME: extensions.get('efternavn', ''),
+        **_get_validity(mapping.EMPLOYEE_GYLDIGHED_FIELD, user),
+    }
+
+
+def _get_function_row(funcid, func, **fields: mapping.FieldTuple):
+    attrs = _get_first(mapping.ORG_FUNK_EGENSKABER_FIELD, func)
+
+    return {
+        mapping.UUID: funcid,
+        mapping.USER_KEY: attrs.get('brugervendtnoegle'),
+        mapping.PERSON: mapping.USER_FIELD.get_uuid(func),
+        mapping.ORG_UNIT: mapping.ASSOCIATED_ORG_UNIT_FIELD.get_uuid(func),
+        **{
+            column: field.get_uuid(func)
+            for column, field in fields.items()
+        },
+        **_get_validity(mapping.ORG_FUNK_GYLDIGHED_FIELD, func),
+    }
+
+
+def _get_address_row(funcid, func):
+    address = _get_first(mapping.SINGLE_ADDRESS_FIELD, func)
+
+    return {
+        **_get_function_row(
+            funcid, func, address_type=mapping.ADDRESS_TYPE_FIELD,
+        ),
+        'scope': address.get('objekttype'),
+        'value': address.get('urn') or address.get('uuid'),
+    }
+
+
+def _get_class_row(classid, clazz):
+    attrs = next(
+        iter(clazz.get('attributter', {}).get('klasseegenskaber') or ()),
+        {},
+    )
+
+    return {
+        mapping.UUID: classid,
+        mapping.USER_KEY: attrs.get('brugervendtnoegle'),
+        mapping.NAME: attrs.get('titel'),
+        'scope': attrs.get('omfang'),
+        'facet': next(
+            (
+                rel.get('uuid')
+                for rel in clazz.get('relationer', {}).get('facet', ())
+            ),
+            None,
+        ),
+        mapping.PARENT: mapping.PARENT_CLASS_FIELD.get_uuid(clazz),
+    }
+
+
+_VALIDITY = (mapping.FROM, mapping.TO)
+_FUNCTION = (mapping.UUID, mapping.USER_KEY, mapping.PERSON,
+             mapping.ORG_UNIT)
+
+#: the available exports, by name
+EXPORTS = {
+    'units': Export(
+        'organisationenhed',
+        {'gyldighed': 'Aktiv'},
+        (mapping.UUID, mapping.USER_KEY, mapping.NAME, mapping.PARENT,
+         mapping.ORG_UNIT_TYPE, mapping.ORG_UNIT_LEVEL,
+         mapping.TIME_PLANNING) + _VALIDITY,
+        _get_unit_row,
+    ),
+    'employees': Export(
+        'bruger',
+        {'gyldighed': 'Aktiv'},
+        (mapping.UUID, mapping.USER_KEY, mapping.GIVENNAME,
+         mapping.SURNAME) + _VALIDITY,
+        _get_employee_row,
+    ),
+    'engagements': Export(
+        'organisationfunktion',
+        {'funktionsnavn': mapping.ENGAGEMENT_KEY, 'gyldighed': 'Aktiv'},
+        _FUNCTION + (mapping.JOB_FUNCTION, mapping.ENGAGEMENT_TYPE,
+                     mapping.PRIMARY) + _VALIDITY,
+        lambda funcid, func: _get_function_row(
+            funcid, func,
+            job_function=mapping.JOB_FUNCTION_FIELD,
+            engagement_type=mapping.ORG_FUNK_TYPE_FIELD,
+            primary=mapping.PRIMARY_FIELD,
+        ),
+    ),
+    'associations': Export(
+        'organisationfunktion',
+        {'funktionsnavn': mapping.ASSOCIATION_KEY, 'gyldighed': 'Aktiv'},
+        _FUNCTION + (mapping.ASSOCIATION_TYPE,) + _VALIDITY,
+        lambda funcid, func: _get_function_row(
+            funcid, func,
+            association_type=mapping.ORG_FUNK_TYPE_FIELD,
+        ),
+    ),
+    'managers': Export(
+        'organisationfunktion',
+        {'funktionsnavn': mapping.MANAGER_KEY, 'gyldighed': 'Aktiv'},
+        _FUNCTION + (mapping.MANAGER_TYPE, mapping.MANAGER_LEVEL) + _VALIDITY,
+        lambda funcid, func: _get_function_row(
+            funcid, func,
+            manager_type=mapping.MANAGER_TYPE_FIELD,
+            manager_level=mapping.MANAGER_LEVEL_FIELD,
+        ),
+    ),
+    'addresses': Export(
+        'organisationfunktion',
+        {'funktionsnavn': mapping.ADDRESS_KEY, 'gyldighed': 'Aktiv'},
+        _FUNCTION + (mapping.ADDRESS_TYPE, 'scope', 'value') + _VALIDITY,
+        _get_address_row,
+    ),
+    'classes': Export(
+        'klasse',
+        {'publiceret': 'Publiceret'},
+        (mapping.UUID, mapping.USER_KEY, mapping.NAME, 'scope', 'facet',
+         mapping.PARENT),
+        _get_class_row,
+    ),
+}
+
+
+def iter_objects(scope: lora.Scope, page_size: int = None,
+                 uuids: typing.List[str] = None,
+                 **params) -> typing.Iterator[typing.Tuple[str, dict]]:
+    '''Yield all objects matching the given search, or with the given
+    UUIDs, in the order of their UUIDs, reading them from LoRa a page
+    at a time.
+
+    LoRa doesn't order the results of a search, so rather than letting
+    it page through them, we page through their sorted UUIDs.'''
+    page_size = page_size or settings.DEFAULT_PAGE_SIZE
+
+    if uuids is None:
+        uuids = sorted(scope.fetch(**params))
+
+    for page in chunked(uuids, page_size):
+        yield from sorted(scope.get_all_by_uuid(page, page_size),
+                          key=operator.itemgetter(0))
+
+
+def _write_rows(fp, fmt: str, columns, rows):
+    if fmt == 'csv':
+        writer = csv.DictWriter(fp, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    else:
+        assert fmt == 'jsonl', fmt
+
+        for row in rows:
+            fp.write(json.dumps(row, ensure_ascii=False))
+            fp.write('\n')
+
+
+def write_export(directory: str, name: str, fmt: str,
+                 c: lora.Connector = None,
+                 uuids: typing.List[str] = None) -> bool:
+    '''Write the given export into the given directory, as
+    ``<name>.<fmt>``.
+
+    :param uuids: The sorted UUIDs of the objects to export, if known.
+    :return: Whether the file changed.
+    '''
+    export = EXPORTS[name]
+    c = c or lora.Connector()
+    path = os.path.join(directory, '{}.{}'.format(name, fmt))
+
+    rows = (
+        export.get_row(objid, obj)
+        for objid, obj in iter_objects(getattr(c, export.scope),
+                                       uuids=uuids, **export.params)
+    )
+
+    # a leading dot hides the file from the list of exports
+    fd, temp_path = tempfile.mkstemp(dir=directory,
+                                     prefix='.{}.'.format(name),
+                                     suffix='.' + fmt)
+
+    try:
+        with open(fd, 'w', encoding='utf-8', newline='') as fp:
+            _write_rows(fp, fmt, export.columns, rows)
+
+        if os.path.isfile(path) and filecmp.cmp(temp_path, path,
+                                                shallow=False):
+            os.unlink(temp_path)
+            return False
+
+        # mkstemp() only lets the owner read the file
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+    return True
+
+
+def run(directory: str, names: typing.Iterable[str] = None,
+        formats: typing.Iterable[str] = ('csv',)) -> typing.Dict[str, bool]:
+    '''Write the given exports, or all of them, in each of the given
+    formats.
+
+    :return: Whether each file written changed, by file name.
+    '''
+    if not directory or not os.path.isdir(directory):
+        raise exceptions.ImproperlyConfigured(
+            'the export directory {!r} does not exist'.format(directory),
+        )
+
+    c = lora.Connector()
+    state = _read_state(directory)
+    result = {}
+
+    # read before the objects, so that writes made while exporting are
+    # picked up the next time
+    generation = (
+        responsecache.get_cache().get_generation()
+        if responsecache.is_enabled() else None
+    )
+
+    for name in names or EXPORTS:
+        export = EXPORTS[name]
+        uuids = sorted(getattr(c, export.scope).fetch(**export.params))
+        digest = hashlib.sha256(''.join(uuids).encode('ascii')).hexdigest()
+
+        for fmt in formats:
+            file_name = '{}.{}'.format(name, fmt)
+
+            if (
+                generation is not None and
+                state.get(file_name) == [generation, digest] and
+                os.path.isfile(os.path.join(directory, file_name))
+            ):
+                result[file_name] = False
+            else:
+                result[file_name] = write_export(directory, name, fmt, c,
+                                                 uuids)
+                state[file_name] = [generation, digest]
+
+                _write_state(directory, state)
+
+            logger.info('exported %s%s', file_name,
+                        '' if result[file_name] else ' (unchanged)')
+
+    return result
+
+
+def _read_state(directory: str) -> dict:
+    try:
+        with open(os.path.join(directory, STATE_FILE_NAME),
+                  encoding='utf-8') as fp:
+            state = json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+    return state if isinstance(state, dict) else {}
+
+
+def _write_state(directory: str, state: dict):
+    fd, temp_path = tempfile.mkstemp(dir=directory,
+                                     prefix=STATE_FILE_NAME + '.')
+
+    try:
+        with open(fd, 'w', encoding='utf-8') as fp:
+            json.dump(state, fp)
+
+        os.replace(temp_path, os.path.join(directory, STATE_FILE_NAME))
+
+    except BaseException:
+        os.unlink(temp_path)
+        raise
@@ -24,12 +24,12 @@ class AddressReader(reading.OrgFunkReadingHandler):
     def get_mo_object_from_effect(cls, effect, start, end, funcid):
         c = common.get_connector()
 
-        person = mapping.USER_FIELD.get_uuid(effect)
-        org_unit = mapping.ASSOCIATED_ORG_UNIT_FIELD.get_uuid(effect)
-        address_type = mapping.ADDRESS_TYPE_FIELD.get_uuid(effect)
+        person = effect.get_uuid(mapping.USER_FIELD)
+        org_unit = effect.get_uuid(mapping.ASSOCIATED_ORG_UNIT_FIELD)
+        address_type = effect.get_uuid(mapping.ADDRESS_TYPE_FIELD)
 
-        scope = mapping.SINGLE_ADDRESS_FIELD(effect)[0].get("objekttype")
-        handler = base.get_handler_for_scope(scope).from_effect(effect)
+        scope = effect.get(mapping.SINGLE_ADDRESS_FIELD)[0].get("objekttype")
+        handler = base.get_handler_for_scope(scope).from_effect(effect.raw)
 
         base_obj = super().get_mo_object_from_effect(effect, start, end, funcid)
 
@@ -24,11 +24,11 @@ class AssociationReader(reading.OrgFunkReadingHandler):
     def get_mo_object_from_effect(cls, effect, start, end, funcid):
         c = common.get_connector()
 
-        person = mapping.USER_FIELD.get_uuid(effect)
-        org_unit = mapping.ASSOCIATED_ORG_UNIT_FIELD.get_uuid(effect)
-        association_type = mapping.ORG_FUNK_TYPE_FIELD.get_uuid(effect)
-        classes = list(mapping.ORG_FUNK_CLASSES_FIELD.get_uuids(effect))
-        primary = mapping.PRIMARY_FIELD.get_uuid(effect)
+        person = effect.get_uuid(mapping.USER_FIELD)
+        org_unit = effect.get_uuid(mapping.ASSOCIATED_ORG_UNIT_FIELD)
+        association_type = effect.get_uuid(mapping.ORG_FUNK_TYPE_FIELD)
+        classes = effect.get_uuids(mapping.ORG_FUNK_CLASSES_FIELD)
+        primary = effect.get_uuid(mapping.PRIMARY_FIELD)
 
         base_obj = super().get_mo_object_from_effect(effect, start, end, funcid)
 
@@ -1,11 +1,17 @@
 # SPDX-FileCopyrightText: 2019-2020 Magenta ApS
 # SPDX-License-Identifier: MPL-2.0
+import collections
 import logging
-from typing import Tuple, List, Union
+import time
+from typing import Dict, Iterable, Tuple, List, Optional, Union
+
+import flask
 
 from .. import reading
 from ... import common, lora
 from ... import mapping
+from ... import metrics
+from ... import settings
 from ... import util
 from ...exceptions import ErrorCodes
 from ...service import employee
@@ -16,6 +22,11 @@ ROLE_TYPE = "engagement"
 
 logger = logging.getLogger(__name__)
 
+# maps (validity, date, class writes) to (timestamp, ranking) of the
+# primary classes; see EngagementReader._get_sorted_primary_class_list
+_primary_class_cache = collections.OrderedDict()
+_PRIMARY_CLASS_CACHE_SIZE = 16
+
 
 @reading.register(ROLE_TYPE)
 class EngagementReader(reading.OrgFunkReadingHandler):
@@ -25,13 +36,13 @@ class EngagementReader(reading.OrgFunkReadingHandler):
     def get_mo_object_from_effect(cls, effect, start, end, funcid):
         c = common.get_connector()
 
-        person = mapping.USER_FIELD.get_uuid(effect)
-        org_unit = mapping.ASSOCIATED_ORG_UNIT_FIELD.get_uuid(effect)
-        job_function = mapping.JOB_FUNCTION_FIELD.get_uuid(effect)
-        engagement_type = mapping.ORG_FUNK_TYPE_FIELD.get_uuid(effect)
+        person = effect.get_uuid(mapping.USER_FIELD)
+        org_unit = effect.get_uuid(mapping.ASSOCIATED_ORG_UNIT_FIELD)
+        job_function = effect.get_uuid(mapping.JOB_FUNCTION_FIELD)
+        engagement_type = effect.get_uuid(mapping.ORG_FUNK_TYPE_FIELD)
 
-        primary = mapping.PRIMARY_FIELD.get_uuid(effect)
-        extensions = mapping.ORG_FUNK_UDVIDELSER_FIELD(effect)
+        primary = effect.get_uuid(mapping.PRIMARY_FIELD)
+        extensions = effect.get(mapping.ORG_FUNK_UDVIDELSER_FIELD)
         extensions = extensions[0] if extensions else {}
         fraction = extensions.get("fraktion", None)
 
@@ -67,6 +78,45 @@ class EngagementReader(reading.OrgFunkReadingHandler):
             for mo_key, lora_key in mapping.EXTENSION_ATTRIBUTE_MAPPING
         }
 
+    @classmethod
+    def get_primary_engagements(
+        cls, c: lora.Connector, personids: Iterable[str]
+    ) -> Dict[str, List[dict]]:
+        """
+        Get the primary engagements of several persons at once, i.e. those
+        of their engagements with the highest ranking primary class, or
+        the only engagement of a person having just one.
+
+        :param c: A LoRa connector
+        :param personids: The UUIDs of the persons
+
+        :return A dict mapping each person to a list of their primary
+        engagements; usually one, but more in case of a tie
+        """
+        result = {}
+
+        for personid in personids:
+            engagements, primary_class = cls._get_primary_state(c, personid)
+
+            if len(engagements) > 1:
+                engagements = [
+                    effect
+                    for effect in engagements
+                    if effect.get_uuid(mapping.PRIMARY_FIELD) == primary_class
+                ]
+
+            result[personid] = [
+                {
+                    **cls.get_mo_object_from_effect(
+                        effect, effect.start, effect.end, effect.obj_id,
+                    ),
+                    mapping.IS_PRIMARY: True,
+                }
+                for effect in engagements
+            ]
+
+        return result
+
     @classmethod
     def _is_primary(
         cls, c: lora.Connector, person: str, primary: str
@@ -91,26 +141,72 @@ class EngagementReader(reading.OrgFunkReadingHandler):
         if not util.get_args_flag("calculate_primary"):
             return None
 
-        engagements = [
-            effect
-            for _, obj in cls.get_lora_object(c, {'tilknyttedebrugere': person})
-            for _, _, effect in cls.get_effects(c, obj)
-            if util.is_reg_valid(effect)
-        ]
+        engagements, primary_class = cls._get_primary_state(c, person)
 
         # If only engagement
         if len(engagements) <= 1:
             return True
 
-        engagement_primary_uuids = [
-            mapping.PRIMARY_FIELD.get_uuid(engagement) for engagement in engagements
+        if primary_class is None:
+            return None
+
+        return primary_class == primary
+
+    @classmethod
+    def _get_primary_state(
+        cls, c: lora.Connector, person: str
+    ) -> Tuple[List[reading.EffectRecord], Optional[str]]:
+        """
+        Get the engagements of a person, along with the highest ranking
+        primary class among them, computed once per person and request, as
+        :py:meth:`_is_primary` is called for each engagement listed.
+
+        :param c: A LoRa connector
+        :param person: The UUID of a person
+
+        :return A tuple of the engagement effects and the UUID of the
+        primary class, if any; the class is only found for more than one
+        engagement
+        """
+        # connectors are created per engagement, so key by the date,
+        # rather than their exact time
+        key = (person, c.validity, c.now.date())
+        states = (
+            flask.g.setdefault('primary_states', {})
+            if flask.has_request_context()
+            else {}
+        )
+
+        try:
+            return states[key]
+        except KeyError:
+            pass
+
+        engagements = [
+            reading.EffectRecord(funcid, start, end, effect)
+            for funcid, obj in cls.get_lora_object(
+                c, {'tilknyttedebrugere': person}
+            )
+            for start, end, effect in cls.get_effects(c, obj)
+            if util.is_reg_valid(effect)
         ]
 
-        sorted_classes = cls._get_sorted_primary_class_list(c)
+        primary_class = None
+
+        if len(engagements) > 1:
+            engagement_primary_uuids = {
+                effect.get_uuid(mapping.PRIMARY_FIELD)
+                for effect in engagements
+            }
 
-        for class_id, _ in sorted_classes:
-            if class_id in engagement_primary_uuids:
-                return class_id == primary
+            for class_id, _ in cls._get_sorted_primary_class_list(c):
+                if class_id in engagement_primary_uuids:
+                    primary_class = class_id
+                    break
+
+        states[key] = engagements, primary_class
+
+        return engagements, primary_class
 
     @classmethod
     def _get_sorted_primary_class_list(cls, c: lora.Connector) -> List[Tuple[str, int]]:
@@ -118,22 +214,44 @@ class EngagementReader(reading.OrgFunkReadingHandler):
         Return a list of primary classes, sorted by priority in the "scope"
         field
 
+        The list is kept per effective date for
+        ``lora.classification_cache_ttl`` seconds, or until a class is
+        written through this process.
+
         :param c: A LoRa connector
 
         :return A sorted list of tuples of (uuid, scope) for all available
         primary classes
         """
-        facet_id = c.facet(bvn='primary_type')[0]
+        ttl = settings.config['lora']['classification_cache_ttl']
+        key = (
+            c.validity,
+            c.now.date(),
+            lora.get_write_count(c.klasse.path),
+        )
+        now = time.monotonic()
 
-        classes = [
-            facet.get_one_class_full(c, class_id, class_obj)
-            for class_id, class_obj in (c.klasse.get_all(facet=facet_id))
-        ]
+        try:
+            timestamp, sorted_classes = _primary_class_cache[key]
+        except KeyError:
+            pass
+        else:
+            if now - timestamp < ttl:
+                metrics.observe_cache('primary_classes', True)
+                return sorted_classes
+
+        metrics.observe_cache('primary_classes', False)
+
+        facet_id = c.facet(bvn='primary_type')[0]
 
         # We always expect the scope value to be an int, for sorting
         try:
-            parsed_classes = [(clazz['uuid'], int(clazz['scope'])) for clazz in classes]
-        except ValueError:
+            parsed_classes = [
+                (class_id, int(class_obj['attributter']['klasseegenskaber'][0]
+                               .get('omfang')))
+                for class_id, class_obj in c.klasse.get_all(facet=facet_id)
+            ]
+        except (TypeError, ValueError):
             raise ErrorCodes.E_INTERNAL_ERROR(
                 message="Unable to parse scope value as integer"
             )
@@ -141,4 +259,11 @@ class EngagementReader(reading.OrgFunkReadingHandler):
         # Sort based on scope values, higher is better
         sorted_classes = sorted(parsed_classes, key=lambda x: x[1], reverse=True,)
 
+        if ttl > 0:
+            _primary_class_cache[key] = now, sorted_classes
+            _primary_class_cache.move_to_end(key)
+
+            while len(_primary_class_cache) > _PRIMARY_CLASS_CACHE_SIZE:
+                _primary_class_cache.popitem(last=False)
+
         return sorted_classes
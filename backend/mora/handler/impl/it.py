@@ -23,9 +23,9 @@ class RoleReader(reading.OrgFunkReadingHandler):
     def get_mo_object_from_effect(cls, effect, start, end, funcid):
         c = common.get_connector()
 
-        person = mapping.USER_FIELD.get_uuid(effect)
-        org_unit = mapping.ASSOCIATED_ORG_UNIT_FIELD.get_uuid(effect)
-        it_system = mapping.SINGLE_ITSYSTEM_FIELD.get_uuid(effect)
+        person = effect.get_uuid(mapping.USER_FIELD)
+        org_unit = effect.get_uuid(mapping.ASSOCIATED_ORG_UNIT_FIELD)
+        it_system = effect.get_uuid(mapping.SINGLE_ITSYSTEM_FIELD)
 
         base_obj = super().get_mo_object_from_effect(effect, start, end, funcid)
 
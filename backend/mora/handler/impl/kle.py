@@ -22,12 +22,12 @@ class KLEReader(reading.OrgFunkReadingHandler):
     def get_mo_object_from_effect(cls, effect, start, end, funcid):
         c = common.get_connector()
 
-        org_unit = mapping.ASSOCIATED_ORG_UNIT_FIELD.get_uuid(effect)
-        address_type = mapping.ORG_FUNK_TYPE_FIELD.get_uuid(effect)
+        org_unit = effect.get_uuid(mapping.ASSOCIATED_ORG_UNIT_FIELD)
+        address_type = effect.get_uuid(mapping.ORG_FUNK_TYPE_FIELD)
 
         base_obj = super().get_mo_object_from_effect(effect, start, end, funcid)
 
-        kle_types = list(mapping.KLE_ASPECT_FIELD.get_uuids(effect))
+        kle_types = effect.get_uuids(mapping.KLE_ASPECT_FIELD)
 
         r = {
             **base_obj,
@@ -24,9 +24,9 @@ class LeaveReader(reading.OrgFunkReadingHandler):
     def get_mo_object_from_effect(cls, effect, start, end, funcid):
         c = common.get_connector()
 
-        person = mapping.USER_FIELD.get_uuid(effect)
-        leave_type = mapping.ORG_FUNK_TYPE_FIELD.get_uuid(effect)
-        engagement_uuid = mapping.ASSOCIATED_FUNCTION_FIELD.get_uuid(effect)
+        person = effect.get_uuid(mapping.USER_FIELD)
+        leave_type = effect.get_uuid(mapping.ORG_FUNK_TYPE_FIELD)
+        engagement_uuid = effect.get_uuid(mapping.ASSOCIATED_FUNCTION_FIELD)
 
         only_primary_uuid = flask.request.args.get("only_primary_uuid")
         if only_primary_uuid:
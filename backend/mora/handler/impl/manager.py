@@ -1,12 +1,14 @@
 # SPDX-FileCopyrightText: 2019-2020 Magenta ApS
 # SPDX-License-Identifier: MPL-2.0
 
+import collections
 import logging
 import operator
 
 from .. import reading
 from ... import common
 from ... import mapping
+from ... import snapshot
 from ... import util
 from ...service import address
 from ...service import employee
@@ -15,6 +17,10 @@ from ...service import orgunit
 
 ROLE_TYPE = "manager"
 
+# the number of units above which we read all managers at once, rather
+# than searching for the managers of each unit
+_MANAGER_SEARCH_LIMIT = 10
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,35 +39,155 @@ class ManagerReader(reading.OrgFunkReadingHandler):
     @classmethod
     def get_inherited_manager(cls, c, type, object_id):
 
-        search_fields = {
-            cls.SEARCH_FIELDS[type]: object_id
-        }
+        if type != 'ou':
+            # only units inherit managers
+            return super().get_from_type(c, type, object_id)
 
-        manager = list(super().get(c, search_fields))
+        org_snapshot = snapshot.get_attached(c)
 
-        if not manager:
-            ou = orgunit.get_one_orgunit(
-                c, object_id, details=orgunit.UnitDetails.FULL
-            )
-            try:
-                parent_id = ou[mapping.PARENT][mapping.UUID]
-            except (TypeError, KeyError):
-                return manager
+        if org_snapshot and object_id in org_snapshot.units:
+            # the snapshot knows where the nearest manager is
+            object_id = org_snapshot.get_managed_unit(object_id)
+
+            if object_id is None:
+                return []
+
+            return super().get_from_type(c, type, object_id)
+
+        return cls.get_inherited_managers(c, [object_id])[str(object_id)]
 
-            return cls.get_inherited_manager(c, type, parent_id)
+    @classmethod
+    def get_inherited_managers(cls, c, unitids):
+        """Get the managers of each of the given units, inheriting them
+        from the nearest ancestor with a manager if the unit has none.
+
+        :return: A dict mapping each UUID to a list of managers.
+        """
+        nearest = cls.get_nearest_managed_units(c, unitids)
+        managers = {}
+
+        for managedid, funcs in nearest.values():
+            if managedid not in managers:
+                managers[managedid] = cls.get_obj_effects(c, funcs)
+
+        return {
+            unitid: managers[managedid]
+            for unitid, (managedid, funcs) in nearest.items()
+        }
+
+    @classmethod
+    def _is_active(cls, c, func) -> bool:
+        return any(
+            util.is_reg_valid(effect)
+            for start, end, effect in cls.get_effects(c, func)
+        )
 
-        return manager
+    @classmethod
+    def get_nearest_managed_units(cls, c, unitids):
+        """Find the nearest unit with an active manager for each of the
+        given units, starting from the unit itself and ascending
+        through its active parents.
+
+        The units are ascended one level at a time, for all of the
+        given units at once, reading the parents of each level in a
+        single request. Managers are searched for unit by unit, unless
+        there are many units to search, in which case all managers are
+        read at once.
+
+        :return: A dict mapping each UUID to a tuple of the UUID of
+            its nearest unit with a manager, or :code:`None`, and the
+            managers of that unit as (UUID, function) tuples.
+        """
+        unitids = list(map(str, unitids))
+
+        # maps each unit read to its registration, or None
+        units = {}
+        # maps each unit searched to its active managers
+        managers = {}
+        all_managers = None
+
+        # maps each given unit to the units checked so far, the last
+        # of which is the current one
+        paths = {unitid: [unitid] for unitid in unitids}
+        result = {}
+
+        def read_units(unitids):
+            unitids = sorted(set(unitids) - units.keys())
+
+            units.update(dict.fromkeys(unitids))
+            units.update(c.organisationenhed.get_all_by_uuid(unitids))
+
+        while paths:
+            pending = {path[-1] for path in paths.values()} - managers.keys()
+
+            if all_managers is None and len(pending) > _MANAGER_SEARCH_LIMIT:
+                all_managers = collections.defaultdict(list)
+
+                for funcid, func in c.organisationfunktion.get_all(
+                    funktionsnavn=cls.function_key,
+                    gyldighed='Aktiv',
+                ):
+                    for unitid in mapping.ASSOCIATED_ORG_UNIT_FIELD.get_uuids(
+                        func,
+                    ):
+                        all_managers[unitid].append((funcid, func))
+
+            for unitid in pending:
+                if all_managers is not None:
+                    funcs = all_managers.get(unitid, [])
+                else:
+                    funcs = cls.get_lora_object(c, {
+                        cls.SEARCH_FIELDS['ou']: unitid,
+                    })
+
+                managers[unitid] = [
+                    (funcid, func)
+                    for funcid, func in funcs
+                    if cls._is_active(c, func)
+                ]
+
+            for unitid, path in list(paths.items()):
+                if managers[path[-1]]:
+                    result[unitid] = path[-1], managers[path[-1]]
+                    del paths[unitid]
+
+            # ascend to the parents of the units without managers, if
+            # both are active units
+            read_units(path[-1] for path in paths.values())
+
+            parents = {}
+
+            for unitid, path in paths.items():
+                unit = units[path[-1]]
+
+                if unit and util.is_reg_valid(unit):
+                    parents[unitid] = mapping.PARENT_FIELD.get_uuid(unit)
+
+            read_units(filter(None, parents.values()))
+
+            for unitid, path in list(paths.items()):
+                parentid = parents.get(unitid)
+                parent = units.get(parentid)
+
+                if parent and util.is_reg_valid(parent) and \
+                        parentid not in path:
+                    path.append(parentid)
+                else:
+                    result[unitid] = None, []
+                    del paths[unitid]
+
+        return result
 
     @classmethod
     def get_mo_object_from_effect(cls, effect, start, end, funcid):
         c = common.get_connector()
 
-        person = mapping.USER_FIELD.get_uuid(effect)
-        manager_type = mapping.ORG_FUNK_TYPE_FIELD.get_uuid(effect)
-        manager_level = mapping.MANAGER_LEVEL_FIELD.get_uuid(effect)
-        addresses = list(mapping.FUNCTION_ADDRESS_FIELD.get_uuids(effect))
-        responsibilities = list(mapping.RESPONSIBILITY_FIELD.get_uuids(effect))
-        org_unit = mapping.ASSOCIATED_ORG_UNIT_FIELD.get_uuid(effect)
+        person = effect.get_uuid(mapping.USER_FIELD)
+        manager_type = effect.get_uuid(mapping.ORG_FUNK_TYPE_FIELD)
+        manager_level = effect.get_uuid(mapping.MANAGER_LEVEL_FIELD)
+        addresses = effect.get_uuids(mapping.FUNCTION_ADDRESS_FIELD)
+        responsibilities = effect.get_uuids(mapping.RESPONSIBILITY_FIELD)
+        org_unit = effect.get_uuid(mapping.ASSOCIATED_ORG_UNIT_FIELD)
 
         base_obj = super().get_mo_object_from_effect(effect, start, end, funcid)
 
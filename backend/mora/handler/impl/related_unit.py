@@ -21,7 +21,7 @@ class RoleReader(reading.OrgFunkReadingHandler):
     def get_mo_object_from_effect(cls, effect, start, end, funcid):
         c = common.get_connector()
 
-        org_units = mapping.ASSOCIATED_ORG_UNIT_FIELD.get_uuids(effect)
+        org_units = effect.get_uuids(mapping.ASSOCIATED_ORG_UNIT_FIELD)
 
         base_obj = super().get_mo_object_from_effect(effect, start, end, funcid)
 
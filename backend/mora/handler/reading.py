@@ -28,6 +28,65 @@ def get_handler_for_type(object_type) -> 'ReadingHandler':
         exceptions.ErrorCodes.E_UNKNOWN_ROLE_TYPE(type=object_type)
 
 
+class EffectRecord:
+    '''A single effect of a LoRa function, as passed to
+    :py:meth:`OrgFunkReadingHandler.get_mo_object_from_effect`.
+
+    The attributes, states and relations of the effect are indexed by
+    their path once, along with the UUIDs of each relation, so reading
+    a field is a lookup rather than a walk of the effect. The lists
+    returned are shared, and must not be modified. The effect itself is
+    available as ``raw``.
+
+    '''
+    __slots__ = (
+        'obj_id',
+        'start',
+        'end',
+        'validity',
+        'raw',
+        '_fields',
+        '_uuids',
+    )
+
+    def __init__(self, obj_id, start, end, raw: dict):
+        self.obj_id = obj_id
+        self.start = start
+        self.end = end
+        self.validity = util.get_validity_object(start, end)
+        self.raw = raw
+        self._fields = {
+            (section, name): values
+            for section, fields in raw.items()
+            for name, values in fields.items()
+        }
+        self._uuids = {
+            ('relationer', name): [
+                value['uuid'] for value in values if 'uuid' in value
+            ]
+            for name, values in raw.get('relationer', {}).items()
+        }
+
+    def get(self, field: mapping.FieldTuple) -> list:
+        values = self._fields.get(field.path, [])
+
+        if field.filter_fn is not None:
+            return list(filter(field.filter_fn, values))
+
+        return values
+
+    def get_uuids(self, field: mapping.FieldTuple) -> list:
+        if field.filter_fn is None and field.path in self._uuids:
+            return self._uuids[field.path]
+
+        return [item['uuid'] for item in self.get(field) if 'uuid' in item]
+
+    def get_uuid(self, field: mapping.FieldTuple):
+        uuids = self.get_uuids(field)
+
+        return uuids[0] if uuids else None
+
+
 class ReadingHandler:
 
     @classmethod
@@ -130,7 +189,10 @@ class OrgFunkReadingHandler(ReadingHandler):
     @classmethod
     def get_obj_effects(cls, c, object_tuples):
         return [
-            cls.get_mo_object_from_effect(effect, start, end, function_id)
+            cls.get_mo_object_from_effect(
+                EffectRecord(function_id, start, end, effect),
+                start, end, function_id,
+            )
             for function_id, function_obj in object_tuples
             for start, end, effect in cls.get_effects(c, function_obj)
             if util.is_reg_valid(effect)
@@ -173,14 +235,14 @@ class OrgFunkReadingHandler(ReadingHandler):
         )
 
     @classmethod
-    def get_mo_object_from_effect(cls, effect, start, end, funcid):
-        properties = mapping.ORG_FUNK_EGENSKABER_FIELD(effect)[0]
+    def get_mo_object_from_effect(cls, effect: EffectRecord, start, end, funcid):
+        properties = effect.get(mapping.ORG_FUNK_EGENSKABER_FIELD)[0]
         user_key = properties['brugervendtnoegle']
 
         r = {
             mapping.UUID: funcid,
             mapping.USER_KEY: user_key,
-            mapping.VALIDITY: util.get_validity_object(start, end),
+            mapping.VALIDITY: effect.validity,
         }
 
         if properties.get('integrationsdata') is not None:
@@ -6,7 +6,6 @@ import logging
 import flask
 import requests
 from functools import wraps
-from pika.exceptions import AMQPError
 from requests.exceptions import RequestException
 
 from flask_saml_sso.health import (
@@ -41,6 +40,9 @@ def amqp():
     """
     if not config["amqp"]["enable"]:
         return None
+
+    from pika.exceptions import AMQPError
+
     connection = amqp_trigger.get_connection()
 
     try:
@@ -3,13 +3,13 @@
 
 import random
 
-import service_person_stamdata_udvidet
 import pathlib
 import requests
 import flask
 from .. import util
 from .. import exceptions
 from .. import settings
+from .. import timing
 
 
 def is_dummy_mode(app):
@@ -71,6 +71,10 @@ def get_citizen(cpr):
     if is_dummy_mode(flask.current_app):
         return _get_citizen_stub(cpr)
     else:
+        # the SOAP and signing libraries behind this are slow to import,
+        # so we only do so on the first actual lookup
+        import service_person_stamdata_udvidet
+
         sp_uuids = {
             'service_agreement': config["service_platformen"]["agreement_uuid"],
             'user_system': config["service_platformen"]["system_uuid"],
@@ -80,8 +84,9 @@ def get_citizen(cpr):
         certificate = config["service_platformen"]["certificate_path"]
         sp_production = config["service_platformen"]["sp_production"]
         try:
-            return service_person_stamdata_udvidet.get_citizen(
-                sp_uuids, certificate, cpr, production=sp_production)
+            with timing.timed('serviceplatformen'):
+                return service_person_stamdata_udvidet.get_citizen(
+                    sp_uuids, certificate, cpr, production=sp_production)
         except requests.HTTPError as e:
             if "PNRNotFound" in e.response.text:
                 raise KeyError("CPR not found")
@@ -3,6 +3,8 @@
 
 from __future__ import generator_stop
 
+import collections
+import time
 import typing
 import uuid
 
@@ -14,8 +16,12 @@ from itertools import starmap
 from more_itertools import chunked
 
 import lora_utils
+from . import conditional
 from . import exceptions
+from . import metrics
+from . import responsecache
 from . import settings
+from . import timing
 from . import util
 
 session = requests.Session()
@@ -25,6 +31,22 @@ session.headers = {
     'User-Agent': 'MORA/0.1',
 }
 
+# maps (path, writes, validity, date, search) to (timestamp, uuids); see
+# Scope.search
+_search_cache = collections.OrderedDict()
+_SEARCH_CACHE_SIZE = 64
+
+# maps path to the number of writes made to it by this process; see
+# get_write_count
+_write_counts = collections.Counter()
+
+
+def get_write_count(path: str) -> int:
+    '''Get the number of writes made through this process to the
+    objects at the given path, e.g. ``klassifikation/klasse``, for
+    keying caches of them.'''
+    return _write_counts[path]
+
 
 def _check_response(r):
     if not r.ok:
@@ -47,6 +69,15 @@ def _check_response(r):
     return r
 
 
+def _get_response_size(r) -> int:
+    '''Obtain the number of bytes received for the given response so
+    far, without reading any more of it.'''
+    try:
+        return r.raw.tell()
+    except (AttributeError, OSError):
+        return 0
+
+
 class Connector:
 
     scope_map = dict(
@@ -138,8 +169,11 @@ class Scope:
     def __init__(self, connector, path):
         self.connector = connector
         self.path = path
+        self.timing_name = 'lora.' + path.rpartition('/')[2]
         self.max_uuids = self._calculate_max_uuids()
 
+        responsecache.add_tag(path)
+
     @property
     def base_path(self):
         return settings.LORA_URL + self.path
@@ -169,19 +203,34 @@ class Scope:
         max_uuids = int(available_length / per_length)
         return max_uuids
 
+    def _record(self, start: float, r):
+        timing.record(self.timing_name, time.perf_counter() - start,
+                      _get_response_size(r), r.request.method)
+
     def fetch(self, **params):
+        start = time.perf_counter()
         r = session.get(self.base_path, params={
             **self.connector.defaults,
             **params,
         })
+        self._record(start, r)
 
         _check_response(r)
 
         try:
-            return r.json()['results'][0]
+            results = r.json()['results'][0]
         except IndexError:
             return []
 
+        for result in results:
+            if isinstance(result, dict):
+                for reg in result['registreringer']:
+                    conditional.add_registration(result['id'], reg)
+            else:
+                conditional.add_registration(result)
+
+        return results
+
     __call__ = fetch
 
     def get_all(self, **params):
@@ -223,9 +272,61 @@ class Scope:
             for d in self.fetch(uuid=chunk):
                 yield d['id'], (d['registreringer'][0])
 
+    def search(self, **params) -> typing.List[str]:
+        """Search for the UUIDs of the objects matching the given params,
+        sorted, as LoRa doesn't return them in any particular order.
+
+        To avoid repeating the search while paging through a large
+        result set, the UUIDs are cached per scope, search and
+        effective date for ``lora.search_cache_ttl`` seconds, or until
+        an object of the scope is written through this process; set
+        that to zero to disable the cache. The returned list is
+        shared, and must not be modified.
+        """
+        ttl = settings.config['lora']['search_cache_ttl']
+        key = (
+            self.path,
+            get_write_count(self.path),
+            self.connector.validity,
+            self.connector.now.date(),
+            tuple(sorted(
+                (k, tuple(v) if isinstance(v, (list, tuple, set)) else v)
+                for k, v in params.items()
+            )),
+        )
+        now = time.monotonic()
+
+        try:
+            timestamp, uuids = _search_cache[key]
+        except KeyError:
+            pass
+        else:
+            if now - timestamp < ttl:
+                metrics.observe_cache('lora_search', True)
+                return uuids
+
+        metrics.observe_cache('lora_search', False)
+
+        uuids = sorted(self.fetch(**params))
+
+        if ttl > 0:
+            _search_cache[key] = now, uuids
+            _search_cache.move_to_end(key)
+
+            while len(_search_cache) > _SEARCH_CACHE_SIZE:
+                _search_cache.popitem(last=False)
+
+        return uuids
+
+    def count(self, **params) -> int:
+        """Count the number of objects matching the given search params,
+        using :py:meth:`search`."""
+        return len(self.search(**params))
+
     def paged_get(self, func, *,
                   start=0, limit=settings.DEFAULT_PAGE_SIZE,
                   uuid_filters=None,
+                  lazy_items=False,
                   **params):
         """Perform a search on given params, filter and return the result.
 
@@ -235,31 +336,36 @@ class Scope:
         :code:`uuid_filters` is a list of functions from uuid to bool, where
         the uuid will be kept assuming the returned bool is truthy.
 
+        The UUIDs matching the search are obtained from
+        :py:meth:`search`, so that paging through them only searches
+        LoRa once, and the pages are consistent.
+
         Returns paged dict with 3 keys: 'total', 'offset' and 'items', where:
             'total' is the total number of matches found.
             'offset' is the offset into 'total' (for pagination).
-            'items' is a list of :code:`item-type` items.
+            'items' is a list of :code:`item-type` items, or an iterator
+            of them if :code:`lazy_items` is set.
         """
         uuid_filters = uuid_filters or []
         # Fetch all uuids matching search params and filter with uuid_filters
-        uuids = self.fetch(**params)
+        uuids = self.search(**params)
         for uuid_filter in uuid_filters:
             uuids = filter(uuid_filter, uuids)
-        # Sort to ensure consistent order, as LoRa does not seem to do that
-        uuids = sorted(list(uuids))
+        uuids = list(uuids)
         total = len(uuids)
         # Offset by slicing off the start
         uuids = uuids[start:]
         # Limit by slicing off the end
         if limit > 0:
             uuids = uuids[:limit]
+
         # Lookup objects by uuid, and build objects using func
         obj_iter = self.get_all_by_uuid(uuids)
         obj_iter = starmap(partial(func, self.connector), obj_iter)
         return {
             'total': total,
             'offset': start,
-            'items': list(obj_iter)
+            'items': obj_iter if lazy_items else list(obj_iter)
         }
 
     def get(self, uuid, **params):
@@ -280,25 +386,38 @@ class Scope:
             return registrations[0]
 
     def create(self, obj, uuid=None):
+        start = time.perf_counter()
+
         if uuid:
             r = session.put('{}/{}'.format(self.base_path, uuid),
                             json=obj)
         else:
             r = session.post(self.base_path, json=obj)
 
+        self._record(start, r)
+        responsecache.invalidate(self.path)
+        _write_counts[self.path] += 1
         _check_response(r)
         return r.json()['uuid']
 
     def delete(self, uuid):
+        start = time.perf_counter()
         r = session.delete('{}/{}'.format(self.base_path, uuid))
+        self._record(start, r)
+        responsecache.invalidate(self.path)
+        _write_counts[self.path] += 1
         _check_response(r)
 
     def update(self, obj, uuid):
+        start = time.perf_counter()
         r = session.request(
             'PATCH',
             '{}/{}'.format(self.base_path, uuid),
             json=obj,
         )
+        self._record(start, r)
+        responsecache.invalidate(self.path)
+        _write_counts[self.path] += 1
         _check_response(r)
         return r.json()['uuid']
 
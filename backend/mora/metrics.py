@@ -0,0 +1,161 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Metrics
+-------
+
+This module exposes metrics of the requests handled by MO, and the
+calls it makes to LoRa and other backends, at ``/metrics`` in the
+format expected by Prometheus.
+
+When running multiple worker processes, e.g. in gunicorn, the
+environment variable ``prometheus_multiproc_dir`` should point to an
+empty directory -- preferably in memory, such as in ``/dev/shm`` --
+shared by the workers. Each worker then stores its metrics there, and
+``/metrics`` aggregates them. See ``docker/gunicorn-settings.py``.
+
+'''
+
+import os
+import time
+import typing
+
+import flask
+import prometheus_client
+from prometheus_client import multiprocess
+
+from . import util
+
+blueprint = flask.Blueprint('metrics', __name__, static_url_path='')
+
+REQUEST_DURATION = prometheus_client.Histogram(
+    'mo_request_duration_seconds',
+    'Duration of requests, per endpoint and role type',
+    ['endpoint', 'method', 'role_type'],
+)
+
+REQUESTS_IN_PROGRESS = prometheus_client.Gauge(
+    'mo_requests_in_progress',
+    'Number of requests currently being handled',
+    multiprocess_mode='livesum',
+)
+
+BACKEND_CALL_DURATION = prometheus_client.Histogram(
+    'mo_backend_call_duration_seconds',
+    'Duration of calls to LoRa, per scope, and other backends',
+    ['backend', 'method'],
+)
+
+CACHE_REQUESTS = prometheus_client.Counter(
+    'mo_cache_requests_total',
+    'Number of cache lookups, per cache and result',
+    ['cache', 'result'],
+)
+
+AMQP_PUBLISH_DURATION = prometheus_client.Histogram(
+    'mo_amqp_publish_duration_seconds',
+    'Duration of publishing AMQP messages',
+)
+
+AMQP_PUBLISH_FAILURES = prometheus_client.Counter(
+    'mo_amqp_publish_failures_total',
+    'Number of AMQP messages which could not be published',
+)
+
+UNCHANGED_EDITS = prometheus_client.Counter(
+    'mo_unchanged_edits_total',
+    'Number of edits skipped for not changing anything, per role type',
+    ['role_type'],
+)
+
+COALESCED_EDITS = prometheus_client.Counter(
+    'mo_coalesced_edits_total',
+    'Number of edits folded into another edit of the same object, '
+    'per role type',
+    ['role_type'],
+)
+
+
+def observe_call(backend: str, method: str, duration: float):
+    '''Record a call to LoRa or another backend.'''
+    BACKEND_CALL_DURATION.labels(backend, method).observe(duration)
+
+
+def observe_cache(cache: str, hit: bool):
+    '''Record a lookup in the given cache.'''
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def set_role_types(role_types: typing.Collection[str]):
+    '''Set the role types handled by the current request, for
+    labelling its duration.'''
+    if not flask.has_request_context():
+        return
+
+    if len(role_types) == 1:
+        (flask.g.metrics_role_type,) = role_types
+    elif role_types:
+        flask.g.metrics_role_type = 'multiple'
+
+
+def _get_role_type() -> str:
+    try:
+        return flask.g.metrics_role_type
+    except AttributeError:
+        # the details of the given type read by the detail endpoints
+        return (flask.request.view_args or {}).get('function', '')
+
+
+def _start_request():
+    REQUESTS_IN_PROGRESS.inc()
+
+    flask.g.metrics_start = time.perf_counter()
+
+
+def _finish_request(exc: typing.Optional[BaseException]):
+    try:
+        start = flask.g.pop('metrics_start')
+    except KeyError:
+        return
+
+    REQUESTS_IN_PROGRESS.dec()
+
+    rule = flask.request.url_rule
+
+    REQUEST_DURATION.labels(
+        rule.rule if rule else '',
+        flask.request.method,
+        _get_role_type(),
+    ).observe(time.perf_counter() - start)
+
+
+def register(app: flask.Flask):
+    '''Record metrics of the requests handled by the given app.'''
+    app.before_request(_start_request)
+    app.teardown_request(_finish_request)
+
+
+def _get_registry() -> prometheus_client.CollectorRegistry:
+    if 'prometheus_multiproc_dir' in os.environ:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+
+        return registry
+    else:
+        return prometheus_client.REGISTRY
+
+
+@blueprint.route('/metrics')
+@util.restrictargs()
+def get_metrics():
+    '''Expose metrics in the Prometheus text format.
+
+    .. :quickref: Metrics; Get metrics
+
+    :statuscode 200: Always.
+
+    '''
+    return flask.Response(
+        prometheus_client.generate_latest(_get_registry()),
+        content_type=prometheus_client.CONTENT_TYPE_LATEST,
+    )
@@ -0,0 +1,120 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Profiling of requests
+---------------------
+
+Individual requests can be profiled by sending them with an
+``X-Profile`` header. The request is then handled under
+:py:mod:`cProfile`, and the profile is written to the directory given
+by ``profiling.directory`` as ``<id>.prof``, alongside a summary of the
+request and its calls to LoRa and other backends in ``<id>.json``. The
+id is returned in the ``X-Profile-Id`` header of the response.
+
+Profiling is disabled unless a directory is configured. When using
+SAML, only the users listed in ``profiling.users`` may profile
+requests; the header is ignored for anyone else.
+
+'''
+
+import cProfile
+import datetime
+import json
+import logging
+import os
+import time
+import uuid
+
+import flask
+
+from . import settings
+from . import timing
+from .auth import base
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+
+def is_allowed() -> bool:
+    '''Determine whether the current user may profile requests.'''
+    if not flask.current_app.config['SAML_AUTH_ENABLE']:
+        return True
+    else:
+        return base.get_username() in settings.config['profiling']['users']
+
+
+def _start_request():
+    if (
+        PROFILE_HEADER not in flask.request.headers or
+        not settings.config['profiling']['directory']
+    ):
+        return
+
+    if not is_allowed():
+        logger.warning('ignoring request to profile %s %s',
+                       flask.request.method, flask.request.full_path)
+        return
+
+    flask.g.profile_start = time.perf_counter()
+    flask.g.profiler = cProfile.Profile()
+    flask.g.profiler.enable()
+
+
+def _finish_request(response: flask.Response) -> flask.Response:
+    profiler = flask.g.pop('profiler', None)
+
+    if profiler is None:
+        return response
+
+    profiler.disable()
+
+    profile_id = str(uuid.uuid4())
+    directory = settings.config['profiling']['directory']
+    path = os.path.join(directory, profile_id)
+
+    summary = {
+        'id': profile_id,
+        'time': datetime.datetime.now().isoformat(),
+        'method': flask.request.method,
+        'path': flask.request.full_path,
+        'status': response.status_code,
+        'duration': round(
+            (time.perf_counter() - flask.g.profile_start) * 1000, 1,
+        ),
+        'calls': {
+            name: stats.to_dict()
+            for name, stats in sorted(timing.get_calls().items())
+        },
+    }
+
+    os.makedirs(directory, exist_ok=True)
+
+    profiler.dump_stats(path + '.prof')
+
+    with open(path + '.json', 'w') as fp:
+        json.dump(summary, fp, indent=2)
+
+    logger.info('profiled %s %s as %s', flask.request.method,
+                flask.request.full_path, profile_id)
+
+    response.headers[PROFILE_ID_HEADER] = profile_id
+
+    return response
+
+
+def _teardown_request(exc):
+    # ensure that we stop profiling, even if the request failed
+    # without a response
+    profiler = flask.g.pop('profiler', None)
+
+    if profiler is not None:
+        profiler.disable()
+
+
+def register(app: flask.Flask):
+    '''Enable profiling of requests handled by the given app.'''
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
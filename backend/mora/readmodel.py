@@ -0,0 +1,615 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Local read model of the organisation
+-------------------------------------
+
+Every read of a unit, an employee or one of their engagements,
+associations, managers, addresses &c. is a round trip to LoRa, which
+then searches its bitemporal tables. With ``read_model.enable`` set,
+MO instead keeps a copy of the current registrations of all units,
+employees and functions in the SQLite database at ``read_model.path``,
+and answers the lookups and searches of the reading handlers from it;
+see :py:class:`ReadModelScope`. Any other read still goes to LoRa.
+
+The copy holds the full validity of each object, and a read selects
+the values in effect in the period of the connector, much like LoRa
+does. It is kept up to date in three ways:
+
+* ``python -m mora.cli read-model load`` copies everything from LoRa,
+  and must be run before the model is used;
+* every write made through MO refreshes the objects written; and
+* ``python -m mora.cli read-model follow`` refreshes the objects
+  named by the AMQP messages of other MO instances.
+
+Writing to LoRa by other means bypasses all of these, which is what
+``python -m mora.cli read-model check`` is for: it compares the model
+to LoRa, and repairs any difference found.
+
+The database is shared by all workers on a host, so that they see the
+same writes.
+
+'''
+
+import json
+import logging
+import random
+import sqlite3
+import threading
+import typing
+import uuid
+
+from . import conditional
+from . import exceptions
+from . import exporting
+from . import lora
+from . import mapping
+from . import settings
+from . import triggers
+from . import util
+
+logger = logging.getLogger(__name__)
+
+#: the scopes copied into the read model
+SCOPES = ('organisationenhed', 'bruger', 'organisationfunktion')
+
+# the relations and attributes indexed for searching
+_INDEXED_RELATIONS = frozenset({
+    'overordnet',
+    'tilhoerer',
+    'tilknyttedeenheder',
+    'tilknyttedebrugere',
+    'tilknyttedeorganisationer',
+    'tilknyttedeitsystemer',
+    'organisatoriskfunktionstype',
+    'enhedstype',
+})
+_INDEXED_ATTRIBUTES = frozenset({'funktionsnavn'})
+_SEARCH_PARAMS = _INDEXED_RELATIONS | _INDEXED_ATTRIBUTES | {'gyldighed'}
+
+# the defaults of a connector whose reads we can answer
+_CONNECTOR_DEFAULTS = {'virkningfra', 'virkningtil', 'konsolider'}
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS objects (
+    scope TEXT NOT NULL,
+    uuid TEXT NOT NULL,
+    registration TEXT NOT NULL,
+    PRIMARY KEY (scope, uuid)
+);
+
+CREATE TABLE IF NOT EXISTS keys (
+    scope TEXT NOT NULL,
+    uuid TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS keys_value ON keys (scope, name, value);
+CREATE INDEX IF NOT EXISTS keys_object ON keys (scope, uuid);
+
+CREATE TABLE IF NOT EXISTS loaded (
+    scope TEXT PRIMARY KEY,
+    time TEXT NOT NULL
+);
+'''
+
+_local = threading.local()
+
+
+def _get_keys(reg: dict) -> typing.Iterator[typing.Tuple[str, str]]:
+    '''Yield the indexed (name, value) pairs of a registration.'''
+    for name, rels in reg.get('relationer', {}).items():
+        if name in _INDEXED_RELATIONS:
+            for rel in rels:
+                value = rel.get('uuid') or rel.get('urn')
+
+                if value:
+                    yield name, value
+
+    for attrs in reg.get('attributter', {}).values():
+        for attr in attrs:
+            for name in _INDEXED_ATTRIBUTES & attr.keys():
+                yield name, attr[name].casefold()
+
+
+def _is_in_effect(value: dict, start, end) -> bool:
+    virkning = value.get('virkning')
+
+    if not virkning:
+        return True
+
+    return util.do_ranges_overlap(
+        util.parsedatetime(virkning['from']),
+        util.parsedatetime(virkning['to']),
+        start, end,
+    )
+
+
+def select(reg: dict, start, end) -> dict:
+    '''Select the values of a registration in effect in the given
+    period, as LoRa does when reading with ``virkningfra`` and
+    ``virkningtil``.'''
+    result = dict(reg)
+
+    for category in ('attributter', 'tilstande', 'relationer'):
+        if category in reg:
+            result[category] = {}
+
+            for name, values in reg[category].items():
+                values = [v for v in values if _is_in_effect(v, start, end)]
+
+                if values:
+                    result[category][name] = values
+
+    return result
+
+
+def _matches(reg: dict, params: dict) -> bool:
+    for name, value in params.items():
+        if name == 'gyldighed':
+            values = {
+                state.get('gyldighed')
+                for states in reg.get('tilstande', {}).values()
+                for state in states
+            }
+        elif name in _INDEXED_ATTRIBUTES:
+            value = value.casefold()
+            values = {
+                attr[name].casefold()
+                for attrs in reg.get('attributter', {}).values()
+                for attr in attrs
+                if attr.get(name)
+            }
+        else:
+            values = {
+                rel.get('uuid') or rel.get('urn')
+                for rel in reg.get('relationer', {}).get(name, ())
+            }
+
+        if value not in values:
+            return False
+
+    return True
+
+
+class ReadModel:
+    '''The copy of LoRa in a SQLite database.
+
+    Each method writing to the model leaves committing to the caller,
+    who should use the connection in :py:attr:`db` as a context
+    manager.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=30)
+        # let the workers read while another one writes
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(_SCHEMA)
+
+        self._loaded = False
+
+    def close(self):
+        self.db.close()
+
+    def is_loaded(self) -> bool:
+        '''Whether all scopes have been loaded.'''
+        if not self._loaded:
+            count, = self.db.execute('SELECT COUNT(*) FROM loaded').fetchone()
+            self._loaded = count >= len(SCOPES)
+
+        return self._loaded
+
+    def get(self, scope: str, objid: str) -> typing.Optional[dict]:
+        row = self.db.execute(
+            'SELECT registration FROM objects WHERE scope = ? AND uuid = ?',
+            (scope, objid),
+        ).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, scope: str,
+                 objids: typing.Iterable[str]) -> typing.Dict[str, dict]:
+        objids = list(objids)
+        result = {}
+
+        # stay well below the limit on the number of query parameters
+        for i in range(0, len(objids), 500):
+            chunk = objids[i:i + 500]
+
+            result.update(
+                (objid, json.loads(reg))
+                for objid, reg in self.db.execute(
+                    'SELECT uuid, registration FROM objects '
+                    'WHERE scope = ? AND uuid IN ({})'.format(
+                        ', '.join('?' * len(chunk)),
+                    ),
+                    (scope, *chunk),
+                )
+            )
+
+        return result
+
+    def search(self, scope: str, name: str,
+               value: str) -> typing.Iterator[typing.Tuple[str, dict]]:
+        '''Yield the objects having the given value of an indexed
+        relation or attribute at any time.'''
+        if name in _INDEXED_ATTRIBUTES:
+            value = value.casefold()
+
+        for objid, reg in self.db.execute(
+            'SELECT DISTINCT o.uuid, o.registration '
+            'FROM keys k JOIN objects o ON o.scope = k.scope AND o.uuid = k.uuid '
+            'WHERE k.scope = ? AND k.name = ? AND k.value = ? '
+            'ORDER BY o.uuid',
+            (scope, name, value),
+        ):
+            yield objid, json.loads(reg)
+
+    def get_uuids(self, scope: str) -> typing.Set[str]:
+        return {
+            objid
+            for objid, in self.db.execute(
+                'SELECT uuid FROM objects WHERE scope = ?', (scope,),
+            )
+        }
+
+    def put(self, scope: str, objid: str, reg: typing.Optional[dict]):
+        '''Store the given registration of an object, or remove the
+        object if it is :code:`None`.'''
+        self.db.execute('DELETE FROM keys WHERE scope = ? AND uuid = ?',
+                        (scope, objid))
+
+        if reg is None:
+            self.db.execute('DELETE FROM objects WHERE scope = ? AND uuid = ?',
+                            (scope, objid))
+            return
+
+        self.db.execute(
+            'INSERT OR REPLACE INTO objects (scope, uuid, registration) '
+            'VALUES (?, ?, ?)',
+            (scope, objid, json.dumps(reg)),
+        )
+        self.db.executemany(
+            'INSERT INTO keys (scope, uuid, name, value) VALUES (?, ?, ?, ?)',
+            ((scope, objid, name, value) for name, value in _get_keys(reg)),
+        )
+
+    def replace(self, scope: str,
+                objects: typing.Iterable[typing.Tuple[str, dict]]) -> int:
+        '''Replace all objects of a scope with the given ones.
+
+        :return: The number of objects stored.
+        '''
+        self.db.execute('DELETE FROM keys WHERE scope = ?', (scope,))
+        self.db.execute('DELETE FROM objects WHERE scope = ?', (scope,))
+
+        count = 0
+
+        for objid, reg in objects:
+            self.put(scope, objid, reg)
+            count += 1
+
+        self.db.execute(
+            'INSERT OR REPLACE INTO loaded (scope, time) VALUES (?, ?)',
+            (scope, util.now().isoformat()),
+        )
+
+        return count
+
+
+class ReadModelScope(lora.Scope):
+    '''A scope answering lookups by UUID and simple searches from the
+    read model, and everything else from LoRa.'''
+
+    def __init__(self, connector: lora.Connector, name: str,
+                 model: ReadModel):
+        super().__init__(connector, connector.scope_map[name])
+        self.name = name
+        self.model = model
+
+    def _select(self, objid: str, reg: dict) -> dict:
+        conditional.add_registration(objid, reg)
+
+        return select(reg, self.connector.start, self.connector.end)
+
+    def _search(self, params) -> typing.Optional[
+            typing.List[typing.Tuple[str, dict]]]:
+        params = {
+            k: str(v) if isinstance(v, uuid.UUID) else v
+            for k, v in params.items()
+        }
+
+        if (
+            not params.keys() <= _SEARCH_PARAMS or
+            not all(isinstance(v, str) and '%' not in v
+                    for v in params.values())
+        ):
+            return None
+
+        # relations are far more selective than names of functions
+        name = min(
+            params.keys() - {'gyldighed'},
+            key=lambda k: (k in _INDEXED_ATTRIBUTES, k),
+            default=None,
+        )
+
+        if name is None:
+            # we don't search all objects
+            return None
+
+        return [
+            (objid, reg)
+            for objid, reg in (
+                (objid, self._select(objid, reg))
+                for objid, reg in self.model.search(self.name, name,
+                                                    params[name])
+            )
+            if _matches(reg, params)
+        ]
+
+    def fetch(self, **params):
+        results = self._search(params)
+
+        if results is None:
+            return super().fetch(**params)
+
+        return [objid for objid, reg in results]
+
+    __call__ = fetch
+
+    def get(self, uuid, **params):
+        reg = None if params else self.model.get(self.name, str(uuid))
+
+        if reg is None:
+            # perhaps created elsewhere, and not received yet
+            return super().get(uuid, **params)
+
+        return self._select(uuid, reg)
+
+    def get_all(self, **params):
+        results = self._search(params)
+
+        if results is None:
+            return super().get_all(**params)
+
+        return iter(results)
+
+    def get_all_by_uuid(self, uuids: typing.List, elements_per_chunk=None):
+        uuids = list(map(str, uuids))
+        regs = self.model.get_many(self.name, uuids)
+
+        if not regs.keys() >= set(uuids):
+            return super().get_all_by_uuid(uuids, elements_per_chunk)
+
+        return (
+            (objid, self._select(objid, regs[objid]))
+            for objid in uuids
+        )
+
+
+def is_enabled() -> bool:
+    return settings.config['read_model']['enable']
+
+
+def get_model() -> ReadModel:
+    '''Get the read model, opened for the current thread.'''
+    path = settings.config['read_model']['path']
+
+    if not path:
+        raise exceptions.ImproperlyConfigured(
+            'the read model requires read_model.path',
+        )
+
+    model = getattr(_local, 'model', None)
+
+    if model is None or model.path != path:
+        model = _local.model = ReadModel(path)
+
+    return model
+
+
+def close():
+    '''Close the read model of the current thread, if open, e.g. before
+    forking.'''
+    model = getattr(_local, 'model', None)
+
+    if model is not None:
+        model.close()
+        _local.model = None
+
+
+def attach(c: lora.Connector) -> bool:
+    '''Make the given connector read from the read model, if it is
+    enabled and loaded.
+
+    :return: Whether the connector reads from the read model.
+    '''
+    if not is_enabled() or not c.defaults.keys() <= _CONNECTOR_DEFAULTS:
+        return False
+
+    model = get_model()
+
+    if not model.is_loaded():
+        return False
+
+    for name in SCOPES:
+        setattr(c, name, ReadModelScope(c, name, model))
+
+    return True
+
+
+def _get_connector() -> lora.Connector:
+    '''Get a connector reading the full validity of objects.'''
+    return lora.Connector(virkningfra='-infinity', virkningtil='infinity')
+
+
+def load(scopes: typing.Iterable[str] = SCOPES) -> typing.Dict[str, int]:
+    '''Copy all objects of the given scopes from LoRa.
+
+    Each scope is replaced in a single transaction, so that the
+    workers keep reading the previous copy until it completes.
+
+    :return: The number of objects copied, by scope.
+    '''
+    c = _get_connector()
+    model = get_model()
+    result = {}
+
+    for scope in scopes:
+        with model.db:
+            result[scope] = model.replace(
+                scope,
+                exporting.iter_objects(getattr(c, scope), bvn='%'),
+            )
+
+        logger.info('loaded %d objects of %s', result[scope], scope)
+
+    return result
+
+
+def refresh(scope: str, objids: typing.Iterable[str],
+            c: lora.Connector = None):
+    '''Read the given objects from LoRa into the read model.'''
+    c = c or _get_connector()
+    objids = set(map(str, objids))
+    regs = dict(getattr(c, scope).get_all_by_uuid(sorted(objids)))
+    model = get_model()
+
+    with model.db:
+        for objid in objids:
+            model.put(scope, objid, regs.get(objid))
+
+
+def refresh_related(service: str, objid: str):
+    '''Read the given employee or unit from LoRa into the read model,
+    along with all of its functions.'''
+    c = _get_connector()
+
+    if service == mapping.EMPLOYEE:
+        scope, relation = 'bruger', 'tilknyttedebrugere'
+    else:
+        assert service == mapping.ORG_UNIT, service
+        scope, relation = 'organisationenhed', 'tilknyttedeenheder'
+
+    funcs = dict(c.organisationfunktion.get_all(**{relation: objid}))
+    reg = getattr(c, scope).get(objid)
+    model = get_model()
+
+    with model.db:
+        model.put(scope, objid, reg)
+
+        for funcid, func in funcs.items():
+            model.put('organisationfunktion', funcid, func)
+
+
+def check(sample: int = 100) -> typing.Dict[str, typing.List[str]]:
+    '''Compare the read model to LoRa, and repair any difference.
+
+    All UUIDs of each scope are compared, as are the registrations of
+    a random sample of the objects.
+
+    :return: The UUIDs of the objects repaired, by scope.
+    '''
+    c = _get_connector()
+    model = get_model()
+    result = {}
+
+    for scope in SCOPES:
+        stored = model.get_uuids(scope)
+        actual = set(getattr(c, scope).fetch(bvn='%'))
+
+        differing = stored ^ actual
+
+        common = sorted(stored & actual)
+        sampled = random.sample(common, min(sample, len(common)))
+
+        differing.update(
+            objid
+            for objid, reg in getattr(c, scope).get_all_by_uuid(sampled)
+            if reg != model.get(scope, objid)
+        )
+
+        if differing:
+            logger.warning('repairing %d objects of %s', len(differing),
+                           scope)
+            refresh(scope, differing, c)
+
+        result[scope] = sorted(differing)
+
+    return result
+
+
+def _update_after_write(trigger_dict):
+    role_type = trigger_dict[triggers.Trigger.ROLE_TYPE]
+    objid = trigger_dict.get(triggers.Trigger.UUID)
+    userid = trigger_dict.get(triggers.Trigger.EMPLOYEE_UUID)
+    unitid = trigger_dict.get(triggers.Trigger.ORG_UNIT_UUID)
+
+    c = _get_connector()
+
+    if role_type == mapping.EMPLOYEE:
+        userid = userid or objid
+    elif role_type == mapping.ORG_UNIT:
+        unitid = unitid or objid
+    elif objid:
+        refresh('organisationfunktion', [objid], c)
+
+    # writing a function also adds to the history of its employee
+    # and unit
+    if userid:
+        refresh('bruger', [userid], c)
+
+    if unitid:
+        refresh('organisationenhed', [unitid], c)
+
+
+def register():
+    '''Register the trigger refreshing the read model after each write
+    through MO, if it is enabled.'''
+    if not is_enabled():
+        return
+
+    for role_type in (
+        triggers.Trigger.ORG_UNIT,
+        triggers.Trigger.EMPLOYEE,
+        *mapping.RELATION_TRANSLATIONS.keys(),
+    ):
+        for request_type in triggers.Trigger.RequestType:
+            triggers.Trigger.on(
+                role_type, request_type, triggers.Trigger.Event.ON_AFTER,
+            )(_update_after_write)
+
+
+def follow():
+    '''Refresh the read model from the AMQP messages sent by MO, until
+    interrupted.'''
+    import pika
+
+    connection = pika.BlockingConnection(
+        pika.ConnectionParameters(
+            host=settings.config['amqp']['host'],
+            port=settings.config['amqp']['port'],
+        )
+    )
+    channel = connection.channel()
+    channel.exchange_declare(exchange=settings.AMQP_OS2MO_EXCHANGE,
+                             exchange_type='topic')
+    queue = channel.queue_declare('', exclusive=True).method.queue
+    channel.queue_bind(queue, settings.AMQP_OS2MO_EXCHANGE, routing_key='#')
+
+    try:
+        for method, properties, body in channel.consume(queue):
+            service = method.routing_key.partition('.')[0]
+
+            try:
+                refresh_related(service, json.loads(body)['uuid'])
+            except Exception:
+                # the next check repairs what we missed
+                logger.exception('failed to refresh %s from %r',
+                                 method.routing_key, body)
+
+            channel.basic_ack(method.delivery_tag)
+    finally:
+        connection.close()
@@ -0,0 +1,335 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Shared cache of responses
+-------------------------
+
+The lists of facets, classes and IT systems, and the children of units,
+change rarely, yet every user of the UI asks for them, most of them in
+the morning. Endpoints decorated with :py:func:`cached` store their
+responses in the SQLite database at ``response_cache.path``, which all
+workers on a host share, for up to ``response_cache.ttl`` seconds.
+Responses are cached by path, arguments and the current date.
+
+Each response is tagged with the kinds of LoRa objects read while
+producing it -- units, classes &c. -- as recorded by
+:py:class:`mora.lora.Scope`, and writing an object through MO discards
+the responses tagged with its kind. Writes made to LoRa by other means
+only show once the responses expire.
+
+Responses may be built from the snapshots and classes cached by each
+worker, which only the worker writing knows to discard. So each worker
+discards its own as well, before building a response to cache, if
+anything was invalidated since it last did so.
+
+Set either setting to an empty value to disable the cache.
+
+'''
+
+import functools
+import json
+import sqlite3
+import threading
+import time
+import typing
+
+import flask
+
+from . import metrics
+from . import settings
+from . import util
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    expires REAL NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag);
+CREATE INDEX IF NOT EXISTS tags_key ON tags (key);
+
+-- incremented on each invalidation, so that responses read before a
+-- write aren't stored after it
+CREATE TABLE IF NOT EXISTS generation (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    value INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO generation (id, value) VALUES (0, 0);
+
+-- what the responses were built from; see mora.conditional
+CREATE TABLE IF NOT EXISTS validators (
+    key TEXT PRIMARY KEY,
+    expires REAL NOT NULL,
+    generation INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    units TEXT NOT NULL
+);
+'''
+
+# headers recomputed for each response
+_SKIPPED_HEADERS = {'content-length'}
+
+_local = threading.local()
+
+# the generation as of when the caches of this process were last
+# discarded; see _discard_local_caches
+_local_generation = None
+
+
+class ResponseCache:
+    '''The responses cached in a SQLite database.'''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def get_generation(self) -> int:
+        value, = self.db.execute(
+            'SELECT value FROM generation',
+        ).fetchone()
+
+        return value
+
+    def get(self, key: str) -> typing.Optional[flask.Response]:
+        row = self.db.execute(
+            'SELECT status, headers, body FROM responses '
+            'WHERE key = ? AND expires > ?',
+            (key, time.time()),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        status, headers, body = row
+
+        return flask.current_app.response_class(
+            body, status=status, headers=json.loads(headers),
+        )
+
+    def put(self, key: str, response: flask.Response,
+            tags: typing.Iterable[str], generation: int, ttl: float):
+        '''Store the given response, unless anything was invalidated
+        since reading the given generation.'''
+        headers = [
+            (k, v) for k, v in response.headers.items()
+            if k.lower() not in _SKIPPED_HEADERS
+        ]
+
+        with self.db:
+            if self.get_generation() != generation:
+                return
+
+            self.db.execute('DELETE FROM tags WHERE key = ?', (key,))
+            self.db.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(key, expires, status, headers, body) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, time.time() + ttl, response.status_code,
+                 json.dumps(headers), response.get_data()),
+            )
+            self.db.executemany(
+                'INSERT INTO tags (tag, key) VALUES (?, ?)',
+                ((tag, key) for tag in sorted(tags)),
+            )
+
+    def get_validator(self, key: str) -> typing.Optional[
+            typing.Tuple[str, typing.List[str]]]:
+        '''Get the digest of the objects the given response was built
+        from, and the units whose settings it read, unless anything was
+        invalidated since.'''
+        row = self.db.execute(
+            'SELECT digest, units FROM validators '
+            'WHERE key = ? AND expires > ? AND generation = '
+            '(SELECT value FROM generation)',
+            (key, time.time()),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        digest, units = row
+
+        return digest, json.loads(units)
+
+    def put_validator(self, key: str, digest: str,
+                      units: typing.List[str], generation: int,
+                      ttl: float):
+        '''Store what the given response was built from, unless
+        anything was invalidated since reading the given generation.'''
+        with self.db:
+            if self.get_generation() != generation:
+                return
+
+            self.db.execute(
+                'INSERT OR REPLACE INTO validators '
+                '(key, expires, generation, digest, units) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, time.time() + ttl, generation, digest,
+                 json.dumps(units)),
+            )
+
+    def invalidate(self, tags: typing.Iterable[str]):
+        tags = list(tags)
+        marks = ', '.join('?' * len(tags))
+
+        with self.db:
+            self.db.execute(
+                'UPDATE generation SET value = value + 1',
+            )
+            self.db.execute(
+                'DELETE FROM responses WHERE key IN '
+                '(SELECT key FROM tags WHERE tag IN ({}))'.format(marks),
+                tags,
+            )
+            self.db.execute(
+                'DELETE FROM tags WHERE key NOT IN '
+                '(SELECT key FROM responses)',
+            )
+            # expired responses go the same way
+            self.db.execute('DELETE FROM responses WHERE expires <= ?',
+                            (time.time(),))
+            # as do all validators, which the new generation voids
+            self.db.execute('DELETE FROM validators')
+
+    def clear(self):
+        with self.db:
+            self.db.execute('UPDATE generation SET value = value + 1')
+            self.db.execute('DELETE FROM responses')
+            self.db.execute('DELETE FROM tags')
+            self.db.execute('DELETE FROM validators')
+
+
+def is_enabled() -> bool:
+    config = settings.config['response_cache']
+
+    return bool(config['path']) and config['ttl'] > 0
+
+
+def get_cache() -> ResponseCache:
+    '''Get the response cache, opened for the current thread.'''
+    path = settings.config['response_cache']['path']
+    cache = getattr(_local, 'cache', None)
+
+    if cache is None or cache.path != path:
+        cache = _local.cache = ResponseCache(path)
+
+    return cache
+
+
+def close():
+    '''Close the response cache of the current thread, if open, e.g.
+    before forking.'''
+    cache = getattr(_local, 'cache', None)
+
+    if cache is not None:
+        cache.close()
+        _local.cache = None
+
+
+def add_tag(tag: str):
+    '''Tag the response of the current request, if it is to be
+    cached.'''
+    if flask.has_request_context():
+        tags = flask.g.get('response_cache_tags')
+
+        if tags is not None:
+            tags.add(tag)
+
+
+def invalidate(*tags: str):
+    '''Discard all cached responses with any of the given tags.'''
+    if is_enabled():
+        get_cache().invalidate(tags)
+
+
+def clear():
+    '''Discard all cached responses.'''
+    if is_enabled():
+        get_cache().clear()
+
+
+def mark_local_caches():
+    '''Note that the caches of this process are current, e.g. as they
+    are about to be filled before forking workers.'''
+    global _local_generation
+
+    if is_enabled():
+        _local_generation = get_cache().get_generation()
+
+
+def _discard_local_caches(generation: int):
+    global _local_generation
+
+    if generation == _local_generation:
+        return
+
+    # imported here, as both import lora, which imports this module
+    from . import snapshot
+    from .service import facet
+
+    snapshot.clear()
+    facet.clear_classification_cache()
+
+    _local_generation = generation
+
+
+def get_key() -> str:
+    '''Get the key of the response to the current request.'''
+    request = flask.request
+
+    return json.dumps([
+        request.path,
+        sorted(request.args.items(multi=True)),
+        # unless given 'at', responses show the current date
+        util.now().date().isoformat(),
+    ])
+
+
+def cached(view):
+    '''View decorator caching successful responses in the shared
+    response cache.'''
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_enabled():
+            return view(*args, **kwargs)
+
+        cache = get_cache()
+        key = get_key()
+        generation = cache.get_generation()
+        response = cache.get(key)
+
+        metrics.observe_cache('response', response is not None)
+
+        if response is not None:
+            return response
+
+        _discard_local_caches(generation)
+        flask.g.response_cache_tags = set()
+
+        try:
+            response = flask.make_response(view(*args, **kwargs))
+        finally:
+            tags = flask.g.pop('response_cache_tags')
+
+        if response.status_code == 200 and not response.is_streamed:
+            cache.put(key, response, tags, generation,
+                      settings.config['response_cache']['ttl'])
+
+        return response
+
+    return wrapper
@@ -1,41 +1,69 @@
 # SPDX-FileCopyrightText: 2018-2020 Magenta ApS
 # SPDX-License-Identifier: MPL-2.0
 
-from . import address
-from . import association  # noqa
-from . import cpr
-from . import detail_reading
-from . import detail_writing
-from . import employee
-from . import engagement  # noqa
-from . import exports
-from . import facet
-from . import integration_data
-from . import itsystem
-from . import kle
-from . import leave  # noqa
-from . import manager  # noqa
-from . import org
-from . import orgunit
-from . import related  # noqa
-from . import role  # noqa
-from . import configuration
-from .validation import validate
-
-blueprints = (
-    address.blueprint,
-    cpr.blueprint,
-    detail_reading.blueprint,
-    detail_writing.blueprint,
-    employee.blueprint,
-    exports.blueprint,
-    facet.blueprint,
-    integration_data.blueprint,
-    itsystem.blueprint,
-    kle.blueprint,
-    org.blueprint,
-    orgunit.blueprint,
-    related.blueprint,
-    configuration.blueprint,
-    validate.blueprint,
+'''The service API of MO.
+
+The modules of the API are listed here, and only imported once the app
+is created, so that merely importing this package -- e.g. from the
+command line interface -- doesn't pay for all of them. They are also
+imported when accessed as attributes of this package, e.g.
+``mora.service.orgunit``.
+
+'''
+
+import importlib
+import typing
+
+import flask
+
+#: modules providing a blueprint, relative to this package, in the
+#: order they are registered
+BLUEPRINTS = (
+    'address',
+    'cpr',
+    'detail_reading',
+    'detail_writing',
+    'employee',
+    'exports',
+    'facet',
+    'integration_data',
+    'itsystem',
+    'kle',
+    'org',
+    'orgunit',
+    'related',
+    'configuration',
+    'validation.validate',
+)
+
+#: modules only providing request handlers, which register themselves
+#: when imported
+HANDLERS = (
+    'association',
+    'engagement',
+    'leave',
+    'manager',
+    'role',
 )
+
+
+def get_blueprints() -> typing.List[flask.Blueprint]:
+    '''Import the modules of the service API, and return their
+    blueprints.'''
+    for name in HANDLERS:
+        importlib.import_module('.' + name, __name__)
+
+    return [
+        importlib.import_module('.' + name, __name__).blueprint
+        for name in BLUEPRINTS
+    ]
+
+
+def __getattr__(name: str):
+    for module in BLUEPRINTS + HANDLERS:
+        if module.rpartition('.')[2] == name:
+            return importlib.import_module('.' + module, __name__)
+
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name),
+    )
@@ -18,6 +18,7 @@ from .. import exceptions
 from .. import lora
 from .. import mapping
 from .. import settings
+from .. import timing
 from .. import util
 from ..triggers import Trigger
 
@@ -115,9 +116,8 @@ def address_autocomplete(orgid):
     # apartments etc.
     #
 
-    addrs = collections.OrderedDict(
-        (addr['tekst'], addr['adgangsadresse']['id'])
-        for addr in session.get(
+    with timing.timed('dar'):
+        r = session.get(
             'https://dawa.aws.dk/adgangsadresser/autocomplete',
             # use a list to work around unordered dicts in Python < 3.6
             params=[
@@ -126,19 +126,26 @@ def address_autocomplete(orgid):
                 ('kommunekode', code),
                 ('q', q),
             ],
-        ).json()
+        )
+
+    addrs = collections.OrderedDict(
+        (addr['tekst'], addr['adgangsadresse']['id'])
+        for addr in r.json()
     )
 
-    for addr in session.get(
-        'https://dawa.aws.dk/adresser/autocomplete',
-        # use a list to work around unordered dicts in Python < 3.6
-        params=[
-            ('per_side', settings.AUTOCOMPLETE_ADDRESS_COUNT),
-            ('noformat', '1'),
-            ('kommunekode', code),
-            ('q', q),
-        ],
-    ).json():
+    with timing.timed('dar'):
+        r = session.get(
+            'https://dawa.aws.dk/adresser/autocomplete',
+            # use a list to work around unordered dicts in Python < 3.6
+            params=[
+                ('per_side', settings.AUTOCOMPLETE_ADDRESS_COUNT),
+                ('noformat', '1'),
+                ('kommunekode', code),
+                ('q', q),
+            ],
+        )
+
+    for addr in r.json():
         addrs.setdefault(addr['tekst'], addr['adresse']['id'])
 
     return flask.jsonify([
@@ -244,9 +251,9 @@ class AddressRequestHandler(handlers.OrgFunkRequestHandler):
         data = req.get('data')
         new_from, new_to = util.get_validities(data)
 
-        payload = {
+        payload = common.PayloadBuilder({
             'note': 'Rediger Adresse',
-        }
+        })
 
         number_of_uuids = len(
             list(filter(None, [
@@ -362,7 +369,8 @@ class AddressRequestHandler(handlers.OrgFunkRequestHandler):
                                        original,
                                        payload)
 
-        self.payload = payload
+        self.payload = payload.build()
+        self.original = original
         self.uuid = function_uuid
         self.trigger_dict.update({
             Trigger.ORG_UNIT_UUID: org_unit_uuid,
@@ -8,6 +8,7 @@ import uuid
 from . import base
 from ..validation.validator import forceable
 from ... import exceptions
+from ... import timing
 
 session = requests.Session()
 session.headers = {
@@ -84,15 +85,17 @@ class DARAddressHandler(base.AddressHandler):
             'historik/adresser', 'historik/adgangsadresser'
         ):
             try:
-                r = session.get(
-                    'https://dawa.aws.dk/' + addrtype,
-                    # use a list to work around unordered dicts in Python < 3.6
-                    params=[
-                        ('id', addrid),
-                        ('noformat', '1'),
-                        ('struktur', 'mini'),
-                    ],
-                )
+                with timing.timed('dar'):
+                    r = session.get(
+                        'https://dawa.aws.dk/' + addrtype,
+                        # use a list to work around unordered dicts in
+                        # Python < 3.6
+                        params=[
+                            ('id', addrid),
+                            ('noformat', '1'),
+                            ('struktur', 'mini'),
+                        ],
+                    )
 
                 addrobjs = r.json()
 
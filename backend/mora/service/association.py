@@ -8,7 +8,11 @@ Associations
 This section describes how to interact with employee associations.
 
 '''
+import collections
+import time
+import typing
 import uuid
+from operator import itemgetter
 
 from . import handlers
 from . import org
@@ -16,7 +20,99 @@ from .validation import validator
 from .. import common
 from .. import lora
 from .. import mapping
+from .. import metrics
+from .. import settings
 from .. import util
+from ..triggers import Trigger
+
+# maps (validity, effective date) to (timestamp, set of employee
+# UUIDs); see get_associated_employees
+_associated_employees = collections.OrderedDict()
+_ASSOCIATED_EMPLOYEES_DATES = 8
+
+# the employees an edited association was moved from, in the trigger
+# dict; see _refresh_after_write
+PREVIOUS_EMPLOYEE_UUIDS = 'previous_employee_uuids'
+
+
+def get_associated_employees(c: lora.Connector) -> typing.Set[str]:
+    """Get the UUIDs of all employees with an association at the
+    effective date of the given connector.
+
+    Finding these requires reading every association in LoRa, so the
+    result is kept per validity and effective date for
+    ``lora.associated_employees_cache_ttl`` seconds, and updated after
+    each write of a function through MO; see :py:func:`register`. Other
+    processes only see such writes once their own copy expires.
+    """
+    ttl = settings.config['lora']['associated_employees_cache_ttl']
+    key = (c.validity, c.now.date())
+    now = time.monotonic()
+
+    try:
+        timestamp, employees = _associated_employees[key]
+    except KeyError:
+        pass
+    else:
+        if now - timestamp < ttl:
+            metrics.observe_cache('associated_employees', True)
+            return employees
+
+    metrics.observe_cache('associated_employees', False)
+
+    assocs = c.organisationfunktion.get_all(
+        funktionsnavn=mapping.ASSOCIATION_KEY,
+    )
+    assocs = map(itemgetter(1), assocs)
+    employees = set(map(mapping.USER_FIELD.get_uuid, assocs))
+
+    if ttl > 0:
+        _associated_employees[key] = now, employees
+        _associated_employees.move_to_end(key)
+
+        while len(_associated_employees) > _ASSOCIATED_EMPLOYEES_DATES:
+            _associated_employees.popitem(last=False)
+
+    return employees
+
+
+def refresh_associated_employees(employee_uuids: typing.Iterable[str]):
+    """Update the cached sets of associated employees for the given
+    employees only, rather than discarding them."""
+    employee_uuids = set(filter(None, employee_uuids))
+
+    for (validity, date), (timestamp, employees) in list(
+        _associated_employees.items(),
+    ):
+        c = lora.Connector(effective_date=date, validity=validity)
+
+        for employee_uuid in employee_uuids:
+            if c.organisationfunktion(
+                funktionsnavn=mapping.ASSOCIATION_KEY,
+                tilknyttedebrugere=employee_uuid,
+            ):
+                employees.add(employee_uuid)
+            else:
+                employees.discard(employee_uuid)
+
+
+def _refresh_after_write(trigger_dict):
+    refresh_associated_employees({
+        trigger_dict.get(Trigger.EMPLOYEE_UUID),
+        *trigger_dict.get(PREVIOUS_EMPLOYEE_UUIDS, ()),
+    })
+
+
+def register():
+    '''Register the trigger refreshing the cached associated employees
+    after each write of a function through MO, whether an association
+    or not, and whether written by its own handler or, say, when
+    terminating an employee.'''
+    for role_type in mapping.RELATION_TRANSLATIONS:
+        for request_type in Trigger.RequestType:
+            Trigger.on(
+                role_type, request_type, Trigger.Event.ON_AFTER,
+            )(_refresh_after_write)
 
 
 class AssociationRequestHandler(handlers.OrgFunkRequestHandler):
@@ -91,8 +187,7 @@ class AssociationRequestHandler(handlers.OrgFunkRequestHandler):
         # Get org unit uuid for validation purposes
         org_unit = mapping.ASSOCIATED_ORG_UNIT_FIELD(original)[0]
 
-        payload = dict()
-        payload['note'] = 'Rediger tilknytning'
+        payload = common.PayloadBuilder({'note': 'Rediger tilknytning'})
 
         original_data = req.get('original')
         if original_data:
@@ -153,6 +248,11 @@ class AssociationRequestHandler(handlers.OrgFunkRequestHandler):
             employee = data.get(mapping.PERSON)
             employee_uuid = employee.get('uuid')
 
+            # the previous employee may have lost their association
+            self.trigger_dict[PREVIOUS_EMPLOYEE_UUIDS] = list(
+                mapping.USER_FIELD.get_uuids(original),
+            )
+
             update_fields.append((mapping.USER_FIELD, {'uuid': employee_uuid}))
         else:
             employee = util.get_obj_value(
@@ -189,7 +289,8 @@ class AssociationRequestHandler(handlers.OrgFunkRequestHandler):
                                                           new_from,
                                                           association_uuid)
 
-        self.payload = payload
+        self.payload = payload.build()
+        self.original = original
         self.uuid = association_uuid
         self.trigger_dict.update({
             "employee_uuid": employee_uuid,
@@ -25,6 +25,7 @@ import flask
 
 from . import handlers
 from .. import common
+from .. import exceptions
 from .. import util
 
 blueprint = flask.Blueprint('detail_reading', __name__, static_url_path='',
@@ -75,6 +76,8 @@ def list_details(type, id):
     }
     scope = getattr(c, info.scope)
 
+    # searching only lists UUIDs, so each search is cheap, unlike reading
+    # the names of every function of the object
     r = {
         functype: bool(
             c.organisationfunktion(funktionsnavn=funcname, **search),
@@ -82,9 +85,10 @@ def list_details(type, id):
         for functype, funcname in handlers.FUNCTION_KEYS.items()
     }
 
-    reg = scope.get(id)
-
-    r['org_unit'] = bool(scope.path == 'organisation/organisationenhed' and reg)
+    # only units need their existence checked
+    r['org_unit'] = bool(
+        scope.path == 'organisation/organisationenhed' and scope.get(id)
+    )
 
     return flask.jsonify(r)
 
@@ -139,6 +143,9 @@ def get_detail(type, id, function):
     :param function: See :http:get:`/service/(any:type)/(uuid:id)/details/`
         for the available values for this field.
 
+    :reqheader Accept: Use ``application/x-ndjson`` to have the
+        entries streamed one per line rather than as an array.
+
     :status 200: Always.
 
     **Example engagement response**:
@@ -650,4 +657,131 @@ b6c11152-0645-4712-a207-ba2c53b391ab Tilknytning",
     from ..handler import reading
 
     cls = reading.get_handler_for_type(function)
-    return flask.jsonify(cls.get_from_type(c, type, id))
+    return util.jsonify_items(cls.get_from_type(c, type, id))
+
+
+@blueprint.route('/ou/details/manager')
+@util.restrictargs('at', 'validity', 'only_primary_uuid', required=['uuid'])
+def get_inherited_managers():
+    '''Obtain the managers of several organisational units at once,
+    each inheriting those of its nearest ancestor with a manager if it
+    has none of its own, as with ``inherit_manager`` above. This is
+    meant for reports covering many units.
+
+    .. :quickref: Detail; Get inherited managers of units
+
+    :queryparam uuid uuid: The UUID of a unit; may be given more than
+        once.
+    :queryparam date at: Show managers valid at this point in time,
+        in ISO-8601 format.
+    :queryparam string validity: Only show *past*, *present* or
+        *future* values -- which the default being to show *present*
+        values.
+    :queryparam bool only_primary_uuid: If the response should only
+        contain the UUIDs of the related persons, units and classes.
+
+    :>json list <uuid>: The managers of each unit, as in
+        :http:get:`/service/(any:type)/(uuid:id)/details/(function)`.
+
+    :status 200: Always; units without managers have an empty list.
+    :status 400: If any of the given UUIDs is invalid.
+
+    **Example response**:
+
+    .. sourcecode:: json
+
+      {
+        "b6c11152-0645-4712-a207-ba2c53b391ab": [
+          {
+            "org_unit": {
+              "name": "Borgmesterens Afdeling",
+              "user_key": "Borgmesterens Afdeling",
+              "uuid": "b6c11152-0645-4712-a207-ba2c53b391ab",
+              "validity": {
+                "from": "1960-01-01",
+                "to": null
+              }
+            },
+            "uuid": "4a3074ec-bd64-4410-b9ac-08b1e48d6701",
+            "...": "..."
+          }
+        ]
+      }
+
+    '''
+    unitids = flask.request.args.getlist('uuid')
+
+    for unitid in unitids:
+        if not util.is_uuid(unitid):
+            exceptions.ErrorCodes.E_INVALID_UUID(
+                message='Invalid uuid for {!r}: {!r}'.format('uuid', unitid),
+            )
+
+    c = common.get_connector()
+    from ..handler.impl import manager
+    return flask.jsonify(
+        manager.ManagerReader.get_inherited_managers(c, unitids),
+    )
+
+
+@blueprint.route('/e/details/primary_engagement')
+@util.restrictargs('at', 'validity', 'only_primary_uuid', required=['uuid'])
+def get_primary_engagements():
+    '''Obtain the primary engagements of several employees at once, i.e.
+    those of their engagements with the highest ranking primary class,
+    as with ``calculate_primary`` above. This is meant for reports
+    covering many employees.
+
+    .. :quickref: Detail; Get primary engagements of employees
+
+    :queryparam uuid uuid: The UUID of an employee; may be given more
+        than once.
+    :queryparam date at: Show engagements valid at this point in time,
+        in ISO-8601 format.
+    :queryparam string validity: Only show *past*, *present* or
+        *future* values -- which the default being to show *present*
+        values.
+    :queryparam bool only_primary_uuid: If the response should only
+        contain the UUIDs of the related persons, units and classes.
+
+    :>json list <uuid>: The primary engagements of each employee, as in
+        :http:get:`/service/(any:type)/(uuid:id)/details/(function)`;
+        usually one, but more if several rank equally.
+
+    :status 200: Always; employees without engagements have an empty
+        list.
+    :status 400: If any of the given UUIDs is invalid.
+
+    **Example response**:
+
+    .. sourcecode:: json
+
+      {
+        "53181ed2-f1de-4c4a-a8fd-ab358c2c454a": [
+          {
+            "is_primary": true,
+            "job_function": {
+              "name": "Specialist",
+              "uuid": "890d4ff0-b453-4900-b79b-dbb461eda3ee",
+              "...": "..."
+            },
+            "uuid": "d000591f-8705-4324-897a-075e3623f37b",
+            "...": "..."
+          }
+        ]
+      }
+
+    '''
+    personids = flask.request.args.getlist('uuid')
+
+    for personid in personids:
+        if not util.is_uuid(personid):
+            exceptions.ErrorCodes.E_INVALID_UUID(
+                message='Invalid uuid for {!r}: {!r}'.format('uuid', personid),
+            )
+
+    c = common.get_connector()
+    from ..handler.impl import engagement
+    return flask.jsonify(
+        engagement.EngagementReader.get_primary_engagements(c, personids),
+    )
@@ -19,7 +19,7 @@ import typing
 import flask
 
 from . import handlers
-from .. import exceptions, readonly
+from .. import exceptions, metrics, readonly
 from .. import util
 from .. import mapping
 
@@ -41,6 +41,8 @@ def handle_requests(
 
     requests = handlers.generate_requests(reqs, request_type)
 
+    metrics.set_role_types({req.get('type') for req in reqs})
+
     uuids = handlers.submit_requests(requests)
     if is_single_request:
         uuids = uuids[0]
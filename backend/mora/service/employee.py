@@ -17,10 +17,11 @@ import enum
 import functools
 import uuid
 from functools import partial
-from operator import itemgetter, contains
+from operator import contains
 
 import flask
 
+from . import association
 from . import handlers
 from . import org
 from .validation import validator
@@ -137,7 +138,7 @@ class EmployeeRequestHandler(handlers.RequestHandler):
         original = c.bruger.get(uuid=userid)
         new_from, new_to = util.get_validities(data)
 
-        payload = dict()
+        payload = common.PayloadBuilder()
         if original_data:
             # We are performing an update
             old_from, old_to = util.get_validities(original_data)
@@ -226,7 +227,8 @@ class EmployeeRequestHandler(handlers.RequestHandler):
         payload = common.ensure_bounds(new_from, new_to, bounds_fields,
                                        original, payload)
 
-        self.payload = payload
+        self.payload = payload.build()
+        self.original = original
         self.uuid = userid
         self.trigger_dict[Trigger.EMPLOYEE_UUID] = userid
 
@@ -250,6 +252,10 @@ class EmployeeRequestHandler(handlers.RequestHandler):
 
         if self.request_type == mapping.RequestType.CREATE:
             self.result = c.bruger.create(self.payload, self.uuid)
+        elif self.coalesced_into is not None:
+            return self.submit_coalesced()
+        elif self.is_unchanged():
+            return self.uuid
         else:
             self.result = c.bruger.update(self.payload, self.uuid)
 
@@ -332,6 +338,10 @@ def list_employees(orgid):
     :>json string offset: Pagination offset.
     :>json string total: Total number of items available on this query.
 
+    :reqheader Accept: Use ``application/x-ndjson`` to have the items
+        streamed one per line, with the offset and total in the
+        ``X-Offset`` and ``X-Total-Count`` headers.
+
     :>jsonarr string name: Human-readable name.
     :>jsonarr string uuid: Machine-friendly UUID.
 
@@ -402,18 +412,15 @@ def list_employees(orgid):
     uuid_filters = []
     # Filter search_result to only show employees with associations
     if 'associated' in args and args['associated']:
-        # NOTE: This call takes ~500ms on fixture-data
-        assocs = c.organisationfunktion.get_all(
-            funktionsnavn="Tilknytning"
-        )
-        assocs = map(itemgetter(1), assocs)
-        assocs = set(map(mapping.USER_FIELD.get_uuid, assocs))
+        assocs = association.get_associated_employees(c)
         uuid_filters.append(partial(contains, assocs))
 
     search_result = c.bruger.paged_get(
-        get_full_employee, uuid_filters=uuid_filters, **kwargs
+        get_full_employee, uuid_filters=uuid_filters,
+        lazy_items=True,
+        **kwargs
     )
-    return flask.jsonify(search_result)
+    return util.jsonify_paged(search_result)
 
 
 @blueprint.route('/e/<uuid:id>/')
@@ -551,6 +558,10 @@ def terminate_employee(employee_uuid):
     for handler in request_handlers:
         handler.submit()
 
+    # Write a noop entry to the user, to be used for the history,
+    # before the triggers see the employee
+    common.add_history_entry(c.bruger, employee_uuid, "Afslut medarbejder")
+
     result = flask.jsonify(employee_uuid)
 
     trigger_dict[Trigger.EVENT_TYPE] = Trigger.Event.ON_AFTER
@@ -558,16 +569,13 @@ def terminate_employee(employee_uuid):
 
     Trigger.run(trigger_dict)
 
-    # Write a noop entry to the user, to be used for the history
-    common.add_history_entry(c.bruger, employee_uuid, "Afslut medarbejder")
-
     # TODO:
 
     return result, 200
 
 
 @blueprint.route('/e/<uuid:employee_uuid>/history/', methods=['GET'])
-@util.restrictargs()
+@util.restrictargs('start', 'limit')
 def get_employee_history(employee_uuid):
     """
     Get the history of an employee
@@ -575,6 +583,11 @@ def get_employee_history(employee_uuid):
     .. :quickref: Employee; Get history
 
     :param employee_uuid: The UUID of the employee
+    :queryparam int start: Index of the first entry for paging.
+    :queryparam int limit: Maximum number of entries.
+
+    :resheader X-Total-Count: The total number of entries.
+    :resheader X-Offset: The index of the first entry returned.
 
     **Example response**:
 
@@ -613,17 +626,12 @@ def get_employee_history(employee_uuid):
     """
 
     c = lora.Connector()
-    user_registrations = c.bruger.get(uuid=employee_uuid,
-                                      registreretfra='-infinity',
-                                      registrerettil='infinity')
+    history_entries = common.get_history(c.bruger, employee_uuid)
 
-    if not user_registrations:
+    if history_entries is None:
         exceptions.ErrorCodes.E_USER_NOT_FOUND(employee_uuid=employee_uuid)
 
-    history_entries = list(map(common.convert_reg_to_history,
-                               user_registrations))
-
-    return flask.jsonify(history_entries)
+    return common.jsonify_history(history_entries)
 
 
 @blueprint.route('/e/create', methods=['POST'])
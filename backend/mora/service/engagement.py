@@ -100,8 +100,7 @@ class EngagementRequestHandler(handlers.OrgFunkRequestHandler):
         except (TypeError, LookupError):
             exts = {}
 
-        payload = dict()
-        payload['note'] = 'Rediger engagement'
+        payload = common.PayloadBuilder({'note': 'Rediger engagement'})
 
         original_data = req.get('original')
         if original_data:
@@ -196,7 +195,8 @@ class EngagementRequestHandler(handlers.OrgFunkRequestHandler):
         validator.is_date_range_in_employee_range({'uuid': employee_uuid},
                                                   new_from, new_to)
 
-        self.payload = payload
+        self.payload = payload.build()
+        self.original = original
         self.uuid = engagement_uuid
         self.trigger_dict.update({
             Trigger.EMPLOYEE_UUID: employee_uuid,
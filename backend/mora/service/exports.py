@@ -35,8 +35,10 @@ def list_export_files():
     if not os.path.isdir(export_dir):
         exceptions.ErrorCodes.E_DIR_NOT_FOUND()
     dir_contents = os.listdir(export_dir)
+    # exports being written are hidden; see mora.exporting
     files = [
         file for file in dir_contents if
+        not file.startswith('.') and
         os.path.isfile(os.path.join(export_dir, file))
     ]
     return flask.jsonify(files)
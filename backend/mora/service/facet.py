@@ -15,11 +15,13 @@ objects.
         A value of `<UUID>` means that this is a `DAR`_ address UUID.
 
 '''
+import collections
 import functools
 
 import locale
 import enum
 
+import time
 import typing
 import uuid
 from functools import partial
@@ -27,8 +29,13 @@ from functools import partial
 import flask
 
 from .. import common
+from .. import conditional
 from .. import exceptions
+from .. import lora
 from .. import mapping
+from .. import metrics
+from .. import responsecache
+from .. import settings
 from .. import util
 
 from .tree_helper import prepare_ancestor_tree
@@ -37,6 +44,11 @@ from .tree_helper import prepare_ancestor_tree
 blueprint = flask.Blueprint('facet', __name__, static_url_path='',
                             url_prefix='/service')
 
+# maps (path, uuid, validity, date) to (timestamp, registration) for
+# classes and facets; see get_cached_object
+_classification_cache = collections.OrderedDict()
+_CLASSIFICATION_CACHE_SIZE = 65536
+
 
 @enum.unique
 class ClassDetails(enum.Enum):
@@ -210,6 +222,7 @@ def get_all_class_children(classid: str):
 
 @blueprint.route('/o/<uuid:orgid>/f/')
 @util.restrictargs()
+@responsecache.cached
 def list_facets(orgid):
     '''List the facet types available in a given organisation.
 
@@ -260,11 +273,90 @@ def list_facets(orgid):
     ))
 
 
+def _get_cache_key(scope: lora.Scope, objid: str):
+    return (
+        scope.path,
+        objid,
+        scope.connector.validity,
+        scope.connector.now.date(),
+    )
+
+
+def _set_cached_object(key, timestamp: float, obj: typing.Optional[dict]):
+    _classification_cache[key] = timestamp, obj
+    _classification_cache.move_to_end(key)
+
+    while len(_classification_cache) > _CLASSIFICATION_CACHE_SIZE:
+        _classification_cache.popitem(last=False)
+
+
+def clear_classification_cache():
+    """Discard all classes and facets cached by
+    :py:func:`get_cached_object`."""
+    _classification_cache.clear()
+
+
+def get_cached_object(scope: lora.Scope, objid: str) -> typing.Optional[dict]:
+    """Get a class or facet, preferably from the cache.
+
+    Classes and facets rarely change, but are read over and over again
+    for the objects referring to them, so we keep them per effective
+    date for ``lora.classification_cache_ttl`` seconds; set that to
+    zero to disable the cache. The returned registration is shared,
+    and must not be modified.
+    """
+    ttl = settings.config['lora']['classification_cache_ttl']
+
+    if ttl <= 0:
+        return scope.get(objid)
+
+    key = _get_cache_key(scope, objid)
+    now = time.monotonic()
+
+    try:
+        timestamp, obj = _classification_cache[key]
+    except KeyError:
+        pass
+    else:
+        if now - timestamp < ttl:
+            metrics.observe_cache('classification', True)
+            conditional.add_registration(objid, obj)
+            return obj
+
+    metrics.observe_cache('classification', False)
+
+    obj = scope.get(objid)
+    _set_cached_object(key, now, obj)
+
+    return obj
+
+
+def prime_classification_cache(c: lora.Connector) -> int:
+    """Fill the cache of :py:func:`get_cached_object` with all
+    published facets and classes, in bulk.
+
+    :return: The number of objects cached.
+    """
+    if settings.config['lora']['classification_cache_ttl'] <= 0:
+        return 0
+
+    count = 0
+
+    for scope in (c.facet, c.klasse):
+        now = time.monotonic()
+
+        for objid, obj in scope.get_all(publiceret='Publiceret'):
+            _set_cached_object(_get_cache_key(scope, objid), now, obj)
+            count += 1
+
+    return count
+
+
 def get_one_facet(c, facetid, orgid=None, facet=None, data=None):
     """Fetch a facet and enrich it."""
 
     # Use given facet or fetch one, if none is given
-    facet = facet or c.facet.get(facetid)
+    facet = facet or get_cached_object(c.facet, facetid)
     if facet is None:
         return None
 
@@ -332,7 +424,7 @@ def get_one_class(c, classid, clazz=None, details: typing.Set[ClassDetails] = No
         }
 
     if not clazz:
-        clazz = c.klasse.get(classid)
+        clazz = get_cached_object(c.klasse, classid)
 
         if not clazz:
             return None
@@ -352,7 +444,9 @@ def get_one_class(c, classid, clazz=None, details: typing.Set[ClassDetails] = No
         potential_parent = get_parent(clazz)
         if potential_parent is None:
             return [clazz]
-        return [clazz] + get_parents(c.klasse.get(potential_parent))
+        return [clazz] + get_parents(
+            get_cached_object(c.klasse, potential_parent),
+        )
 
     def get_full_name(clazz, parents):
         parents = get_parents(clazz)
@@ -464,6 +558,7 @@ def get_classes_under_facet(orgid: uuid.UUID, facet: str,
 
 @blueprint.route('/o/<uuid:orgid>/f/<facet>/')
 @util.restrictargs('limit', 'start')
+@responsecache.cached
 def get_classes(orgid: uuid.UUID, facet: str):
     '''List classes available in the given facet.
 
@@ -550,6 +645,7 @@ def map_query_args_to_class_details(args):
 
 @blueprint.route('/f/<facet>/')
 @util.restrictargs('limit', 'start')
+@responsecache.cached
 def get_all_classes(facet: str):
     '''List classes available in the given facet.
 
@@ -615,6 +711,7 @@ def get_all_classes(facet: str):
 
 @blueprint.route('/f/<facet>/children')
 @util.restrictargs('limit', 'start')
+@responsecache.cached
 def get_all_classes_children(facet: str):
     '''List classes available in the given facet.
 
@@ -7,14 +7,19 @@ handlers for the various detail types.
 '''
 
 import abc
+import collections
 import inspect
+import logging
 
 import typing
 
+import flask
+
 from .. import common
 from .. import exceptions
 from .. import lora
 from .. import mapping
+from .. import metrics
 from .. import util
 from ..mapping import RequestType
 from ..triggers import Trigger
@@ -25,6 +30,8 @@ HANDLERS_BY_ROLE_TYPE = {}
 HANDLERS_BY_FUNCTION_KEY = {}
 FUNCTION_KEYS = {}
 
+logger = logging.getLogger(__name__)
+
 
 class _RequestHandlerMeta(abc.ABCMeta):
     '''Metaclass for automatically registering handlers
@@ -71,6 +78,8 @@ class RequestHandler(metaclass=_RequestHandlerMeta):
         self.request = request
         self.payload = None
         self.uuid = None
+        self.original = None
+        self.coalesced_into = None
 
         self.trigger_dict = {
             Trigger.REQUEST_TYPE: request_type,
@@ -121,6 +130,91 @@ class RequestHandler(metaclass=_RequestHandlerMeta):
         """
         raise NotImplementedError
 
+    def is_unchanged(self) -> bool:
+        """Determine whether this is an edit which wouldn't change
+        anything, in which case submitting it would merely add yet
+        another registration to LoRa.
+
+        Edits are only checked if the handler has stored the current
+        registration as :py:attr:`original` during preparation. Any
+        unchanged UUIDs are reported in the ``X-Unchanged`` header.
+        """
+        if (
+            self.request_type != RequestType.EDIT or
+            not common.is_payload_unchanged(self.payload, self.original)
+        ):
+            return False
+
+        logger.info('skipping unchanged edit of %s %s',
+                    self.role_type, self.uuid)
+        metrics.UNCHANGED_EDITS.labels(self.role_type).inc()
+
+        if flask.has_request_context():
+            flask.g.setdefault('unchanged_uuids', []).append(self.uuid)
+
+        return True
+
+    def coalesce(self, others: typing.List['RequestHandler']) -> bool:
+        """Fold subsequent edits of the same object into this one, so
+        that all of them are written to LoRa as a single update.
+
+        The edits are folded in the order of their validity, each
+        taking precedence over those starting before it during its own
+        validity. Only edits whose handlers stored the current
+        registration as :py:attr:`original` during preparation can be
+        combined.
+
+        :param others: Edits of the same object, prepared after this one.
+        :return: Whether the edits were folded into this one.
+        """
+        edits = [self, *others]
+
+        if any(
+            edit.request_type != RequestType.EDIT or edit.original is None
+            for edit in edits
+        ):
+            return False
+
+        validities = {
+            edit: util.get_validities(edit.request['data'])
+            for edit in edits
+        }
+        edits.sort(key=lambda edit: validities[edit][0])
+
+        payload = edits[0].payload
+
+        for edit in edits[1:]:
+            payload = common.merge_payloads(payload, edit.payload,
+                                            *validities[edit])
+
+            if payload is None:
+                return False
+
+        self.payload = payload
+
+        for other in others:
+            other.coalesced_into = self
+
+        metrics.COALESCED_EDITS.labels(self.role_type).inc(len(others))
+
+        return True
+
+    def submit_coalesced(self) -> str:
+        """Complete an edit that was folded into another one, which
+        must have been submitted first.
+
+        :return: The result of submitting the combined edit.
+        """
+        result = getattr(self.coalesced_into, Trigger.RESULT, None)
+
+        if result is None:
+            # the combined edit didn't change anything
+            return self.uuid
+
+        self.result = result
+
+        return RequestHandler.submit(self)
+
     def submit(self) -> str:
         """Submit the request to LoRa.
 
@@ -222,6 +316,10 @@ class OrgFunkRequestHandler(RequestHandler):
         if self.request_type == RequestType.CREATE:
             self.result = c.organisationfunktion.create(self.payload,
                                                         self.uuid)
+        elif self.coalesced_into is not None:
+            return self.submit_coalesced()
+        elif self.is_unchanged():
+            return self.uuid
         else:
             self.result = c.organisationfunktion.update(self.payload,
                                                         self.uuid)
@@ -273,5 +371,21 @@ def generate_requests(
     ]
 
 
+def coalesce_requests(requests: typing.List[RequestHandler]):
+    '''Fold edits of the same object into the first edit of it, so that
+    each object only gets a single new registration.'''
+    edits = collections.defaultdict(list)
+
+    for request in requests:
+        if request.request_type == RequestType.EDIT and request.uuid:
+            edits[request.role_type, request.uuid].append(request)
+
+    for first_edit, *others in edits.values():
+        if others:
+            first_edit.coalesce(others)
+
+
 def submit_requests(requests: typing.List[RequestHandler]) -> typing.List[str]:
+    coalesce_requests(requests)
+
     return [request.submit() for request in requests]
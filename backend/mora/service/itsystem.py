@@ -22,6 +22,7 @@ from .. import common
 from .. import exceptions
 from .. import lora
 from .. import mapping
+from .. import responsecache
 from .. import util
 from ..triggers import Trigger
 
@@ -101,9 +102,9 @@ class ItsystemRequestHandler(handlers.OrgFunkRequestHandler):
         data = req.get('data')
         new_from, new_to = util.get_validities(data)
 
-        payload = {
+        payload = common.PayloadBuilder({
             'note': 'Rediger IT-system',
-        }
+        })
 
         original_data = req.get('original')
         if original_data:
@@ -176,7 +177,8 @@ class ItsystemRequestHandler(handlers.OrgFunkRequestHandler):
                                        original,
                                        payload)
 
-        self.payload = payload
+        self.payload = payload.build()
+        self.original = original
         self.uuid = function_uuid
         self.trigger_dict.update({
             Trigger.ORG_UNIT_UUID: (
@@ -191,6 +193,7 @@ class ItsystemRequestHandler(handlers.OrgFunkRequestHandler):
 
 @blueprint.route('/o/<uuid:orgid>/it/')
 @util.restrictargs('at')
+@responsecache.cached
 def list_it_systems(orgid: uuid.UUID):
     '''List the IT systems available within the given organisation.
 
@@ -89,9 +89,9 @@ class KLERequestHandler(handlers.OrgFunkRequestHandler):
         data = req.get('data')
         new_from, new_to = util.get_validities(data)
 
-        payload = {
+        payload = common.PayloadBuilder({
             'note': 'Rediger KLE',
-        }
+        })
 
         original_data = req.get('original')
         if original_data:
@@ -167,7 +167,8 @@ class KLERequestHandler(handlers.OrgFunkRequestHandler):
                                        original,
                                        payload)
 
-        self.payload = payload
+        self.payload = payload.build()
+        self.original = original
         self.uuid = function_uuid
         self.trigger_dict.update({
             Trigger.ORG_UNIT_UUID: org_unit_uuid,
@@ -73,8 +73,7 @@ class LeaveRequestHandler(handlers.OrgFunkRequestHandler):
         data = req.get('data')
         new_from, new_to = util.get_validities(data)
 
-        payload = dict()
-        payload['note'] = 'Rediger orlov'
+        payload = common.PayloadBuilder({'note': 'Rediger orlov'})
 
         original_data = req.get('original')
         if original_data:
@@ -152,6 +151,7 @@ class LeaveRequestHandler(handlers.OrgFunkRequestHandler):
         validator.does_employee_have_active_engagement(employee_uuid, new_from,
                                                        new_to)
 
-        self.payload = payload
+        self.payload = payload.build()
+        self.original = original
         self.uuid = leave_uuid
         self.trigger_dict[Trigger.EMPLOYEE_UUID] = employee_uuid
@@ -139,8 +139,7 @@ class ManagerRequestHandler(handlers.OrgFunkRequestHandler):
         # Get org unit uuid for validation purposes
         org_unit = mapping.ASSOCIATED_ORG_UNIT_FIELD(original)[0]
 
-        payload = dict()
-        payload['note'] = 'Rediger leder'
+        payload = common.PayloadBuilder({'note': 'Rediger leder'})
 
         original_data = req.get('original')
         if original_data:
@@ -290,7 +289,8 @@ class ManagerRequestHandler(handlers.OrgFunkRequestHandler):
 
         validator.is_distinct_responsibility(update_fields)
 
-        self.payload = payload
+        self.payload = payload.build()
+        self.original = original
         self.uuid = manager_uuid
         self.trigger_dict.update({
             Trigger.ORG_UNIT_UUID: util.get_uuid(org_unit, required=False),
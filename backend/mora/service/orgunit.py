@@ -32,6 +32,7 @@ from .. import common, conf_db, readonly
 from .. import exceptions
 from .. import lora
 from .. import mapping
+from .. import responsecache
 from .. import settings
 from .. import util
 from ..triggers import Trigger
@@ -163,8 +164,7 @@ class OrgUnitRequestHandler(handlers.RequestHandler):
 
         org_uuid = util.get_obj_uuid(original, mapping.BELONGS_TO_FIELD.path)
 
-        payload = dict()
-        payload['note'] = 'Rediger organisationsenhed'
+        payload = common.PayloadBuilder({'note': 'Rediger organisationsenhed'})
 
         if original_data:
             # We are performing an update
@@ -264,7 +264,8 @@ class OrgUnitRequestHandler(handlers.RequestHandler):
         if org_uuid != parent_uuid:
             validator.is_date_range_in_org_unit_range(parent, new_from,
                                                       new_to)
-        self.payload = payload
+        self.payload = payload.build()
+        self.original = original
         self.uuid = unitid
         self.trigger_dict[Trigger.ORG_UNIT_UUID] = unitid
 
@@ -293,6 +294,12 @@ class OrgUnitRequestHandler(handlers.RequestHandler):
                 for r in self.details_requests:
                     r.submit()
 
+        elif self.coalesced_into is not None:
+            return self.submit_coalesced()
+
+        elif self.is_unchanged():
+            return self.uuid
+
         else:
             self.result = c.organisationenhed.update(self.payload, self.uuid)
 
@@ -422,6 +429,7 @@ def get_one_orgunit(c, unitid, unit=None,
 
 @blueprint.route('/<any(o,ou):type>/<uuid:parentid>/children')
 @util.restrictargs('at')
+@responsecache.cached
 def get_children(type, parentid):
     '''Obtain the list of nested units within an organisation or an
     organisational unit.
@@ -514,6 +522,8 @@ def get_unit_ancestor_tree():
     .. :quickref: Unit; Ancestor tree
 
     :queryparam unitid: The UUID of the organisational unit.
+    :reqheader Accept: Use ``application/x-ndjson`` to have each
+        root of the tree streamed on a line of its own.
 
     :see: http:get:`/service/ou/(uuid:unitid)/`.
 
@@ -558,7 +568,9 @@ def get_unit_ancestor_tree():
     c = common.get_connector()
     unitids = flask.request.args.getlist('uuid')
 
-    return flask.jsonify(get_unit_tree(c, unitids, with_siblings=True))
+    return util.jsonify_items(
+        get_unit_tree(c, unitids, with_siblings=True),
+    )
 
 
 def get_unit_tree(c, unitids, with_siblings=False):
@@ -764,6 +776,10 @@ def list_orgunits(orgid):
     :>json string offset: Pagination offset.
     :>json string total: Total number of items available on this query.
 
+    :reqheader Accept: Use ``application/x-ndjson`` to have the items
+        streamed one per line, with the offset and total in the
+        ``X-Offset`` and ``X-Total-Count`` headers.
+
     :>jsonarr string name: Human-readable name.
     :>jsonarr string uuid: Machine-friendly UUID.
     :>jsonarr string user_key: Short, unique key identifying the unit.
@@ -863,9 +879,11 @@ def list_orgunits(orgid):
         uuid_filters.append(entry_under_root)
 
     search_result = c.organisationenhed.paged_get(
-        get_minimal_orgunit, uuid_filters=uuid_filters, **kwargs
+        get_minimal_orgunit, uuid_filters=uuid_filters,
+        lazy_items=True,
+        **kwargs
     )
-    return flask.jsonify(search_result)
+    return util.jsonify_paged(search_result)
 
 
 @blueprint.route('/o/<uuid:orgid>/ou/tree')
@@ -884,6 +902,8 @@ def list_orgunit_tree(orgid):
     :queryparam string query: Filter by units matching this string.
     :queryparam uuid uuid: Yield the given units; please note that
                            this overrides any query parameter.
+    :reqheader Accept: Use ``application/x-ndjson`` to have each
+        root of the tree streamed on a line of its own.
 
     :status 200: Always.
 
@@ -959,7 +979,7 @@ def list_orgunit_tree(orgid):
             limit=settings.TREE_SEARCH_LIMIT,
         )
 
-    return flask.jsonify(
+    return util.jsonify_items(
         get_unit_tree(c, unitids),
     )
 
@@ -1132,7 +1152,7 @@ def terminate_org_unit(unitid):
 
 
 @blueprint.route('/ou/<uuid:unitid>/history/', methods=['GET'])
-@util.restrictargs()
+@util.restrictargs('start', 'limit')
 def get_org_unit_history(unitid):
     """
     Get the history of an org unit
@@ -1140,6 +1160,11 @@ def get_org_unit_history(unitid):
     .. :quickref: Unit; Get history
 
     :param unitid: The UUID of the org unit
+    :queryparam int start: Index of the first entry for paging.
+    :queryparam int limit: Maximum number of entries.
+
+    :resheader X-Total-Count: The total number of entries.
+    :resheader X-Offset: The index of the first entry returned.
 
     **Example response**:
 
@@ -1185,14 +1210,9 @@ def get_org_unit_history(unitid):
     """
 
     c = lora.Connector()
-    unit_registrations = c.organisationenhed.get(uuid=unitid,
-                                                 registreretfra='-infinity',
-                                                 registrerettil='infinity')
+    history_entries = common.get_history(c.organisationenhed, unitid)
 
-    if not unit_registrations:
+    if history_entries is None:
         exceptions.ErrorCodes.E_ORG_UNIT_NOT_FOUND(org_unit_uuid=unitid)
 
-    history_entries = list(map(common.convert_reg_to_history,
-                               unit_registrations))
-
-    return flask.jsonify(history_entries)
+    return common.jsonify_history(history_entries)
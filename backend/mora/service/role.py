@@ -84,8 +84,7 @@ class RoleRequestHandler(handlers.OrgFunkRequestHandler):
         # Get org unit uuid for validation purposes
         org_unit = mapping.ASSOCIATED_ORG_UNIT_FIELD(original)[0]
 
-        payload = dict()
-        payload['note'] = 'Rediger rolle'
+        payload = common.PayloadBuilder({'note': 'Rediger rolle'})
 
         original_data = req.get('original')
         if original_data:
@@ -161,7 +160,8 @@ class RoleRequestHandler(handlers.OrgFunkRequestHandler):
         validator.is_date_range_in_employee_range(employee, new_from,
                                                   new_to)
 
-        self.payload = payload
+        self.payload = payload.build()
+        self.original = original
         self.uuid = role_uuid
         self.trigger_dict.update({
             "org_unit_uuid": util.get_uuid(org_unit, required=False),
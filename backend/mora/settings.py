@@ -144,10 +144,16 @@ def log_config(configuration):
     Log a config object, hiding all passwords
     :param configuration: A config object to be logged
     """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
     safe_config = copy.deepcopy(configuration)
     safe_config["session"]["database"]["password"] = "********"
     safe_config["configuration"]["database"]["password"] = "********"
-    logger.debug("Config:\n%s.", pprint.pformat(safe_config))
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Config:\n%s.", pprint.pformat(safe_config))
+
     logger.info("Config: %s.", safe_config)
 
 
@@ -166,7 +172,7 @@ if user_config_path:
     logger.info("Reading user config from %s", user_config_path)
     check_and_update_config(config, read_config(user_config_path))
 
-log_config(config)
+# the config is logged by ``app.create_app``, once logging is set up
 
 # This object is used with ``app.config.update`` in app.py.
 app_config = {
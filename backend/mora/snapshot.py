@@ -0,0 +1,280 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Point-in-time snapshots of the organisation
+-------------------------------------------
+
+The time machine of the UI browses the organisation at another date
+by passing an ``at`` argument to the usual endpoints, each of which
+asks LoRa for units, their parents and children at that date over
+and over again. Instead, the first such request reads all units and
+managers at the date at once, into a read-only :py:class:`Snapshot`,
+and the classes at the date into the cache of
+:py:func:`mora.service.facet.get_cached_object`.
+
+:py:func:`mora.common.get_connector` attaches a snapshot to the
+connectors of such requests, which then answer lookups of units by
+UUID and searches for their children from it; see
+:py:class:`SnapshotScope`. Everything else is read from LoRa as usual.
+
+The UI passes today's date as well when browsing the present, which
+is read from LoRa as usual, since it is what changes. Snapshots are
+only used for other dates.
+
+The ``lora.snapshot_count`` most recently used snapshots are kept for
+``lora.snapshot_ttl`` seconds, or until a unit, function, class or
+facet is written through any worker -- as told by the generation of
+the response cache, shared by the workers -- or through this process,
+should that be disabled; set either to zero to disable snapshots.
+
+'''
+
+import collections
+import datetime
+import time
+import typing
+
+from . import conditional
+from . import lora
+from . import mapping
+from . import metrics
+from . import responsecache
+from . import settings
+from . import util
+
+# maps the effective date to (timestamp, version, snapshot); see
+# _get_version
+_snapshots = collections.OrderedDict()
+
+# the scopes read into a snapshot
+_SNAPSHOT_PATHS = (
+    'organisation/organisationenhed',
+    'organisation/organisationfunktion',
+    'klassifikation/klasse',
+    'klassifikation/facet',
+)
+
+# the parameters of a search for the children of a unit
+_CHILDREN_PARAMS = {'overordnet', 'tilhoerer', 'gyldighed'}
+
+
+class Snapshot:
+    '''The units and managers of the organisation at a given time.'''
+
+    def __init__(self, c: lora.Connector):
+        # imported here, as the service API imports this module
+        from .service import facet
+
+        self.date = c.now
+
+        #: maps the UUID of each unit to its registration
+        self.units = dict(c.organisationenhed.get_all(bvn='%'))
+
+        children = collections.defaultdict(list)
+        managers = collections.defaultdict(list)
+
+        for unitid, unit in self.units.items():
+            if util.is_reg_valid(unit):
+                for parentid in mapping.PARENT_FIELD.get_uuids(unit):
+                    children[parentid].append(unitid)
+
+        for funcid, func in c.organisationfunktion.get_all(
+            funktionsnavn=mapping.MANAGER_KEY,
+            gyldighed='Aktiv',
+        ):
+            if util.is_reg_valid(func):
+                for unitid in mapping.ASSOCIATED_ORG_UNIT_FIELD.get_uuids(func):
+                    managers[unitid].append(funcid)
+
+        #: maps the UUID of each parent to those of its active children
+        self.children = dict(children)
+        #: maps the UUID of each unit to those of its active managers
+        self.managers = dict(managers)
+
+        self.class_count = facet.prime_classification_cache(c)
+
+    def __contains__(self, objid: str) -> bool:
+        '''Whether we know what LoRa would return for the given UUID,
+        i.e. if it's a unit or the organisation.'''
+        return objid in self.units or objid in self.children
+
+    def get_children(self, parentid: str,
+                     orgid: str = None) -> typing.List[str]:
+        '''Get the active children of a unit or organisation,
+        optionally only those belonging to the given organisation.'''
+        return [
+            unitid
+            for unitid in self.children.get(parentid, ())
+            if orgid is None or
+            mapping.BELONGS_TO_FIELD.get_uuid(self.units[unitid]) == orgid
+        ]
+
+    def get_parent(self, unitid: str) -> typing.Optional[str]:
+        '''Get the parent of an active unit, if that is an active unit
+        as well.'''
+        unit = self.units.get(unitid)
+
+        if not unit or not util.is_reg_valid(unit):
+            return None
+
+        parentid = mapping.PARENT_FIELD.get_uuid(unit)
+        parent = self.units.get(parentid)
+
+        return parentid if parent and util.is_reg_valid(parent) else None
+
+    def get_managed_unit(self, unitid: str) -> typing.Optional[str]:
+        '''Get the nearest unit with a manager, starting from the given
+        unit and ascending through its parents.'''
+        seen = set()
+
+        while unitid and unitid not in seen:
+            if self.managers.get(unitid):
+                return unitid
+
+            seen.add(unitid)
+            unitid = self.get_parent(unitid)
+
+        return None
+
+
+class SnapshotScope(lora.Scope):
+    '''The scope of units, answering from a snapshot where possible.'''
+
+    def __init__(self, connector: lora.Connector, snapshot: Snapshot):
+        super().__init__(connector, connector.scope_map['organisationenhed'])
+        self.snapshot = snapshot
+
+    def _get_unit(self, unitid: str) -> typing.Optional[dict]:
+        unit = self.snapshot.units.get(unitid)
+        conditional.add_registration(unitid, unit)
+
+        return unit
+
+    def _get_children(self, params) -> typing.Optional[typing.List[str]]:
+        if (
+            params.get('gyldighed') != 'Aktiv' or
+            not params.get('overordnet') or
+            not params.keys() <= _CHILDREN_PARAMS
+        ):
+            return None
+
+        return self.snapshot.get_children(
+            str(params['overordnet']),
+            params.get('tilhoerer') and str(params['tilhoerer']),
+        )
+
+    def fetch(self, **params):
+        children = self._get_children(params)
+
+        if children is None:
+            return super().fetch(**params)
+
+        for unitid in children:
+            conditional.add_registration(unitid)
+
+        return children
+
+    __call__ = fetch
+
+    def get(self, uuid, **params):
+        if not params and str(uuid) in self.snapshot:
+            return self._get_unit(str(uuid))
+
+        return super().get(uuid, **params)
+
+    def get_all(self, **params):
+        children = self._get_children(params)
+
+        if children is None:
+            return super().get_all(**params)
+
+        return (
+            (unitid, self._get_unit(unitid))
+            for unitid in children
+        )
+
+    def get_all_by_uuid(self, uuids: typing.List, elements_per_chunk=None):
+        uuids = list(map(str, uuids))
+
+        if not all(unitid in self.snapshot.units for unitid in uuids):
+            return super().get_all_by_uuid(uuids, elements_per_chunk)
+
+        return (
+            (unitid, self._get_unit(unitid))
+            for unitid in uuids
+        )
+
+
+def _get_version() -> tuple:
+    '''Get a token changing whenever any of the objects read into a
+    snapshot may have been written through MO.'''
+    return (
+        responsecache.get_cache().get_generation()
+        if responsecache.is_enabled() else None,
+        *map(lora.get_write_count, _SNAPSHOT_PATHS),
+    )
+
+
+def get_snapshot(date: datetime.datetime) -> typing.Optional[Snapshot]:
+    '''Get the snapshot of the organisation at the given time, creating
+    it if needed.
+
+    :return: The snapshot, or :code:`None` if they are disabled.
+    '''
+    count = settings.config['lora']['snapshot_count']
+    ttl = settings.config['lora']['snapshot_ttl']
+
+    if count <= 0 or ttl <= 0:
+        return None
+
+    now = time.monotonic()
+    version = _get_version()
+
+    try:
+        timestamp, snapshot_version, snapshot = _snapshots[date]
+    except KeyError:
+        pass
+    else:
+        if now - timestamp < ttl and snapshot_version == version:
+            metrics.observe_cache('snapshot', True)
+            _snapshots.move_to_end(date)
+
+            return snapshot
+
+    metrics.observe_cache('snapshot', False)
+
+    snapshot = Snapshot(lora.Connector(effective_date=date))
+
+    _snapshots[date] = now, version, snapshot
+    _snapshots.move_to_end(date)
+
+    while len(_snapshots) > count:
+        _snapshots.popitem(last=False)
+
+    return snapshot
+
+
+def attach(c: lora.Connector) -> lora.Connector:
+    '''Make the given connector read units from the snapshot at its
+    effective date, if snapshots are enabled, and that isn't today.'''
+    if c.now.date() == util.now().date():
+        return c
+
+    snapshot = get_snapshot(c.now)
+
+    if snapshot is not None:
+        c.organisationenhed = SnapshotScope(c, snapshot)
+
+    return c
+
+
+def get_attached(c: lora.Connector) -> typing.Optional[Snapshot]:
+    '''Get the snapshot attached to the given connector, if any.'''
+    scope = c.organisationenhed
+
+    return scope.snapshot if isinstance(scope, SnapshotScope) else None
+
+
+def clear():
+    '''Discard all snapshots.'''
+    _snapshots.clear()
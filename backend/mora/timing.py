@@ -0,0 +1,187 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Timing of backend calls
+-----------------------
+
+This module accumulates the calls made to LoRa and other backends
+while handling a request. For each backend -- or LoRa scope -- we
+record the number of calls, the total time and size, and the slowest
+call. These are reported in the ``Server-Timing`` header of the
+response, so that they show up in the developer tools of browsers, and
+logged for requests slower than ``log.slow_request_threshold``.
+
+'''
+
+import contextlib
+import functools
+import json
+import logging
+import threading
+import time
+import typing
+
+import flask
+
+from . import metrics
+from . import settings
+
+logger = logging.getLogger(__name__)
+
+_ENVIRON_KEY = 'mora.timing'
+
+
+class CallStats:
+    '''Statistics of the calls to a single backend.'''
+
+    __slots__ = ('count', 'duration', 'size', 'slowest')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.size = 0
+        self.slowest = 0.0
+
+    def add(self, duration: float, size: int):
+        self.count += 1
+        self.duration += duration
+        self.size += size
+        self.slowest = max(self.slowest, duration)
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'duration': round(self.duration * 1000, 1),
+            'size': self.size,
+            'slowest': round(self.slowest * 1000, 1),
+        }
+
+
+class _RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.calls = {}  # type: typing.Dict[str, CallStats]
+        self.lock = threading.Lock()
+
+
+def _get_request_timings() -> typing.Optional[_RequestTimings]:
+    # we store the timings in the WSGI environment rather than on
+    # flask.g, as the former is shared with any copies of the request
+    # context pushed in other threads
+    if flask.has_request_context():
+        return flask.request.environ.get(_ENVIRON_KEY)
+
+
+def record(name: str, duration: float, size: int = 0, method: str = ''):
+    '''Record a call to the backend ``name`` for the current request.
+
+    :param name: The name of the backend, e.g. ``lora.bruger``.
+    :param duration: The duration of the call, in seconds.
+    :param size: The size of the response, in bytes.
+    :param method: The HTTP method of the call, if any.
+    '''
+    metrics.observe_call(name, method, duration)
+
+    timings = _get_request_timings()
+
+    if timings is None:
+        return
+
+    with timings.lock:
+        try:
+            stats = timings.calls[name]
+        except KeyError:
+            stats = timings.calls[name] = CallStats()
+
+        stats.add(duration, size)
+
+
+@contextlib.contextmanager
+def timed(name: str):
+    '''Record the duration of the enclosed block as a call to the
+    given backend.'''
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed_function(name: str):
+    '''Decorator recording each call of the function as a call to the
+    given backend.'''
+
+    def wrapper(func):
+        @functools.wraps(func)
+        def wrapped(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+
+        return wrapped
+
+    return wrapper
+
+
+def get_calls() -> typing.Dict[str, CallStats]:
+    '''Obtain the calls recorded so far for the current request.'''
+    timings = _get_request_timings()
+
+    if timings is None:
+        return {}
+
+    with timings.lock:
+        return dict(timings.calls)
+
+
+def get_server_timing(calls: typing.Dict[str, CallStats],
+                      total: float) -> str:
+    '''Format the given calls as a ``Server-Timing`` header.'''
+    entries = [
+        '{};dur={:.1f};desc="{} calls, {} bytes, slowest {:.1f} ms"'.format(
+            name, stats.duration * 1000, stats.count, stats.size,
+            stats.slowest * 1000,
+        )
+        for name, stats in sorted(calls.items())
+    ]
+    entries.append('total;dur={:.1f}'.format(total * 1000))
+
+    return ', '.join(entries)
+
+
+def _start_request():
+    flask.request.environ[_ENVIRON_KEY] = _RequestTimings()
+
+
+def _finish_request(response: flask.Response) -> flask.Response:
+    timings = _get_request_timings()
+
+    if timings is None:
+        return response
+
+    total = time.perf_counter() - timings.start
+    calls = get_calls()
+
+    response.headers['Server-Timing'] = get_server_timing(calls, total)
+
+    threshold = settings.config['log']['slow_request_threshold']
+
+    if threshold and total >= threshold:
+        logger.warning('slow request: %s', json.dumps({
+            'method': flask.request.method,
+            'path': flask.request.full_path,
+            'status': response.status_code,
+            'duration': round(total * 1000, 1),
+            'calls': {
+                name: stats.to_dict()
+                for name, stats in sorted(calls.items())
+            },
+        }))
+
+    return response
+
+
+def register(app: flask.Flask):
+    '''Enable timing of the requests handled by the given app.'''
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -3,8 +3,9 @@
 
 import logging
 import json
-import pika
+import time
 from mora import exceptions
+from mora import metrics
 from mora import util
 from mora import mapping
 from mora import settings
@@ -44,6 +45,10 @@ def publish_message(service, object_type, action, service_uuid, date):
     if not settings.config['amqp']['enable']:
         return
 
+    # pika is only needed with AMQP enabled, so we import it on first
+    # use to keep the startup of workers fast
+    import pika.exceptions
+
     # we are strict about the topic format to avoid programmer errors.
     if service not in _SERVICES:
         raise ValueError("service {!r} not allowed, use one of {!r}".format(
@@ -63,6 +68,7 @@ def publish_message(service, object_type, action, service_uuid, date):
     }
 
     connection = get_connection()
+    start = time.perf_counter()
 
     try:
         connection["channel"].basic_publish(
@@ -71,12 +77,15 @@ def publish_message(service, object_type, action, service_uuid, date):
             body=json.dumps(message),
         )
     except pika.exceptions.AMQPError:
+        metrics.AMQP_PUBLISH_FAILURES.inc()
         logger.error(
             "Failed to publish message. Topic: %r, body: %r",
             topic,
             message,
             exc_info=True,
         )
+    else:
+        metrics.AMQP_PUBLISH_DURATION.observe(time.perf_counter() - start)
 
 
 def amqp_sender(trigger_dict):
@@ -128,6 +137,8 @@ def get_connection():
 
     # Please crash if rabbitmq is unavailable.
     if not _amqp_connection:
+        import pika
+
         conn = pika.BlockingConnection(
             pika.ConnectionParameters(
                 host=settings.config["amqp"]["host"],
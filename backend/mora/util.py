@@ -77,7 +77,27 @@ def parsedatetime(s: str, default=_sentinel) -> datetime.datetime:
 
         return dt
 
-    elif s == 'infinity':
+    try:
+        return _parse_datetime_string(s)
+    except ValueError:
+        if default is not _sentinel:
+            return default
+        else:
+            exceptions.ErrorCodes.E_INVALID_INPUT(
+                'cannot parse {!r}'.format(s)
+            )
+
+
+@functools.lru_cache(maxsize=8192)
+def _parse_datetime_string(s: str) -> datetime.datetime:
+    '''Parse a date or time given as a string, raising
+    :py:exc:`ValueError` if that isn't possible.
+
+    The same few timestamps tend to recur across the effects of an
+    object, so we remember the most recent results.
+
+    '''
+    if s == 'infinity':
         return POSITIVE_INFINITY
     elif s == '-infinity':
         return NEGATIVE_INFINITY
@@ -85,22 +105,19 @@ def parsedatetime(s: str, default=_sentinel) -> datetime.datetime:
     if ' ' in s:
         # the frontend doesn't escape the 'plus' in ISO 8601 dates, so
         # we get it as a space
-        s = re.sub(r' (?=\d\d:\d\d$)', '+', s)
+        s = _UNESCAPED_PLUS.sub('+', s)
 
     try:
-        return from_iso_time(s)
+        return _from_common_iso_time(s)
     except ValueError:
         pass
 
     try:
-        dt = dateutil.parser.parse(s, dayfirst=True, tzinfos=_tzinfos)
+        return from_iso_time(s)
     except ValueError:
-        if default is not _sentinel:
-            return default
-        else:
-            exceptions.ErrorCodes.E_INVALID_INPUT(
-                'cannot parse {!r}'.format(s)
-            )
+        pass
+
+    dt = dateutil.parser.parse(s, dayfirst=True, tzinfos=_tzinfos)
 
     if dt.date() == POSITIVE_INFINITY.date():
         return POSITIVE_INFINITY
@@ -188,6 +205,63 @@ def to_iso_date(s, is_end: bool=False):
     return dt.date().isoformat()
 
 
+_UNESCAPED_PLUS = re.compile(r' (?=\d\d:\d\d$)')
+
+# the formats emitted by LoRa and the frontend, such as '2017-01-01',
+# '2017-01-01 00:00:00+01' or '2017-01-01T00:00:00.000000+01:00'
+_COMMON_ISO_TIME = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)'
+    r'(?:[T ](\d\d):(\d\d)(?::(\d\d)(?:\.(\d{1,6}))?)?)?'
+    r'(?:(Z)|([+-])(\d\d)(?::?(\d\d))?)?'
+)
+
+
+def _from_common_iso_time(s):
+    '''Like :py:func:`from_iso_time`, but only for the most common
+    formats, which we can parse quickly.'''
+    m = _COMMON_ISO_TIME.fullmatch(s)
+
+    if not m:
+        raise ValueError('unsupported format: {!r}'.format(s))
+
+    (
+        year, month, day, hour, minute, second, fraction,
+        utc, sign, offset_hours, offset_minutes,
+    ) = m.groups()
+
+    dt = datetime.datetime(
+        int(year), int(month), int(day),
+        int(hour or 0), int(minute or 0), int(second or 0),
+        int(fraction.ljust(6, '0')) if fraction else 0,
+    )
+
+    if utc:
+        return dt.replace(tzinfo=datetime.timezone.utc).astimezone(
+            DEFAULT_TIMEZONE,
+        )
+    elif sign:
+        offset = datetime.timedelta(
+            hours=int(offset_hours),
+            minutes=int(offset_minutes or 0),
+        )
+
+        if sign == '-':
+            offset = -offset
+
+        # converting between time zones is slow, so skip it when the
+        # offset is already that of our own time zone
+        local = dt.replace(tzinfo=DEFAULT_TIMEZONE)
+
+        if local.utcoffset() == offset:
+            return local
+
+        return dt.replace(
+            tzinfo=datetime.timezone(offset),
+        ).astimezone(DEFAULT_TIMEZONE)
+    else:
+        return dt.replace(tzinfo=DEFAULT_TIMEZONE)
+
+
 def from_iso_time(s):
     dt = dateutil.parser.isoparse(s)
 
@@ -771,6 +845,69 @@ def get_args_flag(name: str):
         return bool(v)
 
 
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_ndjson() -> bool:
+    '''Whether the Flask request prefers newline-delimited JSON over
+    a regular JSON document.'''
+
+    return flask.request.accept_mimetypes.best_match(
+        ['application/json', NDJSON_MIMETYPE],
+    ) == NDJSON_MIMETYPE
+
+
+def jsonify_items(items: typing.Iterable, headers=None) -> flask.Response:
+    '''Create a response with the given items as a JSON array.
+
+    If the client accepts ``application/x-ndjson``, each item is
+    instead written on a line of its own as it is produced, so that
+    the response is streamed rather than kept in memory. Please note
+    that errors occurring while streaming cannot be reported with a
+    status code, and merely end the response.
+
+    '''
+
+    if not wants_ndjson():
+        return flask.jsonify(list(items))
+
+    def generate():
+        for item in items:
+            yield flask.json.dumps(item) + '\n'
+
+    return flask.Response(
+        flask.stream_with_context(generate()),
+        mimetype=NDJSON_MIMETYPE,
+        headers=headers,
+    )
+
+
+def jsonify_paged(result: dict) -> flask.Response:
+    '''Create a response with a page as returned by
+    :py:meth:`mora.lora.Scope.paged_get`.
+
+    When streaming, as described in :py:func:`jsonify_items`, only the
+    items are written, with the offset and total given in the
+    ``X-Offset`` and ``X-Total-Count`` headers.
+
+    '''
+
+    if not wants_ndjson():
+        return flask.jsonify({
+            **result,
+            'items': list(result['items']),
+        })
+
+    headers = {
+        'X-Offset': str(result['offset']),
+    }
+
+    if result['total'] is not None:
+        headers['X-Total-Count'] = str(result['total'])
+
+    return jsonify_items(result['items'], headers)
+
+
 class StrUUIDConverter(werkzeug.routing.UUIDConverter):
     """Custom URL converter returning UUIDs as strings rather than UUIDs"""
     def to_python(self, value):
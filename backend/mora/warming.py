@@ -0,0 +1,86 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+'''Warm the caches of MO before serving any requests.
+
+Under gunicorn, this runs in the master process once the app is
+loaded, so that each worker forked from it starts out with the
+configured organisation, the classification and the counts used for
+paging, rather than paying for them on its first requests. The caches
+are still refreshed individually, as their time to live expires.
+
+The organisation hierarchy isn't warmed, as it changes with each
+write to a unit, and nor is the configuration in the configuration
+database, as it may change at runtime.
+
+'''
+
+import gc
+import logging
+import time
+import typing
+
+import flask
+
+from . import lora
+from . import readmodel
+from . import responsecache
+
+logger = logging.getLogger(__name__)
+
+
+def warm(app: flask.Flask) -> typing.Dict[str, int]:
+    '''Fill the caches of MO, reading from LoRa.
+
+    :return: The number of objects read for each cache.
+    '''
+    # imported here, as importing the service API is part of creating
+    # the app
+    from .service import association
+    from .service import facet
+    from .service import org
+
+    started = time.perf_counter()
+
+    with app.test_request_context():
+        responsecache.mark_local_caches()
+
+        orgid = org.get_configured_organisation()['uuid']
+
+        c = lora.Connector()
+
+        result = {
+            'classification': facet.prime_classification_cache(c),
+            # the counts of the searches performed when listing
+            # employees and units, i.e. without any query
+            'employees': c.bruger.count(gyldighed='Aktiv'),
+            'units': c.organisationenhed.count(
+                tilhoerer=orgid,
+                gyldighed='Aktiv',
+            ),
+            'associated employees': len(
+                association.get_associated_employees(c),
+            ),
+        }
+
+    logger.info('warmed caches in %.1f seconds: %s',
+                time.perf_counter() - started, result)
+
+    return result
+
+
+def prepare_fork():
+    '''Prepare the current process for forking workers, after warming.
+
+    The connections pooled by the session used for LoRa, and those to
+    the read model and the response cache, are closed, as workers must
+    not share them, and all objects allocated so far are moved out of
+    reach of the garbage collector, so that collecting doesn't touch,
+    and thereby copy, the memory shared with the workers.
+    '''
+    lora.session.close()
+    readmodel.close()
+    responsecache.close()
+
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,164 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+import os
+import tempfile
+from unittest import mock
+
+import freezegun
+
+from mora import lora
+from mora import responsecache
+
+from . import util
+
+ORGID = '00000000-0000-0000-0000-000000000000'
+UNITID = '00000000-0000-0000-0000-000000000001'
+SYSTEMID = '00000000-0000-0000-0000-000000000002'
+
+URL = 'http://mox/organisation/itsystem?tilhoerer={}&list=1'.format(ORGID)
+PATH = '/service/o/{}/it/'.format(ORGID)
+
+
+def itsystem(name, registered):
+    return {
+        'id': SYSTEMID,
+        'registreringer': [{
+            'fratidspunkt': {'tidsstempeldatotid': registered},
+            'attributter': {
+                'itsystemegenskaber': [{
+                    'brugervendtnoegle': name,
+                    'itsystemnavn': name,
+                }],
+            },
+        }],
+    }
+
+
+@util.mock()
+@freezegun.freeze_time('2018-01-01', tz_offset=1)
+class Tests(util.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(responsecache.close)
+
+        self.config = {
+            'response_cache': {
+                'path': os.path.join(directory.name, 'cache.sqlite'),
+                'ttl': 60,
+            },
+        }
+
+    def test_conditional_get(self, m):
+        m.get(URL, json={'results': [[
+            itsystem('Første', '2017-01-01T00:00:00+01:00'),
+        ]]})
+
+        r = self.client.get(PATH)
+
+        self.assertEqual(200, r.status_code)
+        etag = r.headers['ETag']
+
+        with self.subTest('unchanged'):
+            r = self.client.get(PATH, headers={'If-None-Match': etag})
+
+            self.assertEqual(304, r.status_code)
+            self.assertEqual(b'', r.data)
+            self.assertEqual(etag, r.headers['ETag'])
+
+        with self.subTest('changed'):
+            m.get(URL, json={'results': [[
+                itsystem('Anden', '2017-06-01T00:00:00+02:00'),
+            ]]})
+
+            r = self.client.get(PATH, headers={'If-None-Match': etag})
+
+            self.assertEqual(200, r.status_code)
+            self.assertEqual('Anden', r.get_json()[0]['name'])
+            self.assertNotEqual(etag, r.headers['ETag'])
+
+        with self.subTest('other date'), \
+                freezegun.freeze_time('2018-01-02', tz_offset=1):
+            r = self.client.get(PATH, headers={'If-None-Match': etag})
+
+            self.assertEqual(200, r.status_code)
+
+        with self.subTest('error'):
+            m.get(URL, status_code=500)
+
+            r = self.client.get(PATH)
+
+            self.assertEqual(500, r.status_code)
+            self.assertNotIn('ETag', r.headers)
+
+    def test_before_reading(self, m):
+        m.get(URL, json={'results': [[
+            itsystem('Første', '2017-01-01T00:00:00+01:00'),
+        ]]})
+
+        with util.override_config(self.config):
+            r = self.client.get(PATH)
+
+            self.assertEqual(200, r.status_code)
+            self.assertEqual(1, m.call_count)
+            etag = r.headers['ETag']
+
+            with self.subTest('unchanged'):
+                r = self.client.get(PATH, headers={'If-None-Match': etag})
+
+                self.assertEqual(304, r.status_code)
+                self.assertEqual(etag, r.headers['ETag'])
+                self.assertEqual(1, m.call_count)
+
+            with self.subTest('cached response'):
+                r = self.client.get(PATH)
+
+                self.assertEqual(200, r.status_code)
+                self.assertEqual(etag, r.headers['ETag'])
+                self.assertEqual(1, m.call_count)
+
+            with self.subTest('written'):
+                m.patch('http://mox/organisation/itsystem/' + SYSTEMID,
+                        json={'uuid': SYSTEMID})
+                m.get(URL, json={'results': [[
+                    itsystem('Anden', '2017-06-01T00:00:00+02:00'),
+                ]]})
+
+                lora.Connector().itsystem.update({}, SYSTEMID)
+
+                r = self.client.get(PATH, headers={'If-None-Match': etag})
+
+                self.assertEqual(200, r.status_code)
+                self.assertEqual('Anden', r.get_json()[0]['name'])
+                self.assertNotEqual(etag, r.headers['ETag'])
+                self.assertEqual(3, m.call_count)
+
+    @mock.patch('mora.conf_db._get_connection')
+    def test_settings(self, m, p):
+        rows = p.return_value.cursor.return_value.fetchall
+        rows.return_value = [('show_roles', 'True')]
+        path = '/service/ou/{}/configuration'.format(UNITID)
+
+        with util.override_config(self.config):
+            r = self.client.get(path)
+
+            self.assertEqual({'show_roles': True}, r.get_json())
+            etag = r.headers['ETag']
+
+            with self.subTest('unchanged'):
+                r = self.client.get(path, headers={'If-None-Match': etag})
+
+                self.assertEqual(304, r.status_code)
+
+            with self.subTest('changed'):
+                rows.return_value = [('show_roles', 'False')]
+
+                r = self.client.get(path, headers={'If-None-Match': etag})
+
+                self.assertEqual(200, r.status_code)
+                self.assertEqual({'show_roles': False}, r.get_json())
+                self.assertNotEqual(etag, r.headers['ETag'])
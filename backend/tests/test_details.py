@@ -63,3 +63,56 @@ class Tests(util.TestCase):
             },
             status_code=400,
         )
+
+    @util.mock()
+    def test_list_details(self, m):
+        unitid = '00000000-0000-0000-0000-000000000001'
+
+        m.get(
+            'http://mox/organisation/organisationfunktion'
+            '?tilknyttedeenheder=' + unitid,
+            json={'results': [[]]},
+        )
+        m.get(
+            'http://mox/organisation/organisationfunktion'
+            '?funktionsnavn=Engagement&tilknyttedeenheder=' + unitid,
+            json={'results': [['10000000-0000-0000-0000-000000000001']]},
+        )
+        m.get(
+            'http://mox/organisation/organisationenhed?uuid=' + unitid,
+            json={'results': [[
+                {
+                    'id': unitid,
+                    'registreringer': [{
+                        'attributter': {
+                            'organisationenhedegenskaber': [{
+                                'brugervendtnoegle': 'enhed',
+                                'enhedsnavn': 'Enhed',
+                            }],
+                        },
+                    }],
+                },
+            ]]},
+        )
+
+        self.assertRequestResponse(
+            '/service/ou/{}/details/'.format(unitid),
+            {
+                'address': False,
+                'association': False,
+                'engagement': True,
+                'it': False,
+                'kle': False,
+                'leave': False,
+                'manager': False,
+                'org_unit': True,
+                'related_unit': False,
+                'role': False,
+            },
+        )
+
+        # the searches only list UUIDs
+        self.assertNotIn(
+            'list',
+            {key for request in m.request_history for key in request.qs},
+        )
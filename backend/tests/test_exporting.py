@@ -0,0 +1,215 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+import os
+import tempfile
+
+import freezegun
+import mock
+
+from mora import exceptions
+from mora import exporting
+from mora import responsecache
+
+from . import util
+
+PARENTID = '00000000-0000-0000-0000-000000000000'
+UNITIDS = [
+    '00000000-0000-0000-0000-000000000001',
+    '00000000-0000-0000-0000-000000000002',
+    '00000000-0000-0000-0000-000000000003',
+]
+
+
+def unit(unitid):
+    return {
+        'id': unitid,
+        'registreringer': [{
+            'attributter': {
+                'organisationenhedegenskaber': [{
+                    'brugervendtnoegle': unitid[-1],
+                    'enhedsnavn': 'Enhed ' + unitid[-1],
+                }],
+            },
+            'relationer': {
+                'overordnet': [{'uuid': PARENTID}],
+            },
+            'tilstande': {
+                'organisationenhedgyldighed': [{
+                    'gyldighed': 'Aktiv',
+                    'virkning': {
+                        'from': '2017-01-01 00:00:00+01',
+                        'to': 'infinity',
+                    },
+                }],
+            },
+        }],
+    }
+
+
+@util.mock()
+@freezegun.freeze_time('2018-01-01', tz_offset=1)
+class Tests(util.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def mock_units(self, m):
+        # LoRa doesn't order its results
+        m.get(
+            'http://mox/organisation/organisationenhed?gyldighed=Aktiv',
+            json={'results': [UNITIDS[::-1]]},
+        )
+        m.get(
+            'http://mox/organisation/organisationenhed?uuid=' + UNITIDS[0],
+            json={'results': [list(map(unit, UNITIDS[1::-1]))]},
+        )
+        m.get(
+            'http://mox/organisation/organisationenhed?uuid=' + UNITIDS[2],
+            json={'results': [[unit(UNITIDS[2])]]},
+        )
+
+    def read(self, name):
+        with open(os.path.join(self.directory.name, name), newline='') as fp:
+            return fp.read()
+
+    @mock.patch('mora.settings.DEFAULT_PAGE_SIZE', 2)
+    def test_export(self, m):
+        self.mock_units(m)
+
+        with self.subTest('written'):
+            self.assertEqual(
+                {'units.csv': True, 'units.jsonl': True},
+                exporting.run(self.directory.name, ['units'],
+                              ['csv', 'jsonl']),
+            )
+
+            self.assertEqual(
+                ['.exports.json', 'units.csv', 'units.jsonl'],
+                sorted(os.listdir(self.directory.name)),
+            )
+
+            self.assertEqual(
+                'uuid,user_key,name,parent,org_unit_type,org_unit_level,'
+                'time_planning,from,to\r\n' +
+                ''.join(
+                    '{0},{1},Enhed {1},{2},,,,2017-01-01,\r\n'.format(
+                        unitid, unitid[-1], PARENTID,
+                    )
+                    for unitid in UNITIDS
+                ),
+                self.read('units.csv'),
+            )
+            self.assertEqual(3, len(self.read('units.jsonl').splitlines()))
+
+        with self.subTest('unchanged'):
+            mtime = os.stat(
+                os.path.join(self.directory.name, 'units.csv'),
+            ).st_mtime_ns
+
+            self.assertEqual(
+                {'units.csv': False},
+                exporting.run(self.directory.name, ['units']),
+            )
+            self.assertEqual(
+                mtime,
+                os.stat(
+                    os.path.join(self.directory.name, 'units.csv'),
+                ).st_mtime_ns,
+            )
+            self.assertEqual(
+                ['.exports.json', 'units.csv', 'units.jsonl'],
+                sorted(os.listdir(self.directory.name)),
+            )
+
+        with self.subTest('failed'):
+            m.get(
+                'http://mox/organisation/organisationenhed?uuid=' + UNITIDS[2],
+                status_code=500,
+            )
+
+            with self.assertRaises(exceptions.HTTPException):
+                exporting.run(self.directory.name, ['units'])
+
+            self.assertEqual(
+                ['.exports.json', 'units.csv', 'units.jsonl'],
+                sorted(os.listdir(self.directory.name)),
+            )
+
+    @mock.patch('mora.settings.DEFAULT_PAGE_SIZE', 2)
+    def test_regenerated(self, m):
+        self.mock_units(m)
+        self.addCleanup(responsecache.close)
+
+        with util.override_config({
+            'response_cache': {
+                'path': os.path.join(self.directory.name, '.cache.sqlite'),
+                'ttl': 60,
+            },
+        }):
+            exporting.run(self.directory.name, ['units'])
+
+            with self.subTest('unchanged'):
+                call_count = m.call_count
+
+                self.assertEqual(
+                    {'units.csv': False},
+                    exporting.run(self.directory.name, ['units']),
+                )
+
+                # only the search
+                self.assertEqual(call_count + 1, m.call_count)
+
+            with self.subTest('written'):
+                responsecache.invalidate('organisation/organisationenhed')
+                call_count = m.call_count
+
+                self.assertEqual(
+                    {'units.csv': False},
+                    exporting.run(self.directory.name, ['units']),
+                )
+
+                # the search, and both pages
+                self.assertEqual(call_count + 3, m.call_count)
+
+            with self.subTest('other units'):
+                m.get(
+                    'http://mox/organisation/organisationenhed'
+                    '?gyldighed=Aktiv',
+                    json={'results': [UNITIDS[:2]]},
+                )
+
+                self.assertEqual(
+                    {'units.csv': True},
+                    exporting.run(self.directory.name, ['units']),
+                )
+                # the header, and two units
+                self.assertEqual(3, len(self.read('units.csv').splitlines()))
+
+    def test_incomplete_objects(self, m):
+        m.get(
+            'http://mox/organisation/organisationenhed?gyldighed=Aktiv',
+            json={'results': [UNITIDS[:1]]},
+        )
+        m.get(
+            'http://mox/organisation/organisationenhed?uuid=' + UNITIDS[0],
+            json={'results': [[
+                {'id': UNITIDS[0], 'registreringer': [{}]},
+            ]]},
+        )
+
+        exporting.run(self.directory.name, ['units'])
+
+        self.assertEqual(
+            'uuid,user_key,name,parent,org_unit_type,org_unit_level,'
+            'time_planning,from,to\r\n' +
+            UNITIDS[0] + ',,,,,,,,\r\n',
+            self.read('units.csv'),
+        )
+
+    def test_missing_directory(self, m):
+        with self.assertRaises(exceptions.ImproperlyConfigured):
+            exporting.run(os.path.join(self.directory.name, 'missing'))
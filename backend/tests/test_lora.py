@@ -474,3 +474,72 @@ class Tests(util.TestCase):
                 )
             ],
         )
+
+    def test_paged_get_caches_search(self, m):
+        uuids = [
+            '00000000-0000-0000-0000-000000000001',
+            '00000000-0000-0000-0000-000000000002',
+            '00000000-0000-0000-0000-000000000003',
+        ]
+
+        # LoRa returns the UUIDs in no particular order
+        m.get(
+            'http://mox/organisation/bruger?bvn=%25',
+            json={'results': [uuids[::-1]]},
+        )
+        m.get(
+            'http://mox/organisation/bruger?uuid=' + uuids[0],
+            json={'results': [[
+                {'id': objid, 'registreringer': [{}]}
+                for objid in uuids[:2]
+            ]]},
+        )
+        m.get(
+            'http://mox/organisation/bruger?uuid=' + uuids[2],
+            json={'results': [[
+                {'id': uuids[2], 'registreringer': [{}]},
+            ]]},
+        )
+        m.patch(
+            'http://mox/organisation/bruger/' + uuids[0],
+            json={'uuid': uuids[0]},
+        )
+
+        c = lora.Connector()
+
+        def func(c, objid, obj):
+            return objid
+
+        with self.subTest('first page'):
+            self.assertEqual(
+                {
+                    'total': 3,
+                    'offset': 0,
+                    'items': uuids[:2],
+                },
+                c.bruger.paged_get(func, start=0, limit=2, bvn='%'),
+            )
+
+        with self.subTest('last page'):
+            call_count = m.call_count
+
+            self.assertEqual(
+                {
+                    'total': 3,
+                    'offset': 2,
+                    'items': uuids[2:],
+                },
+                c.bruger.paged_get(func, start=2, limit=2, bvn='%'),
+            )
+
+            # only the items are read
+            self.assertEqual(call_count + 1, m.call_count)
+            self.assertEqual(3, c.bruger.count(bvn='%'))
+            self.assertEqual(call_count + 1, m.call_count)
+
+        with self.subTest('written'):
+            c.bruger.update({}, uuids[0])
+            call_count = m.call_count
+
+            self.assertEqual(3, c.bruger.count(bvn='%'))
+            self.assertEqual(call_count + 1, m.call_count)
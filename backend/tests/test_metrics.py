@@ -0,0 +1,68 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+from mora import metrics
+
+from . import util
+
+
+class Tests(util.TestCase):
+
+    def test_metrics(self):
+        metrics.observe_call('lora.test', 'GET', 0.25)
+        metrics.observe_cache('test', True)
+        metrics.observe_cache('test', False)
+        metrics.observe_cache('test', False)
+
+        # requests are recorded once they're done
+        self.request('/metrics')
+        r = self.request('/metrics')
+
+        self.assertEqual(200, r.status_code)
+        self.assertTrue(r.content_type.startswith('text/plain'))
+
+        lines = r.get_data(as_text=True).splitlines()
+
+        self.assertIn(
+            'mo_backend_call_duration_seconds_count'
+            '{backend="lora.test",method="GET"} 1.0',
+            lines,
+        )
+        self.assertIn(
+            'mo_cache_requests_total{cache="test",result="hit"} 1.0',
+            lines,
+        )
+        self.assertIn(
+            'mo_cache_requests_total{cache="test",result="miss"} 2.0',
+            lines,
+        )
+        self.assertIn(
+            'mo_request_duration_seconds_count'
+            '{endpoint="/metrics",method="GET",role_type=""} 1.0',
+            lines,
+        )
+
+    @util.mock()
+    def test_role_type(self, m):
+        m.get('http://mox/organisation/organisationfunktion',
+              json={'results': [[]]})
+
+        self.assertRequestResponse(
+            '/service/e/00000000-0000-0000-0000-000000000000/details/it',
+            [],
+        )
+
+        r = self.request('/metrics')
+        lines = r.get_data(as_text=True).splitlines()
+
+        # labelled by the details read, rather than their owner; other
+        # tests may have read other details
+        role_types = {
+            line.rpartition('role_type=')[2].partition('}')[0]
+            for line in lines
+            if line.startswith('mo_request_duration_seconds_count') and
+            '/details/<function>' in line
+        }
+
+        self.assertIn('"it"', role_types)
+        self.assertFalse(role_types & {'"e"', '"ou"'})
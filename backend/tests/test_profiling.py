@@ -0,0 +1,87 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+import json
+import os
+import pstats
+import tempfile
+from unittest import mock
+
+from mora import profiling
+
+from . import util
+
+
+@util.mock()
+class Tests(util.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+
+        self.profile_dir = tmpdir.name
+
+    def test_profile(self, m):
+        m.get('http://mox/version', json={'lora_version': '1.0'})
+
+        with util.override_config({
+            'profiling': {'directory': self.profile_dir},
+        }):
+            r = self.request('/version/', headers={
+                profiling.PROFILE_HEADER: '1',
+            })
+
+        self.assertEqual(200, r.status_code)
+
+        profile_id = r.headers[profiling.PROFILE_ID_HEADER]
+        path = os.path.join(self.profile_dir, profile_id)
+
+        with open(path + '.json') as fp:
+            summary = json.load(fp)
+
+        self.assertEqual(profile_id, summary['id'])
+        self.assertEqual('/version/?', summary['path'])
+        self.assertEqual(200, summary['status'])
+
+        # check that the profile is readable
+        pstats.Stats(path + '.prof')
+
+    def test_not_requested(self, m):
+        m.get('http://mox/version', json={'lora_version': '1.0'})
+
+        with util.override_config({
+            'profiling': {'directory': self.profile_dir},
+        }):
+            r = self.request('/version/')
+
+        self.assertNotIn(profiling.PROFILE_ID_HEADER, r.headers)
+        self.assertEqual([], os.listdir(self.profile_dir))
+
+    def test_disabled(self, m):
+        m.get('http://mox/version', json={'lora_version': '1.0'})
+
+        r = self.request('/version/', headers={
+            profiling.PROFILE_HEADER: '1',
+        })
+
+        self.assertNotIn(profiling.PROFILE_ID_HEADER, r.headers)
+
+    def test_not_allowed(self, m):
+        m.get('http://mox/version', json={'lora_version': '1.0'})
+
+        with util.override_config({
+            'profiling': {
+                'directory': self.profile_dir,
+                'users': ['alice'],
+            },
+        }), util.override_app_config(SAML_AUTH_ENABLE=True), mock.patch(
+            'mora.auth.base.get_username', return_value='mallory',
+        ):
+            r = self.request('/version/', headers={
+                profiling.PROFILE_HEADER: '1',
+            })
+
+        self.assertNotIn(profiling.PROFILE_ID_HEADER, r.headers)
+        self.assertEqual([], os.listdir(self.profile_dir))
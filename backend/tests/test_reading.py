@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+from mora import mapping
+from mora import util
+from mora.handler import reading
+
+from . import util as test_util
+
+VIRKNING = {'from': '2017-01-01 00:00:00+01', 'to': 'infinity'}
+
+EFFECT = {
+    'attributter': {
+        'organisationfunktionegenskaber': [{
+            'brugervendtnoegle': 'leder',
+            'funktionsnavn': 'Leder',
+            'virkning': VIRKNING,
+        }],
+    },
+    'relationer': {
+        'tilknyttedebrugere': [{
+            'uuid': '00000000-0000-0000-0000-000000000001',
+            'virkning': VIRKNING,
+        }],
+        'opgaver': [
+            {
+                'objekttype': 'lederniveau',
+                'uuid': '00000000-0000-0000-0000-000000000002',
+                'virkning': VIRKNING,
+            },
+            {
+                'objekttype': 'lederansvar',
+                'uuid': '00000000-0000-0000-0000-000000000003',
+                'virkning': VIRKNING,
+            },
+            {
+                'objekttype': 'lederansvar',
+                'uuid': '00000000-0000-0000-0000-000000000004',
+                'virkning': VIRKNING,
+            },
+        ],
+        'adresser': [{
+            'objekttype': 'EMAIL',
+            'urn': 'urn:mailto:leder@example.com',
+            'virkning': VIRKNING,
+        }],
+    },
+    'tilstande': {
+        'organisationfunktiongyldighed': [{
+            'gyldighed': 'Aktiv',
+            'virkning': VIRKNING,
+        }],
+    },
+}
+
+
+class Tests(test_util.TestCase):
+
+    def test_effect_record(self):
+        start = util.parsedatetime(VIRKNING['from'])
+        end = util.parsedatetime(VIRKNING['to'])
+
+        effect = reading.EffectRecord(
+            '10000000-0000-0000-0000-000000000000', start, end, EFFECT,
+        )
+
+        self.assertEqual(util.get_validity_object(start, end),
+                         effect.validity)
+
+        for name, field in vars(mapping).items():
+            if not isinstance(field, mapping.FieldTuple):
+                continue
+
+            with self.subTest(name):
+                self.assertEqual(field(EFFECT), effect.get(field))
+                self.assertEqual(list(field.get_uuids(EFFECT)),
+                                 effect.get_uuids(field))
+                self.assertEqual(field.get_uuid(EFFECT),
+                                 effect.get_uuid(field))
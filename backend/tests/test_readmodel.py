@@ -0,0 +1,295 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+import copy
+import os
+import tempfile
+from unittest import mock
+
+import freezegun
+
+from mora import common
+from mora import mapping
+from mora import readmodel
+from mora import triggers
+
+from . import util
+
+UNITID = '00000000-0000-0000-0000-000000000001'
+USERID = '00000000-0000-0000-0000-000000000002'
+FUNCID = '00000000-0000-0000-0000-000000000003'
+
+
+def virkning(start, end='infinity'):
+    return {'from': start, 'to': end}
+
+
+def unit(*names):
+    return {
+        'attributter': {
+            'organisationenhedegenskaber': [
+                {
+                    'brugervendtnoegle': name,
+                    'enhedsnavn': name,
+                    'virkning': virkning(start, end),
+                }
+                for name, start, end in names
+            ],
+        },
+        'tilstande': {
+            'organisationenhedgyldighed': [{
+                'gyldighed': 'Aktiv',
+                'virkning': virkning('2017-01-01 00:00:00+01'),
+            }],
+        },
+    }
+
+
+UNIT = unit(
+    ('Gammel', '2017-01-01 00:00:00+01', '2018-06-01 00:00:00+02'),
+    ('Ny', '2018-06-01 00:00:00+02', 'infinity'),
+)
+
+USER = {
+    'attributter': {
+        'brugeregenskaber': [{
+            'brugervendtnoegle': 'bruger',
+            'virkning': virkning('2017-01-01 00:00:00+01'),
+        }],
+    },
+}
+
+FUNC = {
+    'attributter': {
+        'organisationfunktionegenskaber': [{
+            'brugervendtnoegle': 'engagement',
+            'funktionsnavn': 'Engagement',
+            'virkning': virkning('2017-01-01 00:00:00+01'),
+        }],
+    },
+    'relationer': {
+        'tilknyttedebrugere': [{
+            'uuid': USERID,
+            'virkning': virkning('2017-01-01 00:00:00+01'),
+        }],
+        'tilknyttedeenheder': [{
+            'uuid': UNITID,
+            'virkning': virkning('2017-01-01 00:00:00+01'),
+        }],
+    },
+    'tilstande': {
+        'organisationfunktiongyldighed': [{
+            'gyldighed': 'Aktiv',
+            'virkning': virkning('2017-01-01 00:00:00+01'),
+        }],
+    },
+}
+
+
+@util.mock()
+@freezegun.freeze_time('2018-01-01', tz_offset=1)
+class Tests(util.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(readmodel.close)
+
+        self.config = {
+            'read_model': {
+                'enable': True,
+                'path': os.path.join(directory.name, 'model.sqlite'),
+            },
+        }
+
+    def mock_lora(self, m, objects):
+        for path, objid, obj in objects:
+            m.get(
+                'http://mox/organisation/{}'
+                '?bvn=%25&virkningfra=-infinity'.format(path),
+                json={'results': [[objid]]},
+            )
+            m.get(
+                'http://mox/organisation/{}?uuid={}'.format(path, objid),
+                json={'results': [[
+                    {'id': objid, 'registreringer': [obj]},
+                ]]},
+            )
+
+    def test_read_model(self, m):
+        self.mock_lora(m, [
+            ('organisationenhed', UNITID, UNIT),
+            ('bruger', USERID, USER),
+            ('organisationfunktion', FUNCID, FUNC),
+        ])
+
+        with util.override_config(self.config):
+            with self.subTest('not loaded'), self.app.test_request_context():
+                c = common.get_connector()
+
+                self.assertNotIsInstance(c.organisationenhed,
+                                         readmodel.ReadModelScope)
+
+            self.assertEqual(
+                {
+                    'organisationenhed': 1,
+                    'bruger': 1,
+                    'organisationfunktion': 1,
+                },
+                readmodel.load(),
+            )
+
+            call_count = m.call_count
+
+            with self.subTest('present'), self.app.test_request_context():
+                c = common.get_connector()
+
+                self.assertIsInstance(c.organisationenhed,
+                                      readmodel.ReadModelScope)
+                self.assertEqual(
+                    unit(('Gammel', '2017-01-01 00:00:00+01',
+                          '2018-06-01 00:00:00+02')),
+                    c.organisationenhed.get(UNITID),
+                )
+                self.assertEqual(
+                    [(FUNCID, FUNC)],
+                    list(c.organisationfunktion.get_all(
+                        tilknyttedebrugere=USERID,
+                        funktionsnavn=mapping.ENGAGEMENT_KEY,
+                        gyldighed='Aktiv',
+                    )),
+                )
+                self.assertEqual(
+                    [],
+                    c.organisationfunktion(
+                        tilknyttedeenheder=UNITID,
+                        funktionsnavn=mapping.MANAGER_KEY,
+                    ),
+                )
+                self.assertEqual(
+                    [(USERID, USER)],
+                    list(c.bruger.get_all_by_uuid([USERID])),
+                )
+
+            with self.subTest('other date'), \
+                    self.app.test_request_context('/?at=2019-01-01'):
+                c = common.get_connector()
+
+                self.assertEqual(
+                    ['Ny'],
+                    [
+                        attrs['enhedsnavn']
+                        for attrs in c.organisationenhed.get(UNITID)
+                        ['attributter']['organisationenhedegenskaber']
+                    ],
+                )
+
+            self.assertEqual(call_count, m.call_count)
+
+            with self.subTest('unsupported'), self.app.test_request_context():
+                m.get(
+                    'http://mox/organisation/organisationfunktion'
+                    '?bvn=engagement',
+                    json={'results': [[FUNCID]]},
+                )
+
+                c = common.get_connector()
+
+                self.assertEqual(
+                    [FUNCID],
+                    c.organisationfunktion(bvn='engagement'),
+                )
+                self.assertEqual(call_count + 1, m.call_count)
+
+    def test_updates(self, m):
+        self.mock_lora(m, [
+            ('organisationenhed', UNITID, UNIT),
+            ('bruger', USERID, USER),
+            ('organisationfunktion', FUNCID, FUNC),
+        ])
+
+        with util.override_config(self.config):
+            readmodel.load()
+
+            model = readmodel.get_model()
+            renamed = unit(('Omdøbt', '2017-01-01 00:00:00+01', 'infinity'))
+
+            with self.subTest('check'):
+                self.assertEqual(
+                    {
+                        'organisationenhed': [],
+                        'bruger': [],
+                        'organisationfunktion': [],
+                    },
+                    readmodel.check(),
+                )
+
+                self.mock_lora(m, [('organisationenhed', UNITID, renamed)])
+
+                self.assertEqual(
+                    {
+                        'organisationenhed': [UNITID],
+                        'bruger': [],
+                        'organisationfunktion': [],
+                    },
+                    readmodel.check(),
+                )
+                self.assertEqual(renamed,
+                                 model.get('organisationenhed', UNITID))
+
+            with self.subTest('write'):
+                m.get(
+                    'http://mox/organisation/organisationfunktion'
+                    '?uuid=' + FUNCID,
+                    json={'results': [[]]},
+                )
+
+                readmodel._update_after_write({
+                    triggers.Trigger.ROLE_TYPE: mapping.ENGAGEMENT,
+                    triggers.Trigger.UUID: FUNCID,
+                    triggers.Trigger.EMPLOYEE_UUID: USERID,
+                })
+
+                self.assertIsNone(model.get('organisationfunktion', FUNCID))
+                self.assertEqual(USER, model.get('bruger', USERID))
+
+    def test_terminate(self, m):
+        user = dict(USER, tilstande={
+            'brugergyldighed': [{
+                'gyldighed': 'Aktiv',
+                'virkning': virkning('2017-01-01 00:00:00+01'),
+            }],
+        })
+
+        self.mock_lora(m, [('bruger', USERID, user)])
+        m.get('http://mox/organisation/organisationfunktion',
+              json={'results': [[]]})
+
+        def add_history_entry(request, context):
+            self.mock_lora(m, [
+                ('bruger', USERID, dict(user, note=request.json()['note'])),
+            ])
+            return {'uuid': USERID}
+
+        m.patch('http://mox/organisation/bruger/' + USERID,
+                json=add_history_entry)
+
+        with util.override_config(self.config), \
+                mock.patch.object(triggers.Trigger, 'registry',
+                                  copy.deepcopy(triggers.Trigger.registry)):
+            readmodel.register()
+
+            self.assertRequestResponse(
+                '/service/e/{}/terminate'.format(USERID),
+                USERID,
+                json={'validity': {'to': '2018-06-30'}},
+                amqp_topics={'employee.employee.delete': 1},
+            )
+
+            # the refresh sees the history entry written by terminating
+            self.assertEqual(
+                'Afslut medarbejder',
+                readmodel.get_model().get('bruger', USERID).get('note'),
+            )
@@ -0,0 +1,148 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+import os
+import tempfile
+
+import flask
+import freezegun
+
+from mora import lora
+from mora import responsecache
+from mora.service import facet
+
+from . import util
+
+ORGID = '00000000-0000-0000-0000-000000000000'
+SYSTEMID = '00000000-0000-0000-0000-000000000001'
+
+
+def itsystem(name):
+    return {
+        'id': SYSTEMID,
+        'registreringer': [{
+            'attributter': {
+                'itsystemegenskaber': [{
+                    'brugervendtnoegle': name,
+                    'itsystemnavn': name,
+                }],
+            },
+        }],
+    }
+
+
+@util.mock()
+@freezegun.freeze_time('2018-01-01', tz_offset=1)
+class Tests(util.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(responsecache.close)
+
+        self.config = {
+            'response_cache': {
+                'path': os.path.join(directory.name, 'cache.sqlite'),
+                'ttl': 60,
+            },
+        }
+
+    def test_cached(self, m):
+        url = 'http://mox/organisation/itsystem?tilhoerer={}&list=1'.format(
+            ORGID,
+        )
+        path = '/service/o/{}/it/'.format(ORGID)
+        expected = [{
+            'uuid': SYSTEMID,
+            'name': 'Første',
+            'system_type': None,
+            'user_key': 'Første',
+        }]
+
+        m.get(url, json={'results': [[itsystem('Første')]]})
+
+        with util.override_config(self.config):
+            self.assertRequestResponse(path, expected)
+            m.get(url, json={'results': [[itsystem('Anden')]]})
+
+            with self.subTest('hit'):
+                self.assertRequestResponse(path, expected)
+                self.assertEqual(1, m.call_count)
+
+            with self.subTest('other write'):
+                m.post('http://mox/klassifikation/klasse',
+                       json={'uuid': SYSTEMID})
+
+                lora.Connector().klasse.create({})
+
+                self.assertRequestResponse(path, expected)
+
+            with self.subTest('invalidated'):
+                m.patch('http://mox/organisation/itsystem/' + SYSTEMID,
+                        json={'uuid': SYSTEMID})
+
+                lora.Connector().itsystem.update({}, SYSTEMID)
+
+                self.assertRequestResponse(path, [{
+                    'uuid': SYSTEMID,
+                    'name': 'Anden',
+                    'system_type': None,
+                    'user_key': 'Anden',
+                }])
+
+            with self.subTest('other date'), \
+                    freezegun.freeze_time('2018-01-02', tz_offset=1):
+                call_count = m.call_count
+
+                self.client.get(path)
+
+                self.assertEqual(call_count + 1, m.call_count)
+
+    def test_written_while_reading(self, m):
+        with util.override_config(self.config), self.app.app_context():
+            cache = responsecache.get_cache()
+            generation = cache.get_generation()
+
+            responsecache.invalidate('organisation/itsystem')
+
+            cache.put('key', flask.jsonify([]), {'organisation/itsystem'},
+                      generation, 60)
+
+            self.assertIsNone(cache.get('key'))
+
+            cache.put('key', flask.jsonify([]), {'organisation/itsystem'},
+                      cache.get_generation(), 60)
+
+            self.assertEqual([], cache.get('key').get_json())
+
+    def test_local_caches(self, m):
+        url = 'http://mox/organisation/itsystem?tilhoerer={}&list=1'.format(
+            ORGID,
+        )
+        path = '/service/o/{}/it/'.format(ORGID)
+
+        m.get(url, json={'results': [[itsystem('Første')]]})
+
+        with util.override_config(self.config):
+            with self.app.app_context():
+                responsecache.mark_local_caches()
+
+            facet._classification_cache['key'] = 0, {}
+
+            with self.subTest('current'):
+                self.client.get(path)
+
+                self.assertIn('key', facet._classification_cache)
+
+            with self.subTest('written by another worker'):
+                # i.e. not through this process, but the shared cache
+                with self.app.app_context():
+                    responsecache.get_cache().invalidate(
+                        ['organisation/itsystem'],
+                    )
+
+                self.client.get(path)
+
+                self.assertNotIn('key', facet._classification_cache)
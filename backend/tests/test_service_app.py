@@ -1,10 +1,16 @@
 # SPDX-FileCopyrightText: 2018-2020 Magenta ApS
 # SPDX-License-Identifier: MPL-2.0
 
+import os
+import subprocess
+import sys
+import tempfile
 from unittest import mock
 
 from tests import util
 
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 class Tests(util.TestCase):
     def test_failing_service(self):
@@ -46,3 +52,32 @@ class Tests(util.TestCase):
 
         self.assertFalse(unfiltered,
                          'no blueprints may have unrestricted arguments!')
+
+    def test_lazy_imports(self):
+        # these are only needed on first use, and are slow to import,
+        # so creating the app -- i.e. starting a worker -- shouldn't
+        # import them
+        deferred = {'pika', 'service_person_stamdata_udvidet'}
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        # pin the settings needed for creating the app: dummy mode, as
+        # Serviceplatformen is otherwise checked for a valid
+        # configuration, and somewhere to log to
+        r = subprocess.run(
+            [sys.executable, '-c',
+             'import sys, mora.app, mora.settings\n'
+             'mora.settings.config["dummy_mode"] = True\n'
+             'mora.settings.config["log"]["log_path"] = {!r}\n'
+             'mora.app.create_app({{"ENV": "testing", "DUMMY_MODE": True}})\n'
+             'print(*sys.modules)'.format(
+                 os.path.join(directory.name, 'mo.log'),
+             )],
+            cwd=BACKEND_DIR,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+
+        self.assertFalse(deferred & set(r.stdout.split()))
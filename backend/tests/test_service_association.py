@@ -0,0 +1,110 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+import freezegun
+
+from mora import lora
+from mora import mapping
+from mora.service import association
+from mora.triggers import Trigger
+
+from . import util
+
+
+@util.mock()
+@freezegun.freeze_time('2018-01-01', tz_offset=1)
+class Tests(util.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        association._associated_employees.clear()
+        self.addCleanup(association._associated_employees.clear)
+
+    def test_associated_employees(self, m):
+        alice = '00000000-0000-0000-0000-000000000001'
+        bob = '00000000-0000-0000-0000-000000000002'
+
+        m.get(
+            'http://mox/organisation/organisationfunktion'
+            '?funktionsnavn=Tilknytning&list=1',
+            json={'results': [[
+                {
+                    'id': '10000000-0000-0000-0000-000000000001',
+                    'registreringer': [{
+                        'relationer': {
+                            'tilknyttedebrugere': [{'uuid': alice}],
+                        },
+                    }],
+                },
+            ]]},
+        )
+        m.get(
+            'http://mox/organisation/organisationfunktion'
+            '?funktionsnavn=Tilknytning&tilknyttedebrugere=' + alice,
+            json={'results': [[]]},
+        )
+        m.get(
+            'http://mox/organisation/organisationfunktion'
+            '?funktionsnavn=Tilknytning&tilknyttedebrugere=' + bob,
+            json={'results': [['10000000-0000-0000-0000-000000000002']]},
+        )
+
+        c = lora.Connector()
+
+        with self.subTest('initial'):
+            self.assertEqual(
+                {alice},
+                association.get_associated_employees(c),
+            )
+
+        with self.subTest('cached'):
+            call_count = m.call_count
+
+            self.assertEqual(
+                {alice},
+                association.get_associated_employees(c),
+            )
+            self.assertEqual(call_count, m.call_count)
+
+        with self.subTest('per validity'):
+            future = lora.Connector(validity='future')
+            call_count = m.call_count
+
+            self.assertEqual(
+                {alice},
+                association.get_associated_employees(future),
+            )
+            self.assertEqual(call_count + 1, m.call_count)
+
+        with self.subTest('written'):
+            association.register()
+
+            # e.g. terminating alice ends her association, and runs the
+            # trigger of that function rather than of associations
+            with self.app.test_request_context():
+                Trigger.run({
+                    Trigger.ROLE_TYPE: mapping.ENGAGEMENT,
+                    Trigger.REQUEST_TYPE: mapping.RequestType.TERMINATE,
+                    Trigger.EVENT_TYPE: Trigger.Event.ON_AFTER,
+                    Trigger.EMPLOYEE_UUID: alice,
+                    association.PREVIOUS_EMPLOYEE_UUIDS: [bob],
+                })
+
+            self.assertEqual(
+                {bob},
+                association.get_associated_employees(c),
+            )
+            self.assertEqual(
+                {bob},
+                association.get_associated_employees(future),
+            )
+
+        with self.subTest('disabled'):
+            association._associated_employees.clear()
+
+            with util.override_config({
+                'lora': {'associated_employees_cache_ttl': 0},
+            }):
+                association.get_associated_employees(c)
+
+            self.assertEqual({}, dict(association._associated_employees))
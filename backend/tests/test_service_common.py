@@ -8,6 +8,7 @@ from mora import exceptions
 from mora import util as mora_util
 from mora import lora
 from mora import mapping
+from mora.service import handlers
 
 from . import util
 
@@ -204,6 +205,311 @@ class TestClass(util.TestCase):
         # Assert
         self.assertEqual(expected_result, actual_result)
 
+    def test_payload_builder(self):
+        # Arrange
+        payload = {
+            'note': 'NOTE',
+        }
+        path = ('hest', 'hestgyldighed')
+
+        # Act
+        builder = common.PayloadBuilder(payload)
+
+        result = common.inactivate_old_interval(
+            '2013-01-01T00:00:00+01:00', '2016-01-01T00:00:00+01:00',
+            '2014-01-01T00:00:00+01:00', '2015-01-01T00:00:00+01:00',
+            builder, path,
+        )
+
+        # Assert
+        self.assertIs(builder, result)
+        self.assertEqual({'note': 'NOTE'}, payload)
+        self.assertEqual(
+            common.inactivate_old_interval(
+                '2013-01-01T00:00:00+01:00', '2016-01-01T00:00:00+01:00',
+                '2014-01-01T00:00:00+01:00', '2015-01-01T00:00:00+01:00',
+                payload, path,
+            ),
+            builder.build(),
+        )
+
+    def test_is_payload_unchanged(self):
+        original = {
+            'attributter': {
+                'organisationfunktionudvidelser': [
+                    {
+                        'fraktion': '10',
+                        'virkning': {
+                            'from': '2017-01-01 00:00:00+01',
+                            'to': 'infinity',
+                        },
+                    },
+                ],
+            },
+            'relationer': {
+                'organisatoriskfunktionstype': [
+                    {
+                        'uuid': '00000000-0000-0000-0000-000000000001',
+                        'virkning': {
+                            'from': '2017-01-01 00:00:00+01',
+                            'to': '2018-01-01 00:00:00+01',
+                        },
+                    },
+                    {
+                        'uuid': '00000000-0000-0000-0000-000000000001',
+                        'virkning': {
+                            'from': '2018-01-01 00:00:00+01',
+                            'to': 'infinity',
+                        },
+                    },
+                ],
+            },
+        }
+
+        def get_payload(type_uuid, valid_from):
+            return common.update_payload(
+                mora_util.parsedatetime(valid_from),
+                mora_util.POSITIVE_INFINITY,
+                [
+                    (mapping.ORG_FUNK_TYPE_FIELD, {'uuid': type_uuid}),
+                    (mapping.ORG_FUNK_UDVIDELSER_FIELD, {'fraktion': 10}),
+                ],
+                original,
+                {
+                    'note': 'Rediger engagement',
+                },
+            )
+
+        with self.subTest('unchanged'):
+            self.assertTrue(common.is_payload_unchanged(
+                get_payload('00000000-0000-0000-0000-000000000001',
+                            '2017-06-01'),
+                original,
+            ))
+
+        with self.subTest('changed value'):
+            self.assertFalse(common.is_payload_unchanged(
+                get_payload('00000000-0000-0000-0000-000000000002',
+                            '2017-06-01'),
+                original,
+            ))
+
+        with self.subTest('changed validity'):
+            self.assertFalse(common.is_payload_unchanged(
+                get_payload('00000000-0000-0000-0000-000000000001',
+                            '2016-06-01'),
+                original,
+            ))
+
+    def test_merge_payloads(self):
+        original = {
+            'attributter': {
+                'organisationfunktionudvidelser': [
+                    {
+                        'fraktion': '10',
+                        'virkning': {
+                            'from': '2017-01-01 00:00:00+01',
+                            'to': 'infinity',
+                        },
+                    },
+                ],
+            },
+            'relationer': {
+                'opgaver': [
+                    {
+                        'uuid': '00000000-0000-0000-0000-000000000000',
+                        'virkning': {
+                            'from': '2017-01-01 00:00:00+01',
+                            'to': 'infinity',
+                        },
+                    },
+                ],
+            },
+        }
+
+        def get_payload(valid_from, fields, note):
+            return common.update_payload(
+                mora_util.parsedatetime(valid_from),
+                mora_util.POSITIVE_INFINITY,
+                fields,
+                original,
+                {
+                    'note': note,
+                },
+            )
+
+        with self.subTest('relations'):
+            self.assertEqual(
+                {
+                    'note': 'Rediger 2',
+                    'attributter': {
+                        'organisationfunktionudvidelser': [
+                            {
+                                'fraktion': 20,
+                                'virkning': {
+                                    'from': '2019-01-01T00:00:00+01:00',
+                                    'to': 'infinity',
+                                },
+                            },
+                        ],
+                    },
+                    'relationer': {
+                        'opgaver': [
+                            {
+                                'uuid': '00000000-0000-0000-0000-000000000000',
+                                'virkning': {
+                                    'from': '2017-01-01 00:00:00+01',
+                                    'to': '2018-01-01T00:00:00+01:00',
+                                },
+                            },
+                            {
+                                'uuid': '00000000-0000-0000-0000-000000000001',
+                                'virkning': {
+                                    'from': '2018-01-01T00:00:00+01:00',
+                                    'to': '2019-01-01T00:00:00+01:00',
+                                },
+                            },
+                            {
+                                'uuid': '00000000-0000-0000-0000-000000000002',
+                                'virkning': {
+                                    'from': '2019-01-01T00:00:00+01:00',
+                                    'to': 'infinity',
+                                },
+                            },
+                        ],
+                    },
+                },
+                common.merge_payloads(
+                    get_payload('2018-01-01', [
+                        (mapping.JOB_FUNCTION_FIELD, {
+                            'uuid': '00000000-0000-0000-0000-000000000001',
+                        }),
+                    ], 'Rediger 1'),
+                    get_payload('2019-01-01', [
+                        (mapping.JOB_FUNCTION_FIELD, {
+                            'uuid': '00000000-0000-0000-0000-000000000002',
+                        }),
+                        (mapping.ORG_FUNK_UDVIDELSER_FIELD, {
+                            'fraktion': 20,
+                        }),
+                    ], 'Rediger 2'),
+                    mora_util.parsedatetime('2019-01-01'),
+                    mora_util.POSITIVE_INFINITY,
+                ),
+            )
+
+        with self.subTest('attributes'):
+            self.assertEqual(
+                {
+                    'note': 'Rediger 2',
+                    'attributter': {
+                        'organisationfunktionudvidelser': [
+                            {
+                                'fraktion': 10,
+                                'virkning': {
+                                    'from': '2018-01-01T00:00:00+01:00',
+                                    'to': '2019-01-01T00:00:00+01:00',
+                                },
+                            },
+                            {
+                                'fraktion': 20,
+                                'virkning': {
+                                    'from': '2019-01-01T00:00:00+01:00',
+                                    'to': 'infinity',
+                                },
+                            },
+                        ],
+                    },
+                },
+                common.merge_payloads(
+                    get_payload('2018-01-01', [
+                        (mapping.ORG_FUNK_UDVIDELSER_FIELD, {
+                            'fraktion': 10,
+                        }),
+                    ], 'Rediger 1'),
+                    get_payload('2019-01-01', [
+                        (mapping.ORG_FUNK_UDVIDELSER_FIELD, {
+                            'fraktion': 20,
+                        }),
+                    ], 'Rediger 2'),
+                    mora_util.parsedatetime('2019-01-01'),
+                    mora_util.POSITIVE_INFINITY,
+                ),
+            )
+
+        with self.subTest('unsupported'):
+            self.assertIsNone(common.merge_payloads(
+                {'note': 'Rediger 1'},
+                {'note': 'Rediger 2', 'livscykluskode': 'Slettet'},
+                mora_util.parsedatetime('2019-01-01'),
+                mora_util.POSITIVE_INFINITY,
+            ))
+
+    def test_coalesce_reverted_edit(self):
+        funcid = '10000000-0000-0000-0000-000000000000'
+        users = [
+            '00000000-0000-0000-0000-000000000000',
+            '00000000-0000-0000-0000-000000000001',
+        ]
+        original = {
+            'relationer': {
+                'tilknyttedebrugere': [
+                    {
+                        'uuid': users[0],
+                        'virkning': {
+                            'from': '2019-01-01 00:00:00+01',
+                            'to': 'infinity',
+                        },
+                    },
+                ],
+            },
+        }
+
+        class Edit:
+            role_type = mapping.ENGAGEMENT
+            request_type = mapping.RequestType.EDIT
+            coalesce = handlers.RequestHandler.coalesce
+
+            def __init__(self, valid_from, user):
+                self.uuid = funcid
+                self.original = original
+                self.coalesced_into = None
+                self.request = {
+                    'data': {
+                        'validity': {'from': valid_from, 'to': None},
+                    },
+                }
+                self.payload = common.update_payload(
+                    mora_util.parsedatetime(valid_from),
+                    mora_util.POSITIVE_INFINITY,
+                    [(mapping.USER_FIELD, {'uuid': user})],
+                    original,
+                    {'note': 'Rediger engagement'},
+                )
+
+        # the edits are listed in the reverse order of their validity
+        edits = [
+            Edit('2021-01-01', users[0]),
+            Edit('2020-01-01', users[1]),
+        ]
+
+        handlers.coalesce_requests(edits)
+
+        self.assertIs(edits[0], edits[1].coalesced_into)
+        self.assertEqual(
+            [
+                (users[0], '2019-01-01 00:00:00+01',
+                 '2020-01-01T00:00:00+01:00'),
+                (users[1], '2020-01-01T00:00:00+01:00',
+                 '2021-01-01T00:00:00+01:00'),
+                (users[0], '2021-01-01T00:00:00+01:00', 'infinity'),
+            ],
+            [
+                (val['uuid'], val['virkning']['from'], val['virkning']['to'])
+                for val in edits[0].payload['relationer']['tilknyttedebrugere']
+            ],
+        )
+
     def test_does_not_inactivate_when_expanding_bounds(self):
         # Arrange
         old_from = '2014-01-01T00:00:00+01:00'
@@ -1831,3 +2137,110 @@ class TestClass(util.TestCase):
                 'uuid': userid,
             }
         )
+
+    @freezegun.freeze_time('2018-01-01')
+    @util.mock()
+    def test_history_cache(self, mock):
+        unitid = '00000000-0000-0000-0000-000000000001'
+
+        def reg(note, start, end):
+            return {
+                'brugerref': '42c432e8-9c4a-11e6-9f62-873cf34a735f',
+                'fratidspunkt': {'tidsstempeldatotid': start},
+                'tiltidspunkt': {'tidsstempeldatotid': end},
+                'livscykluskode': 'Rettet',
+                'note': note,
+            }
+
+        first = '2018-01-01T00:00:01+01:00'
+        second = '2018-01-01T00:00:02+01:00'
+        third = '2018-01-01T00:00:03+01:00'
+        fourth = '2018-01-01T00:00:04+01:00'
+
+        mock.get(
+            'http://mox/organisation/organisationenhed?uuid=' + unitid +
+            '&registreretfra=-infinity&registrerettil=infinity',
+            json={'results': [[{'id': unitid, 'registreringer': [
+                reg('Oprettet', first, second),
+                reg('Rediger', second, third),
+                reg('Afslut', third, 'infinity'),
+            ]}]]},
+        )
+        mock.get(
+            'http://mox/organisation/organisationenhed?uuid=' + unitid +
+            '&registreretfra=2018-01-01T00%3A00%3A03%2B01%3A00'
+            '&registrerettil=infinity',
+            json={'results': [[{'id': unitid, 'registreringer': [
+                reg('Rediger', second, third),
+                reg('Afslut', third, fourth),
+                reg('Genopret', fourth, 'infinity'),
+            ]}]]},
+        )
+
+        c = lora.Connector()
+
+        with self.subTest('initial'):
+            self.assertEqual(
+                ['Afslut', 'Rediger', 'Oprettet'],
+                [
+                    entry['action']
+                    for entry in common.get_history(
+                        c.organisationenhed, unitid,
+                    )
+                ],
+            )
+
+        with self.subTest('only newer registrations'):
+            self.assertEqual(
+                [
+                    ('Genopret', None),
+                    ('Afslut', mora_util.to_iso_time(fourth)),
+                    ('Rediger', mora_util.to_iso_time(third)),
+                    ('Oprettet', mora_util.to_iso_time(second)),
+                ],
+                [
+                    (entry['action'], entry['to'])
+                    for entry in common.get_history(
+                        c.organisationenhed, unitid,
+                    )
+                ],
+            )
+
+        with self.subTest('disabled'):
+            common._history_cache.clear()
+
+            with util.override_config({'lora': {'history_cache_size': 0}}):
+                self.assertEqual(
+                    3,
+                    len(common.get_history(c.organisationenhed, unitid)),
+                )
+
+            self.assertEqual({}, dict(common._history_cache))
+
+        with self.subTest('missing'):
+            mock.get(
+                'http://mox/organisation/organisationenhed?uuid=' + unitid,
+                json={'results': []},
+            )
+
+            self.assertIsNone(common.get_history(c.organisationenhed, unitid))
+
+    def test_jsonify_history(self):
+        entries = [{'action': str(i)} for i in range(5)]
+
+        with self.app.test_request_context('/?start=1&limit=2'):
+            r = common.jsonify_history(entries)
+
+            self.assertEqual(entries[1:3], r.get_json())
+            self.assertEqual('1', r.headers['X-Offset'])
+            self.assertEqual('5', r.headers['X-Total-Count'])
+
+        for args in ('start=kaflaflibob', 'limit=-1', 'start=1.5'):
+            with self.subTest(args), \
+                    self.app.test_request_context('/?' + args), \
+                    self.assertRaises(exceptions.HTTPException) as cm:
+                common.jsonify_history(entries)
+
+            self.assertEqual(400, cm.exception.code)
+            self.assertEqual('E_INVALID_INPUT',
+                             cm.exception.body['error_key'])
@@ -0,0 +1,192 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+from unittest import mock
+
+import freezegun
+
+from mora import lora
+from mora.handler.impl import engagement
+
+from . import util
+
+PERSONID = '00000000-0000-0000-0000-000000000001'
+SINGLEID = '00000000-0000-0000-0000-000000000002'
+ENGAGEMENTIDS = [
+    '10000000-0000-0000-0000-000000000001',
+    '10000000-0000-0000-0000-000000000002',
+    '10000000-0000-0000-0000-000000000003',
+]
+FACETID = '20000000-0000-0000-0000-000000000000'
+PRIMARYID = '20000000-0000-0000-0000-000000000001'
+SECONDARYID = '20000000-0000-0000-0000-000000000002'
+
+VIRKNING = {'from': '2017-01-01 00:00:00+01', 'to': 'infinity'}
+
+
+def engagement_obj(personid, primaryid):
+    return {
+        'attributter': {
+            'organisationfunktionegenskaber': [{
+                'brugervendtnoegle': 'engagement',
+                'funktionsnavn': 'Engagement',
+                'virkning': VIRKNING,
+            }],
+        },
+        'relationer': {
+            'tilknyttedebrugere': [{'uuid': personid, 'virkning': VIRKNING}],
+            'primær': [{'uuid': primaryid, 'virkning': VIRKNING}],
+        },
+        'tilstande': {
+            'organisationfunktiongyldighed': [{
+                'gyldighed': 'Aktiv',
+                'virkning': VIRKNING,
+            }],
+        },
+    }
+
+
+def class_obj(scope):
+    return {
+        'attributter': {
+            'klasseegenskaber': [{
+                'brugervendtnoegle': scope,
+                'omfang': scope,
+                'titel': scope,
+                'virkning': VIRKNING,
+            }],
+        },
+    }
+
+
+ENGAGEMENTS = {
+    PERSONID: [
+        (ENGAGEMENTIDS[0], engagement_obj(PERSONID, SECONDARYID)),
+        (ENGAGEMENTIDS[1], engagement_obj(PERSONID, PRIMARYID)),
+    ],
+    SINGLEID: [
+        (ENGAGEMENTIDS[2], engagement_obj(SINGLEID, SECONDARYID)),
+    ],
+}
+
+
+def mock_lora(m):
+    def get_engagements(request, context):
+        return {'results': [[
+            {'id': funcid, 'registreringer': [obj]}
+            for funcid, obj in ENGAGEMENTS.get(
+                request.qs['tilknyttedebrugere'][0], [],
+            )
+        ]]}
+
+    m.get('http://mox/organisation/organisationfunktion',
+          json=get_engagements)
+    m.get('http://mox/klassifikation/facet?bvn=primary_type',
+          json={'results': [[FACETID]]})
+    m.get('http://mox/klassifikation/klasse?facet=' + FACETID,
+          json={'results': [[
+              {'id': SECONDARYID, 'registreringer': [class_obj('1000')]},
+              {'id': PRIMARYID, 'registreringer': [class_obj('3000')]},
+          ]]})
+
+
+@util.mock()
+@freezegun.freeze_time('2018-01-01', tz_offset=1)
+class Tests(util.TestCase):
+
+    def test_is_primary(self, m):
+        mock_lora(m)
+
+        with self.app.test_request_context('/?calculate_primary=1'):
+            c = lora.Connector()
+
+            self.assertEqual(
+                [False, True],
+                [
+                    engagement.EngagementReader._is_primary(
+                        c, PERSONID, primaryid,
+                    )
+                    for primaryid in (SECONDARYID, PRIMARYID)
+                ],
+            )
+
+            # the engagements and ranking are only read once
+            self.assertEqual(3, m.call_count)
+
+        # requests get their own application context when served
+        with self.subTest('next request'), self.app.app_context(), \
+                self.app.test_request_context('/?calculate_primary=1'):
+            self.assertTrue(
+                engagement.EngagementReader._is_primary(
+                    lora.Connector(), PERSONID, PRIMARYID,
+                ),
+            )
+
+            # the ranking is kept across requests
+            self.assertEqual(3 + 1, m.call_count)
+
+        with self.subTest('class written'), self.app.app_context(), \
+                self.app.test_request_context('/?calculate_primary=1'):
+            m.patch('http://mox/klassifikation/klasse/' + PRIMARYID,
+                    json={'uuid': PRIMARYID})
+
+            c = lora.Connector()
+            c.klasse.update({}, PRIMARYID)
+            call_count = m.call_count
+
+            engagement.EngagementReader._is_primary(c, PERSONID, PRIMARYID)
+
+            self.assertEqual(call_count + 3, m.call_count)
+
+    @mock.patch('mora.handler.impl.engagement.EngagementReader'
+                '.get_mo_object_from_effect')
+    def test_primary_engagements(self, m, get_mo_object_from_effect):
+        mock_lora(m)
+
+        get_mo_object_from_effect.side_effect = (
+            lambda effect, start, end, funcid: {'uuid': funcid}
+        )
+
+        self.assertRequestResponse(
+            '/service/e/details/primary_engagement?uuid={}&uuid={}'.format(
+                PERSONID, SINGLEID,
+            ),
+            {
+                PERSONID: [{'uuid': ENGAGEMENTIDS[1], 'is_primary': True}],
+                SINGLEID: [{'uuid': ENGAGEMENTIDS[2], 'is_primary': True}],
+            },
+        )
+
+        self.assertRequestResponse(
+            '/service/e/details/primary_engagement?uuid=kaflaflibob',
+            {
+                'error': True,
+                'error_key': 'E_INVALID_UUID',
+                'description': "Invalid uuid for 'uuid': 'kaflaflibob'",
+                'status': 400,
+            },
+            status_code=400,
+        )
+
+
+@util.mock()
+class UnfrozenTests(util.TestCase):
+
+    def test_is_primary_per_request(self, m):
+        mock_lora(m)
+
+        with self.app.test_request_context('/?calculate_primary=1'):
+            for primaryid in (SECONDARYID, PRIMARYID, PRIMARYID):
+                # as in get_mo_object_from_effect, each engagement gets
+                # a new connector, with the current time as its start
+                engagement.EngagementReader._is_primary(
+                    lora.Connector(), PERSONID, primaryid,
+                )
+
+        self.assertEqual(
+            1,
+            len([
+                request for request in m.request_history
+                if 'tilknyttedebrugere' in request.qs
+            ]),
+        )
@@ -32,9 +32,9 @@ class Tests(util.TestCase):
         filenames = ['file1', 'file2']
 
         def mocked_isfile(filename):
-            return filename in filenames
+            return filename in filenames + ['.file3.csv']
 
-        mock_listdir.return_value = filenames + ['dir']
+        mock_listdir.return_value = filenames + ['dir', '.file3.csv']
 
         mock_isfile.side_effect = mocked_isfile
 
@@ -0,0 +1,91 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+import freezegun
+
+from mora import lora
+from mora.service import facet
+
+from . import util
+
+
+@util.mock()
+@freezegun.freeze_time('2018-01-01', tz_offset=1)
+class Tests(util.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        facet._classification_cache.clear()
+        self.addCleanup(facet._classification_cache.clear)
+
+    def test_classification_cache(self, m):
+        facetid = '00000000-0000-0000-0000-000000000001'
+        classid = '00000000-0000-0000-0000-000000000002'
+        otherid = '00000000-0000-0000-0000-000000000003'
+
+        m.get(
+            'http://mox/klassifikation/facet?publiceret=Publiceret&list=1',
+            json={'results': [[
+                {'id': facetid, 'registreringer': [{'facet': True}]},
+            ]]},
+        )
+        m.get(
+            'http://mox/klassifikation/klasse?publiceret=Publiceret&list=1',
+            json={'results': [[
+                {'id': classid, 'registreringer': [{'klasse': True}]},
+            ]]},
+        )
+        m.get(
+            'http://mox/klassifikation/klasse?uuid=' + otherid,
+            json={'results': [[
+                {'id': otherid, 'registreringer': [{'andet': True}]},
+            ]]},
+        )
+
+        c = lora.Connector()
+
+        with self.subTest('primed'):
+            self.assertEqual(2, facet.prime_classification_cache(c))
+
+            call_count = m.call_count
+
+            self.assertEqual(
+                {'facet': True},
+                facet.get_cached_object(c.facet, facetid),
+            )
+            self.assertEqual(
+                {'klasse': True},
+                facet.get_cached_object(c.klasse, classid),
+            )
+            self.assertEqual(call_count, m.call_count)
+
+        with self.subTest('read once'):
+            for i in range(2):
+                self.assertEqual(
+                    {'andet': True},
+                    facet.get_cached_object(c.klasse, otherid),
+                )
+
+            self.assertEqual(call_count + 1, m.call_count)
+
+        with self.subTest('other date'):
+            self.assertEqual(
+                {'andet': True},
+                facet.get_cached_object(
+                    lora.Connector(effective_date='2019-01-01').klasse,
+                    otherid,
+                ),
+            )
+
+            self.assertEqual(call_count + 2, m.call_count)
+
+        with self.subTest('disabled'):
+            facet._classification_cache.clear()
+
+            with util.override_config({
+                'lora': {'classification_cache_ttl': 0},
+            }):
+                self.assertEqual(0, facet.prime_classification_cache(c))
+                facet.get_cached_object(c.klasse, otherid)
+
+            self.assertEqual({}, dict(facet._classification_cache))
@@ -0,0 +1,162 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+from unittest import mock
+
+import freezegun
+
+from mora import lora
+from mora.handler.impl import manager
+
+from . import util
+
+ORGID = '00000000-0000-0000-0000-000000000000'
+ROOTID = '00000000-0000-0000-0000-000000000001'
+MIDDLEID = '00000000-0000-0000-0000-000000000002'
+LEAFID = '00000000-0000-0000-0000-000000000003'
+INACTIVEID = '00000000-0000-0000-0000-000000000004'
+MANAGERID = '10000000-0000-0000-0000-000000000001'
+
+VIRKNING = {'from': '2017-01-01 00:00:00+01', 'to': 'infinity'}
+
+
+def unit(parentid, validity='Aktiv'):
+    return {
+        'attributter': {
+            'organisationenhedegenskaber': [{
+                'brugervendtnoegle': parentid,
+                'enhedsnavn': parentid,
+                'virkning': VIRKNING,
+            }],
+        },
+        'relationer': {
+            'overordnet': [{'uuid': parentid, 'virkning': VIRKNING}],
+        },
+        'tilstande': {
+            'organisationenhedgyldighed': [{
+                'gyldighed': validity,
+                'virkning': VIRKNING,
+            }],
+        },
+    }
+
+
+MANAGER = {
+    'attributter': {
+        'organisationfunktionegenskaber': [{
+            'brugervendtnoegle': 'leder',
+            'funktionsnavn': 'Leder',
+            'virkning': VIRKNING,
+        }],
+    },
+    'relationer': {
+        'tilknyttedeenheder': [{'uuid': ROOTID, 'virkning': VIRKNING}],
+    },
+    'tilstande': {
+        'organisationfunktiongyldighed': [{
+            'gyldighed': 'Aktiv',
+            'virkning': VIRKNING,
+        }],
+    },
+}
+
+UNITS = {
+    ROOTID: unit(ORGID),
+    MIDDLEID: unit(ROOTID),
+    LEAFID: unit(MIDDLEID),
+    INACTIVEID: unit(ROOTID, 'Inaktiv'),
+}
+
+
+@util.mock()
+@freezegun.freeze_time('2018-01-01', tz_offset=1)
+class Tests(util.TestCase):
+
+    def mock_lora(self, m):
+        def get_units(request, context):
+            return {'results': [[
+                {'id': unitid, 'registreringer': [UNITS[unitid]]}
+                for unitid in request.qs['uuid']
+                if unitid in UNITS
+            ]]}
+
+        def get_managers(request, context):
+            unitids = request.qs.get('tilknyttedeenheder', [ROOTID])
+
+            return {'results': [[
+                {'id': MANAGERID, 'registreringer': [MANAGER]},
+            ] if ROOTID in unitids else []]}
+
+        m.get('http://mox/organisation/organisationenhed', json=get_units)
+        m.get('http://mox/organisation/organisationfunktion',
+              json=get_managers)
+
+    def test_nearest_managed_units(self, m):
+        self.mock_lora(m)
+
+        c = lora.Connector()
+        expected = {
+            ROOTID: (ROOTID, [(MANAGERID, MANAGER)]),
+            MIDDLEID: (ROOTID, [(MANAGERID, MANAGER)]),
+            LEAFID: (ROOTID, [(MANAGERID, MANAGER)]),
+            INACTIVEID: (None, []),
+            ORGID: (None, []),
+        }
+
+        with self.subTest('unit by unit'):
+            self.assertEqual(
+                expected,
+                manager.ManagerReader.get_nearest_managed_units(
+                    c, list(expected),
+                ),
+            )
+
+            # a search for each unit, and a read of the units given
+            # and of their parents; the grandparents are known by then
+            self.assertEqual(5 + 2, m.call_count)
+
+        with self.subTest('all at once'), \
+                mock.patch.object(manager, '_MANAGER_SEARCH_LIMIT', 0):
+            call_count = m.call_count
+
+            self.assertEqual(
+                expected,
+                manager.ManagerReader.get_nearest_managed_units(
+                    lora.Connector(), list(expected),
+                ),
+            )
+
+            self.assertEqual(call_count + 1 + 2, m.call_count)
+
+    @mock.patch('mora.handler.impl.manager.ManagerReader.get_obj_effects')
+    def test_inherited_managers(self, m, get_obj_effects):
+        self.mock_lora(m)
+
+        get_obj_effects.side_effect = lambda c, funcs: [
+            {'uuid': funcid} for funcid, func in funcs
+        ]
+
+        self.assertRequestResponse(
+            '/service/ou/details/manager?uuid={}&uuid={}&uuid={}'.format(
+                LEAFID, MIDDLEID, INACTIVEID,
+            ),
+            {
+                LEAFID: [{'uuid': MANAGERID}],
+                MIDDLEID: [{'uuid': MANAGERID}],
+                INACTIVEID: [],
+            },
+        )
+
+        # the managers of each nearest unit are only looked up once
+        self.assertEqual(2, get_obj_effects.call_count)
+
+        self.assertRequestResponse(
+            '/service/ou/details/manager?uuid=kaflaflibob',
+            {
+                'error': True,
+                'error_key': 'E_INVALID_UUID',
+                'description': "Invalid uuid for 'uuid': 'kaflaflibob'",
+                'status': 400,
+            },
+            status_code=400,
+        )
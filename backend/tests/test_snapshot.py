@@ -0,0 +1,211 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+import os
+import tempfile
+
+import freezegun
+
+from mora import common
+from mora import lora
+from mora import responsecache
+from mora import snapshot
+
+from . import util
+
+ORGID = '00000000-0000-0000-0000-000000000000'
+ROOTID = '00000000-0000-0000-0000-000000000001'
+CHILDID = '00000000-0000-0000-0000-000000000002'
+INACTIVEID = '00000000-0000-0000-0000-000000000003'
+MANAGERID = '10000000-0000-0000-0000-000000000001'
+
+
+def unit(parentid, validity='Aktiv'):
+    return {
+        'relationer': {
+            'overordnet': [{'uuid': parentid}],
+            'tilhoerer': [{'uuid': ORGID}],
+        },
+        'tilstande': {
+            'organisationenhedgyldighed': [{'gyldighed': validity}],
+        },
+    }
+
+
+@util.mock()
+@freezegun.freeze_time('2018-01-01', tz_offset=1)
+class Tests(util.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        snapshot.clear()
+        self.addCleanup(snapshot.clear)
+
+    def mock_lora(self, m):
+        m.get(
+            'http://mox/organisation/organisationenhed?bvn=%25&list=1',
+            json={'results': [[
+                {'id': ROOTID, 'registreringer': [unit(ORGID)]},
+                {'id': CHILDID, 'registreringer': [unit(ROOTID)]},
+                {
+                    'id': INACTIVEID,
+                    'registreringer': [unit(ROOTID, 'Inaktiv')],
+                },
+            ]]},
+        )
+        m.get(
+            'http://mox/organisation/organisationfunktion'
+            '?funktionsnavn=Leder&gyldighed=Aktiv&list=1',
+            json={'results': [[
+                {
+                    'id': MANAGERID,
+                    'registreringer': [{
+                        'relationer': {
+                            'tilknyttedeenheder': [{'uuid': ROOTID}],
+                        },
+                        'tilstande': {
+                            'organisationfunktiongyldighed': [
+                                {'gyldighed': 'Aktiv'},
+                            ],
+                        },
+                    }],
+                },
+            ]]},
+        )
+        m.get(
+            'http://mox/klassifikation/facet?list=1',
+            json={'results': [[]]},
+        )
+        m.get(
+            'http://mox/klassifikation/klasse?list=1',
+            json={'results': [[]]},
+        )
+
+    def test_snapshot(self, m):
+        self.mock_lora(m)
+
+        s = snapshot.Snapshot(lora.Connector(effective_date='2017-01-01'))
+
+        self.assertEqual([ROOTID], s.get_children(ORGID))
+        self.assertEqual([CHILDID], s.get_children(ROOTID))
+        self.assertEqual([CHILDID], s.get_children(ROOTID, ORGID))
+        self.assertEqual([], s.get_children(ROOTID, CHILDID))
+        self.assertEqual([], s.get_children(CHILDID))
+
+        self.assertEqual(ROOTID, s.get_parent(CHILDID))
+        self.assertIsNone(s.get_parent(ROOTID))
+        self.assertIsNone(s.get_parent(INACTIVEID))
+
+        self.assertEqual(ROOTID, s.get_managed_unit(CHILDID))
+        self.assertEqual(ROOTID, s.get_managed_unit(ROOTID))
+        self.assertIsNone(s.get_managed_unit(INACTIVEID))
+
+    def test_connector(self, m):
+        self.mock_lora(m)
+
+        with self.subTest('present'):
+            with self.app.test_request_context():
+                c = common.get_connector()
+
+            self.assertIsNone(snapshot.get_attached(c))
+            self.assertEqual(0, m.call_count)
+
+        with self.subTest('today'):
+            with self.app.test_request_context('/?at=2018-01-01'):
+                c = common.get_connector()
+
+            self.assertIsNone(snapshot.get_attached(c))
+            self.assertEqual(0, m.call_count)
+
+        with self.app.test_request_context('/?at=2017-01-01'):
+            c = common.get_connector()
+
+        s = snapshot.get_attached(c)
+        call_count = m.call_count
+
+        with self.subTest('attached'):
+            self.assertIsNotNone(s)
+            self.assertEqual(4, call_count)
+
+        with self.subTest('reads'):
+            scope = c.organisationenhed
+
+            self.assertEqual(unit(ORGID), scope.get(ROOTID))
+            self.assertIsNone(scope.get(ORGID))
+            self.assertEqual(
+                [CHILDID],
+                scope(overordnet=ROOTID, gyldighed='Aktiv'),
+            )
+            self.assertEqual(
+                {CHILDID: unit(ROOTID)},
+                dict(scope.get_all(overordnet=ROOTID, tilhoerer=ORGID,
+                                   gyldighed='Aktiv')),
+            )
+            self.assertEqual(
+                [(CHILDID, unit(ROOTID)), (ROOTID, unit(ORGID))],
+                list(scope.get_all_by_uuid([CHILDID, ROOTID])),
+            )
+
+            self.assertEqual(call_count, m.call_count)
+
+        with self.subTest('reused'):
+            with self.app.test_request_context('/?at=2017-01-01'):
+                self.assertIs(s, snapshot.get_attached(common.get_connector()))
+
+            self.assertEqual(call_count, m.call_count)
+
+        with self.subTest('written'):
+            m.patch('http://mox/organisation/organisationfunktion/' +
+                    MANAGERID, json={'uuid': MANAGERID})
+
+            lora.Connector().organisationfunktion.update({}, MANAGERID)
+
+            with self.app.test_request_context('/?at=2017-01-01'):
+                self.assertIsNot(
+                    s, snapshot.get_attached(common.get_connector()),
+                )
+
+            # the write, and reading a new snapshot
+            self.assertEqual(call_count + 1 + 4, m.call_count)
+            call_count = m.call_count
+
+        with self.subTest('written by another worker'):
+            directory = tempfile.TemporaryDirectory()
+            self.addCleanup(directory.cleanup)
+            self.addCleanup(responsecache.close)
+
+            with util.override_config({
+                'response_cache': {
+                    'path': os.path.join(directory.name, 'cache.sqlite'),
+                    'ttl': 60,
+                },
+            }):
+                with self.app.test_request_context('/?at=2017-01-01'):
+                    s = snapshot.get_attached(common.get_connector())
+
+                with self.app.test_request_context('/?at=2017-01-01'):
+                    self.assertIs(
+                        s, snapshot.get_attached(common.get_connector()),
+                    )
+
+                # as done by e.g. a write in another worker
+                responsecache.get_cache().invalidate(['klassifikation/klasse'])
+
+                with self.app.test_request_context('/?at=2017-01-01'):
+                    self.assertIsNot(
+                        s, snapshot.get_attached(common.get_connector()),
+                    )
+
+            self.assertEqual(call_count + 2 * 4, m.call_count)
+            call_count = m.call_count
+
+        with self.subTest('disabled'):
+            snapshot.clear()
+
+            with util.override_config({'lora': {'snapshot_count': 0}}), \
+                    self.app.test_request_context('/?at=2017-01-01'):
+                self.assertIsNone(
+                    snapshot.get_attached(common.get_connector()),
+                )
+
+            self.assertEqual(call_count, m.call_count)
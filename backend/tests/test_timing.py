@@ -0,0 +1,86 @@
+# SPDX-FileCopyrightText: 2020 Magenta ApS
+# SPDX-License-Identifier: MPL-2.0
+
+import json
+
+from mora import lora
+from mora import timing
+from mora.service.address_handler import dar
+
+from . import util
+
+
+@util.mock()
+class Tests(util.TestCase):
+
+    def test_lora_calls(self, m):
+        userid = '53181ed2-f1de-4c4a-a8fd-ab358c2c454a'
+        body = json.dumps({'results': [[]]})
+
+        m.get(
+            'http://mox/organisation/bruger?uuid=' + userid,
+            text=body,
+        )
+        m.get(
+            'http://mox/organisation/organisationfunktion?list=1'
+            '&tilknyttedebrugere=' + userid,
+            text=body,
+        )
+
+        with self.app.test_request_context():
+            timing._start_request()
+
+            c = lora.Connector()
+
+            c.bruger.get(userid)
+            c.bruger.get(userid)
+            list(c.organisationfunktion.get_all(tilknyttedebrugere=userid))
+
+            calls = timing.get_calls()
+
+            self.assertEqual(
+                ['lora.bruger', 'lora.organisationfunktion'],
+                sorted(calls),
+            )
+
+            self.assertEqual(2, calls['lora.bruger'].count)
+            self.assertEqual(2 * len(body), calls['lora.bruger'].size)
+            self.assertEqual(1, calls['lora.organisationfunktion'].count)
+            self.assertEqual(len(body),
+                             calls['lora.organisationfunktion'].size)
+
+            header = timing._finish_request(
+                self.app.response_class(),
+            ).headers['Server-Timing']
+
+        self.assertRegex(
+            header,
+            r'^lora\.bruger;dur=[\d.]+;desc="2 calls, 34 bytes, '
+            r'slowest [\d.]+ ms", '
+            r'lora\.organisationfunktion;dur=[\d.]+;desc="1 calls, '
+            r'17 bytes, slowest [\d.]+ ms", '
+            r'total;dur=[\d.]+$',
+        )
+
+    def test_dar_calls(self, m):
+        addrid = '0a3f50a0-23c9-32b8-e044-0003ba298018'
+
+        m.get('https://dawa.aws.dk/adresser?id=' + addrid, json=[])
+        m.get('https://dawa.aws.dk/adgangsadresser?id=' + addrid,
+              json=[{'id': addrid}])
+
+        with self.app.test_request_context():
+            timing._start_request()
+
+            dar.DARAddressHandler._fetch_from_dar(addrid)
+
+            self.assertEqual(['dar'], list(timing.get_calls()))
+            self.assertEqual(2, timing.get_calls()['dar'].count)
+
+    def test_outside_request(self, m):
+        timing.record('dar', 1.0, 1000)
+
+        with timing.timed('dar'):
+            pass
+
+        self.assertEqual({}, timing.get_calls())
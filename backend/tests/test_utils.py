@@ -87,6 +87,26 @@ class TestUtils(TestCase):
         # test fallback
         self.assertEqual(util.parsedatetime('blyf', 'flaf'), 'flaf')
 
+    def test_parsedatetime_common_formats(self):
+        # these take the fast path, which must agree with dateutil
+        for s in (
+            '2017-01-01',
+            '2017-06-01T12:30',
+            '2017-01-01 00:00:00+01',
+            '2017-06-01 00:00:00+02',
+            '2017-06-01 00:00:00+01',
+            '2017-01-01T00:00:00.25-03:30',
+            '2017-10-29T02:30:00+01:00',
+            '2017-01-01T00:00:00Z',
+        ):
+            with self.subTest(s):
+                expected = util.from_iso_time(s)
+                actual = util.parsedatetime(s)
+
+                self.assertEqual(expected, actual)
+                self.assertEqual(expected.utcoffset(), actual.utcoffset())
+                self.assertEqual(expected.isoformat(), actual.isoformat())
+
     def test_is_uuid(self):
         self.assertTrue(util.is_uuid('00000000-0000-0000-0000-000000000000'))
         self.assertFalse(util.is_uuid('42'))
@@ -804,6 +824,36 @@ class TestAppUtils(unittest.TestCase):
             self.assertEqual(client.get('/?fest=42').status,
                              '200 OK')
 
+    def test_jsonify_paged(self):
+        app = flask.Flask(__name__)
+
+        @app.route('/')
+        def root():
+            return util.jsonify_paged({
+                'total': 2,
+                'offset': 0,
+                'items': iter([{'a': 1}, {'b': 2}]),
+            })
+
+        client = app.test_client()
+
+        with self.subTest('json'):
+            r = client.get('/')
+
+            self.assertEqual('application/json', r.mimetype)
+            self.assertEqual(
+                {'total': 2, 'offset': 0, 'items': [{'a': 1}, {'b': 2}]},
+                r.json,
+            )
+
+        with self.subTest('ndjson'):
+            r = client.get('/', headers={'Accept': 'application/x-ndjson'})
+
+            self.assertEqual('application/x-ndjson', r.mimetype)
+            self.assertEqual('0', r.headers['X-Offset'])
+            self.assertEqual('2', r.headers['X-Total-Count'])
+            self.assertEqual(b'{"a": 1}\n{"b": 2}\n', r.data)
+
     def test_mapping_fieldtype(self):
         self.assertEqual("FieldTuple(('relationer', 'tilknyttedeitsystemer'), "
                          "FieldTypes.ADAPTED_ZERO_TO_MANY, None)",
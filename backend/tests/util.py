@@ -16,7 +16,9 @@ import jinja2
 import requests
 import requests_mock
 
-from mora import triggers, app, lora, settings, service, conf_db
+from mora import triggers, app, common, lora, settings, service, conf_db
+from mora import snapshot
+from mora.handler.impl import engagement
 from mora.exceptions import ImproperlyConfigured
 from mora.util import restrictargs
 
@@ -412,6 +414,11 @@ class _BaseTestCase(flask_testing.TestCase):
         # make sure the configured organisation is always reset
         # every before test
         service.org.ConfiguredOrganisation.valid = False
+        service.facet._classification_cache.clear()
+        common._history_cache.clear()
+        engagement._primary_class_cache.clear()
+        lora._search_cache.clear()
+        snapshot.clear()
 
         return app.create_app({
             'ENV': 'testing',
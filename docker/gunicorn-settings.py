@@ -8,6 +8,8 @@
 
 # Settings for gunicorn in docker.
 import multiprocessing
+import os
+import shutil
 
 
 bind = "0.0.0.0:5000"
@@ -15,3 +17,41 @@ workers = multiprocessing.cpu_count() * 2 + 1
 worker_tmp_dir = "/dev/shm"
 timeout = 600
 
+# Load the app and warm its caches in the master process, so that the
+# workers forked from it share them; see mora/warming.py
+preload_app = os.environ.get("MO_PRELOAD_APP", "true").lower() == "true"
+
+
+# Metrics are shared between workers through files in this directory; see
+# mora/metrics.py
+os.environ.setdefault(
+    "prometheus_multiproc_dir", os.path.join(worker_tmp_dir, "mora-metrics"),
+)
+
+
+def on_starting(server):
+    metrics_dir = os.environ["prometheus_multiproc_dir"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+
+    from mora import warming
+
+    try:
+        warming.warm(server.app.wsgi())
+    except Exception:
+        # LoRa may not be ready yet; the workers fill the caches as
+        # needed anyway
+        server.log.exception("failed to warm caches")
+
+    warming.prepare_fork()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)